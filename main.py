@@ -248,12 +248,44 @@ def show_help():
   单个IP: 192.168.1.1
   IP范围: 192.168.1.1-100
   网段: 192.168.1.0/24
+  列表: 10.0.0.0/16,10.1.0.1-100
 
 CLI模式选项:
   -t, --threads NUM    线程数 (默认: 100)
   --timeout SEC        超时时间秒 (默认: 2)
+  --adaptive-timeout   按各子网测得的往返时间缩短超时
+  --min-timeout SEC    自适应超时的下限秒 (默认: 0.1)
+  --retries N          未应答主机的重试次数 (默认: 0)
+  --retry-backoff F    每次重试的超时倍数 (默认: 2)
+  --rate PPS           最大发包速率，丢包或拥塞时自动降低 (默认: 不限速)
+  --probes LIST        存活探测方式 icmp,tcp,arp，第一个应答胜出 (默认: icmp)
+  --tcp-ports LIST     TCP连接探测的端口 (默认: 22,80,443,445,3389)
+  -p, --ports LIST     扫描在线主机的TCP端口，如 22,80,8000-8100,top100
+  --port-timeout SEC   端口扫描每个连接的超时秒 (默认: 1)
+  --syn                端口扫描使用SYN半开扫描（需要root权限）
+  --banners            抓取开放端口的横幅识别服务（需配合 -p）
+  --banner-timeout SEC 每个端口横幅抓取的时间预算秒 (默认: 2)
+  --udp                探测常见UDP服务（DNS、NTP、SNMP、SSDP）
+  --udp-ports LIST     探测的UDP端口列表（隐含 --udp）
+  --udp-timeout SEC    UDP探测单次超时秒 (默认: 1)
   -o, --output FILE    输出文件名
-  --format FORMAT      输出格式: csv, json, txt, excel (默认: txt)
+  --format FORMAT      输出格式: csv, json, jsonl, txt, excel (默认: txt)
+  --sweep              单套接字扫描模式
+  --no-arp             直连网段不使用ARP扫描
+  --exclude TARGETS    不扫描的目标 (格式同扫描目标)
+  --exclude-file FILE  排除列表文件，每行一个目标
+  --mac-workers NUM    MAC地址阶段并发数 (默认: 16)
+  --mac-timeout SEC    MAC地址阶段超时 (默认: 3)
+  --hostname-workers NUM  主机名阶段并发数 (默认: 32)
+  --hostname-timeout SEC  主机名阶段超时 (默认: 5)
+  --dns-server IPS     反向DNS服务器，逗号分隔
+  --no-netbios         不查询NetBIOS计算机名
+  --no-local-names     不使用mDNS/LLMNR查询本地链路名称
+  --name-cache FILE    主机名缓存文件 (重复扫描时复用)
+  --online-only        只保留在线主机
+  --randomize          以伪随机顺序扫描目标
+  --seed NUM           随机顺序的种子
+  --resume-position N  从指定位置继续随机顺序扫描
 
 示例:
   python main.py                     # 显示主菜单
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ARP扫描模块（Linux AF_PACKET）
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import ipaddress
+import socket
+import struct
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows没有fcntl，ARP扫描不可用
+    fcntl = None
+
+try:
+    from .icmp import BaseSweeper
+except ImportError:  # 直接运行时
+    from icmp import BaseSweeper
+
+ETH_P_ARP = 0x0806
+ETH_P_IP = 0x0800
+ARP_REQUEST = 1
+ARP_REPLY = 2
+BROADCAST_MAC = b'\xff' * 6
+
+# Linux ioctl 请求号
+SIOCGIFADDR = 0x8915
+SIOCGIFNETMASK = 0x891b
+SIOCGIFHWADDR = 0x8927
+
+
+@dataclass
+class Interface:
+    """本机网络接口"""
+    name: str
+    ip: str
+    netmask: str
+    mac: bytes
+
+    @property
+    def network(self) -> ipaddress.IPv4Network:
+        """接口所在网段"""
+        return ipaddress.ip_network(f"{self.ip}/{self.netmask}", strict=False)
+
+
+@dataclass
+class ArpReply:
+    """ARP应答"""
+    ip: str
+    mac: str
+    rtt: float  # 往返时间（毫秒）
+
+
+def format_mac(mac: bytes) -> str:
+    """字节形式的MAC地址转为大写冒号分隔格式"""
+    return ':'.join(f"{b:02X}" for b in mac)
+
+
+def _ioctl(sock: socket.socket, request: int, name: str) -> bytes:
+    return fcntl.ioctl(sock.fileno(), request, struct.pack('256s', name.encode()[:15]))
+
+
+def list_interfaces() -> List[Interface]:
+    """列出有IPv4地址的非回环接口（仅Linux）"""
+    interfaces = []
+    if fcntl is None:
+        return interfaces
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for _, name in socket.if_nameindex():
+            try:
+                ip = socket.inet_ntoa(_ioctl(sock, SIOCGIFADDR, name)[20:24])
+                netmask = socket.inet_ntoa(_ioctl(sock, SIOCGIFNETMASK, name)[20:24])
+                mac = _ioctl(sock, SIOCGIFHWADDR, name)[18:24]
+            except OSError:
+                continue
+            if ip.startswith('127.') or mac == b'\x00' * 6:
+                continue
+            interfaces.append(Interface(name=name, ip=ip, netmask=netmask, mac=mac))
+    finally:
+        sock.close()
+    return interfaces
+
+
+def find_interface(network: ipaddress.IPv4Network) -> Optional[Interface]:
+    """查找直连网段包含 network 的接口"""
+    try:
+        interfaces = list_interfaces()
+    except (OSError, AttributeError):
+        return None
+    for interface in interfaces:
+        if network.subnet_of(interface.network):
+            return interface
+    return None
+
+
+def build_arp_request(src_mac: bytes, src_ip: str, target_ip: str) -> bytes:
+    """构造以太网广播的ARP who-has帧"""
+    ether = BROADCAST_MAC + src_mac + struct.pack('!H', ETH_P_ARP)
+    arp = struct.pack('!HHBBH', 1, ETH_P_IP, 6, 4, ARP_REQUEST)
+    arp += src_mac + socket.inet_aton(src_ip) + b'\x00' * 6 + socket.inet_aton(target_ip)
+    return ether + arp
+
+
+def parse_arp_reply(frame: bytes) -> Optional[Tuple[str, bytes]]:
+    """
+    解析ARP应答帧
+
+    Returns:
+        (发送方IP, 发送方MAC)，不是ARP应答时返回None
+    """
+    if len(frame) < 42 or struct.unpack('!H', frame[12:14])[0] != ETH_P_ARP:
+        return None
+    htype, ptype, hlen, plen, op = struct.unpack('!HHBBH', frame[14:22])
+    if op != ARP_REPLY or ptype != ETH_P_IP or hlen != 6 or plen != 4:
+        return None
+    return socket.inet_ntoa(frame[28:32]), frame[22:28]
+
+
+class ArpSweeper(BaseSweeper):
+    """
+    ARP扫描器
+
+    在一个 AF_PACKET 套接字上向直连网段连续广播 who-has 请求，接收线程按
+    发送方IP匹配应答，一次报文交换同时得到存活状态和MAC地址。目标应位于接口的
+    直连网段内。需要root或CAP_NET_RAW权限，仅支持Linux。
+    """
+
+    thread_name = "arp-sweep"
+
+    def __init__(self, interface: Interface, timeout: float, max_inflight: int = 256,
+                 tick: float = 0.01, adaptive=None, retries: int = 0, backoff: float = 2.0,
+                 limiter=None):
+        """
+        初始化扫描器
+
+        Args:
+            interface: 发送请求的本机接口
+            其余参数见 BaseSweeper
+        """
+        super().__init__(timeout, max_inflight, tick, adaptive, retries, backoff, limiter)
+        self.interface = interface
+
+    @staticmethod
+    def available() -> bool:
+        """当前进程能否打开 AF_PACKET 套接字"""
+        if not hasattr(socket, 'AF_PACKET'):
+            return False
+        try:
+            sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+        except OSError:
+            return False
+        sock.close()
+        return True
+
+    def _open_socket(self) -> socket.socket:
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+        try:
+            sock.bind((self.interface.name, ETH_P_ARP))
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _request(self, ip: str) -> Tuple[str, bytes]:
+        return ip, build_arp_request(self.interface.mac, self.interface.ip, ip)
+
+    def _send(self, sock: socket.socket, packet: bytes, ip: str) -> bool:
+        try:
+            sock.send(packet)
+            return True
+        except OSError:
+            return False
+
+    def _receive(self, sock: socket.socket) -> Optional[Tuple[str, ArpReply]]:
+        parsed = parse_arp_reply(sock.recv(2048))
+        if parsed is None:
+            return None
+        ip, mac = parsed
+        return ip, ArpReply(ip=ip, mac=format_mac(mac), rtt=0.0)
+
+    def _local_reply(self, ip: str) -> Optional[ArpReply]:
+        # 本机地址不会应答自己的ARP请求
+        if ip == self.interface.ip:
+            return ArpReply(ip=ip, mac=format_mac(self.interface.mac), rtt=0.0)
+        return None
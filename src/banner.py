@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务识别模块（并发抓取端口横幅）
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import asyncio
+import os
+import re
+import socket
+import struct
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional, Pattern, Tuple
+
+try:
+    from .portscan import fd_budget
+except ImportError:  # 直接运行时
+    from portscan import fd_budget
+
+# 服务特征表：(服务名, 预编译的正则)，按顺序匹配，命名组 version 为版本信息。
+# 有 Server 头的HTTP应答排在通用HTTP之前
+SERVICE_PATTERNS: List[Tuple[str, Pattern[bytes]]] = [
+    ('ssh', re.compile(rb'^SSH-[\d.]+-(?P<version>[^\r\n]+)')),
+    ('http', re.compile(rb'^HTTP/[\d.]+ \d{3}.*?\r\nServer: *(?P<version>[^\r\n]+)', re.S | re.I)),
+    ('http', re.compile(rb'^HTTP/[\d.]+ \d{3}')),
+    ('tls', re.compile(rb'^\x16\x03[\x00-\x04]..\x02...(?P<tls>\x03[\x00-\x04])', re.S)),
+    ('tls', re.compile(rb'^\x15\x03[\x00-\x04]')),
+    ('ftp', re.compile(rb'^220[- ](?P<version>[^\r\n]*FTP[^\r\n]*)', re.I)),
+    ('smtp', re.compile(rb'^220[- ](?P<version>[^\r\n]*(?:SMTP|Postfix|Exim|Sendmail)[^\r\n]*)', re.I)),
+    ('pop3', re.compile(rb'^\+OK(?P<version>[^\r\n]*)')),
+    ('imap', re.compile(rb'^\* OK(?P<version>[^\r\n]*)')),
+    ('mysql', re.compile(rb'^.{4}\x0a(?P<version>[\d.]+[^\x00]*)\x00', re.S)),
+    ('vnc', re.compile(rb'^RFB (?P<version>\d{3}\.\d{3})')),
+    ('telnet', re.compile(rb'^\xff[\xfb-\xfe]')),
+]
+
+TLS_VERSIONS = {b'\x03\x00': 'SSL3.0', b'\x03\x01': 'TLS1.0', b'\x03\x02': 'TLS1.1',
+                b'\x03\x03': 'TLS1.2', b'\x03\x04': 'TLS1.3'}
+
+# 默认使用TLS探测的端口，其余端口（SSH除外）发HTTP HEAD
+TLS_PORTS = frozenset({443, 465, 563, 636, 853, 989, 990, 992, 993, 994, 995, 5061, 8443, 9443})
+SSH_PORTS = frozenset({22, 2222})
+
+SSH_IDENT = b'SSH-2.0-NetScanner\r\n'
+
+
+def build_client_hello() -> bytes:
+    """构造最小的TLS 1.2 ClientHello（常用ECDHE/RSA套件，带曲线和签名算法扩展）"""
+    ciphers = struct.pack('!8H', 0xc02f, 0xc030, 0xc02b, 0xc02c, 0x009c, 0x009d, 0x002f, 0x0035)
+    groups = struct.pack('!4H', 6, 0x001d, 0x0017, 0x0018)
+    algorithms = struct.pack('!9H', 16, 0x0401, 0x0501, 0x0601, 0x0403, 0x0503, 0x0603, 0x0804, 0x0805)
+    extensions = (struct.pack('!HH', 0x000a, len(groups)) + groups
+                  + struct.pack('!HHBB', 0x000b, 2, 1, 0)
+                  + struct.pack('!HH', 0x000d, len(algorithms)) + algorithms)
+    body = (b'\x03\x03' + os.urandom(32) + b'\x00'
+            + struct.pack('!H', len(ciphers)) + ciphers + b'\x01\x00'
+            + struct.pack('!H', len(extensions)) + extensions)
+    handshake = b'\x01' + struct.pack('!I', len(body))[1:] + body
+    return b'\x16\x03\x01' + struct.pack('!H', len(handshake)) + handshake
+
+
+def probe_for(ip: str, port: int) -> bytes:
+    """服务器没有主动发送横幅时，按端口选择的探测报文"""
+    if port in SSH_PORTS:
+        return SSH_IDENT
+    if port in TLS_PORTS:
+        return build_client_hello()
+    return f"HEAD / HTTP/1.0\r\nHost: {ip}\r\n\r\n".encode()
+
+
+def identify(data: bytes) -> str:
+    """
+    按特征表识别服务
+
+    Returns:
+        "服务名 版本"（没有版本时只有服务名），无法识别时返回"未知"
+    """
+    for service, pattern in SERVICE_PATTERNS:
+        match = pattern.match(data)
+        if match is None:
+            continue
+        groups = match.groupdict()
+        if groups.get('tls'):
+            return f"{service} {TLS_VERSIONS.get(groups['tls'], '')}".strip()
+        version = (groups.get('version') or b'').decode('latin-1').strip()
+        return f"{service} {version}" if version else service
+    return "未知"
+
+
+class BannerGrabber:
+    """
+    端口横幅抓取器
+
+    一个后台线程运行asyncio事件循环，同时处理所有连接：连接建立后先等待 wait 秒
+    读取服务器主动发送的横幅（SSH、FTP、SMTP等），没有横幅时按端口发送HTTP HEAD、
+    TLS ClientHello或SSH标识，再读取应答。每个连接最多读取 max_bytes 字节、
+    最长 timeout 秒，然后用RST关闭，结果按 SERVICE_PATTERNS 匹配。
+    关闭抓取器时未完成的主机按"未知"返回，不会留下被取消的Future。
+    """
+
+    thread_name = "banner-grabber"
+
+    def __init__(self, timeout: float = 2.0, wait: float = 0.5, max_bytes: int = 1024,
+                 max_inflight: Optional[int] = None, limiter=None):
+        """
+        初始化抓取器
+
+        Args:
+            timeout: 每个连接的总时间预算（秒，含建立连接）
+            wait: 等待服务器主动发送横幅的时间（秒）
+            max_bytes: 每个连接最多读取的字节数
+            max_inflight: 同时进行的最大连接数，默认由 fd_budget() 计算
+            limiter: 发包速率限制（RateLimiter），每个连接取一个令牌
+        """
+        self.timeout = timeout
+        self.wait = wait
+        self.max_bytes = max_bytes
+        self.max_inflight = max_inflight or fd_budget()
+        self.limiter = limiter
+
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # 当前事件循环上未完成的抓取：Future -> 端口列表
+        self._pending: Dict[Future, List[int]] = {}
+
+    def grab(self, ip: str, ports: List[int], on_start: Optional[Callable[[], None]] = None) -> Future:
+        """
+        提交一个主机的服务识别
+
+        Args:
+            ip: 目标地址
+            ports: 开放端口列表
+            on_start: 该主机的第一个连接取得并发名额时在事件循环线程中调用
+                      （排队等待前面主机的时间不算超时）
+
+        Returns:
+            结果为 {端口: 服务} 的Future
+        """
+        future: Future = Future()
+        if not ports:
+            future.set_result({})
+            return future
+
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._run, args=(self._loop,),
+                                                name=self.thread_name, daemon=True)
+                self._thread.start()
+            self._pending[future] = list(ports)
+            asyncio.run_coroutine_threadsafe(self._grab_host(ip, ports, future, self._pending, on_start),
+                                             self._loop)
+        return future
+
+    def _run(self, loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        self._semaphore = asyncio.Semaphore(self.max_inflight)
+        loop.run_forever()
+        # 取消未完成的抓取，等它们关闭连接后再关闭事件循环
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
+
+    def close(self):
+        """停止事件循环，未完成的任务被取消，对应主机的所有端口按"未知"返回"""
+        with self._lock:
+            loop, thread, pending = self._loop, self._thread, self._pending
+            self._loop = self._thread = None
+            self._pending = {}
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        with self._lock:
+            unfinished = list(pending.items())
+            pending.clear()
+        for future, ports in unfinished:
+            future.set_result({port: "未知" for port in ports})
+
+    def _settle(self, pending: Dict[Future, List[int]], future: Future, result=None,
+                error: Optional[BaseException] = None):
+        """设置抓取结果（close 已经处理过的Future不再设置）"""
+        with self._lock:
+            if pending.pop(future, None) is None:
+                return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def _grab_host(self, ip: str, ports: List[int], future: Future, pending: Dict[Future, List[int]],
+                         on_start: Optional[Callable[[], None]] = None):
+        def started():
+            nonlocal on_start
+            if on_start is not None:
+                callback, on_start = on_start, None
+                callback()
+
+        try:
+            services = await asyncio.gather(*(self._grab_port(ip, port, started) for port in ports))
+        except Exception as e:
+            self._settle(pending, future, error=e)
+        else:
+            self._settle(pending, future, dict(zip(ports, services)))
+
+    async def _grab_port(self, ip: str, port: int, started: Callable[[], None]) -> str:
+        async with self._semaphore:
+            started()
+            if self.limiter is not None:
+                await self.limiter.acquire_async()
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.timeout
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                return "未知"
+
+            try:
+                data = await self._read(reader, min(self.wait, deadline - loop.time()))
+                if not data:
+                    writer.write(probe_for(ip, port))
+                    await writer.drain()
+                    data = await self._read(reader, deadline - loop.time())
+                return identify(data)
+            except OSError:
+                return "未知"
+            finally:
+                # SO_LINGER为0时直接发RST关闭，不留TIME_WAIT
+                sock = writer.get_extra_info('socket')
+                if sock is not None:
+                    try:
+                        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                    except OSError:
+                        pass
+                writer.close()
+
+    async def _read(self, reader: asyncio.StreamReader, timeout: float) -> bytes:
+        """在 timeout 秒内读取第一段数据（不超过 max_bytes），超时返回空"""
+        if timeout <= 0:
+            return b''
+        try:
+            return await asyncio.wait_for(reader.read(self.max_bytes), timeout)
+        except asyncio.TimeoutError:
+            return b''
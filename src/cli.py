@@ -17,19 +17,79 @@ if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
 from .scanner import NetworkScanner
+from .liveness import parse_probes
+from .portscan import parse_ports
+from .udpscan import DEFAULT_UDP_PORTS
+from .exporters import STREAM_FORMATS, open_sink
 
 def main():
     parser = argparse.ArgumentParser(description='网络主机存活扫描软件 - 命令行版')
     
-    parser.add_argument('target', help='扫描目标 (IP, IP范围, CIDR)')
+    parser.add_argument('target', help='扫描目标 (IP, IP范围, CIDR, 逗号分隔的列表)')
     parser.add_argument('-t', '--threads', type=int, default=100, help='线程数 (默认: 100)')
     parser.add_argument('-o', '--output', help='输出文件')
-    parser.add_argument('--format', choices=['csv', 'json', 'txt', 'excel'], 
-                       default='txt', help='输出格式 (默认: txt)')
+    parser.add_argument('--format', choices=['csv', 'json', 'jsonl', 'txt', 'excel'], 
+                       default='txt', help='输出格式 (默认: txt，csv/jsonl边扫描边写入)')
     parser.add_argument('--timeout', type=int, default=2, help='超时时间(秒) (默认: 2)')
+    parser.add_argument('--adaptive-timeout', action='store_true',
+                       help='按各子网已测得的往返时间缩短超时 (默认每个探测都等满 --timeout)')
+    parser.add_argument('--min-timeout', type=float, default=0.1,
+                       help='自适应超时的下限(秒)，应明显大于目标网络的往返时间 (默认: 0.1)')
+    parser.add_argument('--retries', type=int, default=0,
+                       help='未应答主机的重试次数，首轮结束后只重试未应答的主机 (默认: 0)')
+    parser.add_argument('--retry-backoff', type=float, default=2.0,
+                       help='每次重试的超时倍数 (默认: 2)')
+    parser.add_argument('--rate', type=float, default=0,
+                       help='最大发包速率(包/秒)，所有探测共用，丢包或拥塞时自动降低 (默认: 不限速)')
+    parser.add_argument('--probes', default='icmp',
+                       help='存活探测方式，逗号分隔 (icmp,tcp,arp)，多种时同时发出、第一个应答胜出 (默认: icmp)')
+    parser.add_argument('--tcp-ports', default='22,80,443,445,3389',
+                       help='TCP连接探测的端口，逗号分隔 (默认: 22,80,443,445,3389)')
+    parser.add_argument('-p', '--ports',
+                       help='扫描在线主机的TCP端口：列表、范围或常用端口预设，如 22,80,8000-8100,top100')
+    parser.add_argument('--port-timeout', type=float, default=1.0, help='端口扫描每个连接的超时(秒) (默认: 1)')
+    parser.add_argument('--syn', action='store_true', help='端口扫描使用原始套接字SYN扫描（需要root权限）')
+    parser.add_argument('--banners', action='store_true', help='抓取开放端口的横幅识别服务 (需配合 -p)')
+    parser.add_argument('--banner-timeout', type=float, default=2.0, help='每个端口横幅抓取的时间预算(秒) (默认: 2)')
+    parser.add_argument('--udp', action='store_true', help='探测在线主机的常见UDP服务 (DNS、NTP、SNMP、SSDP)')
+    parser.add_argument('--udp-ports', help='探测的UDP端口列表 (指定时隐含 --udp，默认: 53,123,161,1900)')
+    parser.add_argument('--udp-timeout', type=float, default=1.0, help='UDP探测单次超时(秒) (默认: 1)')
+    parser.add_argument('--sweep', action='store_true',
+                       help='单套接字扫描模式：一个发送线程和一个接收线程完成存活探测')
+    parser.add_argument('--no-arp', action='store_true',
+                       help='目标位于直连网段时也不使用ARP扫描 (默认在未指定 --sweep/--probes 时自动使用，需要root)')
+    parser.add_argument('--exclude', help='不扫描的目标 (格式同扫描目标)')
+    parser.add_argument('--exclude-file', help='排除列表文件，每行一个目标')
+    parser.add_argument('--mac-workers', type=int, default=16, help='MAC地址阶段并发数 (默认: 16)')
+    parser.add_argument('--mac-timeout', type=float, default=3.0, help='MAC地址阶段超时(秒) (默认: 3)')
+    parser.add_argument('--hostname-workers', type=int, default=32, help='主机名阶段并发数 (默认: 32)')
+    parser.add_argument('--hostname-timeout', type=float, default=5.0, help='主机名阶段超时(秒) (默认: 5)')
+    parser.add_argument('--dns-server', help='反向DNS服务器，逗号分隔 (默认读取 /etc/resolv.conf)')
+    parser.add_argument('--no-netbios', action='store_true', help='不查询NetBIOS计算机名')
+    parser.add_argument('--no-local-names', action='store_true', help='不使用mDNS/LLMNR查询本地链路名称')
+    parser.add_argument('--name-cache', metavar='FILE',
+                       help='主机名缓存文件，扫描前加载、扫描后保存 (重复扫描时跳过大部分名称查询)')
+    parser.add_argument('--online-only', action='store_true', help='只保留在线主机 (导出结果中不含离线主机)')
+    parser.add_argument('--randomize', action='store_true', help='以伪随机顺序扫描目标')
+    parser.add_argument('--seed', type=int, help='随机顺序的种子 (用于复现或继续扫描)')
+    parser.add_argument('--resume-position', type=int, default=0,
+                       help='随机顺序下从指定位置继续扫描 (需配合 --seed)')
     
     args = parser.parse_args()
     
+    try:
+        probes = parse_probes(args.probes)
+        tcp_ports = parse_ports(args.tcp_ports)
+        ports = parse_ports(args.ports) if args.ports else None
+        if args.udp_ports:
+            udp_ports = parse_ports(args.udp_ports)
+        else:
+            udp_ports = list(DEFAULT_UDP_PORTS) if args.udp else None
+    except ValueError as e:
+        parser.error(str(e))
+    if args.banners and not ports:
+        parser.error("--banners 需要同时指定 -p/--ports")
+    
     print(f"""
     网络主机存活扫描软件 v1.0
     作者：张夏灵
@@ -42,33 +102,90 @@ def main():
     print(f"超时时间: {args.timeout}秒")
     print("-" * 50)
     
-    scanner = NetworkScanner(max_threads=args.threads, timeout=args.timeout)
+    scanner = NetworkScanner(max_threads=args.threads, timeout=args.timeout, sweep_mode=args.sweep,
+                             exclude=args.exclude, exclude_file=args.exclude_file,
+                             randomize=args.randomize, seed=args.seed,
+                             resume_position=args.resume_position, use_arp=not args.no_arp,
+                             adaptive_timeout=args.adaptive_timeout, min_timeout=args.min_timeout,
+                             retries=args.retries, retry_backoff=args.retry_backoff, rate=args.rate,
+                             probes=probes, tcp_ports=tcp_ports, ports=ports,
+                             syn_scan=args.syn, banners=args.banners, udp_ports=udp_ports)
+    scanner.port_timeout = args.port_timeout
+    scanner.banner_timeout = args.banner_timeout
+    scanner.udp_timeout = args.udp_timeout
+    scanner.mac_workers = args.mac_workers
+    scanner.mac_timeout = args.mac_timeout
+    scanner.hostname_workers = args.hostname_workers
+    scanner.hostname_timeout = args.hostname_timeout
+    scanner.use_netbios = not args.no_netbios
+    scanner.use_local_names = not args.no_local_names
+    if args.dns_server:
+        scanner.dns_resolver.nameservers = [server.strip() for server in args.dns_server.split(',') if server.strip()]
+    if args.name_cache:
+        loaded = scanner.hostname_cache.load(args.name_cache)
+        print(f"已加载主机名缓存: {loaded} 条")
     
-    def progress_callback(completed, total):
+    scanned = 0
+    
+    def progress_callback(completed, total, rate=0):
+        nonlocal scanned
+        scanned = completed
         progress = (completed / total) * 100
-        print(f"\r扫描进度: {completed}/{total} ({progress:.1f}%)", end="")
+        speed = f" | 速率: {rate:.0f}包/秒" if rate else ""
+        print(f"\r扫描进度: {completed}/{total} ({progress:.1f}%){speed}", end="")
+    
+    # csv/jsonl 边扫描边写入文件，其他格式在扫描结束后统一导出
+    sink = None
+    if args.output and args.format in STREAM_FORMATS:
+        sink = open_sink(args.format, args.output)
     
     try:
-        results = scanner.scan_range(args.target, progress_callback)
+        results = []
+        online_count = 0
         
-        print(f"\n\n扫描完成!")
-        print(f"扫描主机数: {len(results)}")
-        print(f"在线主机数: {len([h for h in results if h.status == '在线'])}")
-        
-        print("\n在线主机列表:")
-        print("-" * 50)
-        for host in results:
+        # 在线主机一确定就输出，不必等所有离线主机超时
+        for host in scanner.iter_scan(args.target, progress_callback, online_only=args.online_only):
+            if sink is not None:
+                sink.write(host)
+            else:
+                results.append(host)
             if host.status == '在线':
-                print(f"IP: {host.ip:15} | 主机名: {host.hostname:20} | MAC: {host.mac:17} | 延迟: {host.response_time:.1f}ms")
+                online_count += 1
+                print(f"\rIP: {host.ip:15} | 主机名: {host.hostname:20} | MAC: {host.mac:17} | 延迟: {host.response_time:.1f}ms | 探测: {host.alive_by}")
+                if host.open_ports:
+                    print(f"    开放端口: {','.join(str(port) for port in host.open_ports)}")
+                for port, service in sorted(host.services.items()):
+                    print(f"    {port}/tcp: {service}")
+                for port, service in sorted(host.udp_services.items()):
+                    print(f"    {port}/udp: {service}")
+        
+        print(f"\n\n扫描完成!")
+        print(f"扫描主机数: {scanned}")
+        print(f"在线主机数: {online_count}")
         
-        if args.output:
+        if sink is not None:
+            sink.close()
+            print(f"\n结果已导出到: {args.output} (共 {sink.count} 条)")
+        elif args.output:
             scanner.export_results(results, args.format, args.output)
             print(f"\n结果已导出到: {args.output}")
             
     except KeyboardInterrupt:
         print("\n\n扫描被用户中断")
+        order = scanner.target_order
+        if args.randomize and order is not None:
+            print(f"继续扫描: --randomize --seed {order.seed} --resume-position {order.resume_position}")
     except Exception as e:
         print(f"\n扫描出错: {str(e)}")
+    finally:
+        # 中断时保留已写入的部分结果
+        if sink is not None:
+            sink.close()
+        if args.name_cache:
+            try:
+                scanner.hostname_cache.save(args.name_cache)
+            except OSError as e:
+                print(f"保存主机名缓存失败: {e}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
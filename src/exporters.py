@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式结果导出模块
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import csv
+import dataclasses
+import json
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+
+# CSV列：(表头, HostInfo字段)
+CSV_COLUMNS: List[Tuple[str, str]] = [
+    ('IP地址', 'ip'),
+    ('状态', 'status'),
+    ('MAC地址', 'mac'),
+    ('主机名', 'hostname'),
+    ('响应时间(ms)', 'response_time'),
+    ('操作系统', 'os_type'),
+    ('探测方式', 'alive_by'),
+    ('开放端口', 'open_ports'),
+    ('服务', 'services'),
+    ('UDP服务', 'udp_services'),
+]
+
+# 支持边扫描边写入的格式
+STREAM_FORMATS = ('csv', 'jsonl')
+
+
+def host_to_dict(host) -> Dict[str, Any]:
+    """HostInfo转字典（用于JSON输出）"""
+    return dataclasses.asdict(host)
+
+
+def format_ports(ports: List[int]) -> str:
+    """端口列表转为逗号分隔的文本"""
+    return ','.join(str(port) for port in ports)
+
+
+def format_services(services: Dict[int, str]) -> str:
+    """端口服务表转为文本，如 22/ssh OpenSSH_8.9; 80/http nginx"""
+    return '; '.join(f"{port}/{service}" for port, service in sorted(services.items()))
+
+
+def field_value(host, field: str) -> Any:
+    """取HostInfo字段用于表格输出（端口列表和服务表转为文本）"""
+    value = getattr(host, field)
+    if field == 'open_ports':
+        return format_ports(value)
+    if field in ('services', 'udp_services'):
+        return format_services(value)
+    return value
+
+
+def host_to_row(host) -> List[Any]:
+    """HostInfo转CSV行"""
+    row = []
+    for _, field in CSV_COLUMNS:
+        value = field_value(host, field)
+        if field == 'response_time':
+            value = f"{value:.1f}"
+        row.append(value)
+    return row
+
+
+class ResultSink:
+    """
+    流式结果输出基类
+
+    结果到达时立即追加到文件，写入经过缓冲，并按行数或时间间隔定期刷新，
+    进程中途退出时文件中也保留已完成的完整行。
+    """
+
+    def __init__(self, filename: str, flush_interval: float = 1.0, flush_rows: int = 256,
+                 encoding: str = 'utf-8'):
+        """
+        打开输出文件
+
+        Args:
+            filename: 文件名
+            flush_interval: 最长刷新间隔（秒）
+            flush_rows: 累计多少行后刷新
+            encoding: 文件编码
+        """
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.count = 0
+        self._file = open(filename, 'w', newline='', encoding=encoding)
+        self._lock = threading.Lock()
+        self._unflushed = 0
+        self._last_flush = time.monotonic()
+        self._write_header()
+
+    def _write_header(self):
+        """写入文件头（子类实现）"""
+
+    def _write_host(self, host):
+        """写入一条结果（子类实现）"""
+        raise NotImplementedError
+
+    def write(self, host):
+        """追加一条结果"""
+        with self._lock:
+            self._write_host(host)
+            self.count += 1
+            self._unflushed += 1
+
+            now = time.monotonic()
+            if self._unflushed >= self.flush_rows or now - self._last_flush >= self.flush_interval:
+                self._flush_locked(now)
+
+    def _flush_locked(self, now: float):
+        self._file.flush()
+        self._unflushed = 0
+        self._last_flush = now
+
+    def flush(self):
+        """把缓冲区写入文件"""
+        with self._lock:
+            self._flush_locked(time.monotonic())
+
+    def close(self):
+        """刷新并关闭文件"""
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CsvSink(ResultSink):
+    """CSV流式输出（带BOM，Excel可直接打开）"""
+
+    def __init__(self, filename: str, **kwargs):
+        kwargs.setdefault('encoding', 'utf-8-sig')
+        super().__init__(filename, **kwargs)
+
+    def _write_header(self):
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([title for title, _ in CSV_COLUMNS])
+
+    def _write_host(self, host):
+        self._writer.writerow(host_to_row(host))
+
+
+class JsonLinesSink(ResultSink):
+    """JSON Lines（NDJSON）流式输出，每行一个主机"""
+
+    def _write_host(self, host):
+        self._file.write(json.dumps(host_to_dict(host), ensure_ascii=False))
+        self._file.write('\n')
+
+
+def open_sink(format_type: str, filename: str, **kwargs) -> ResultSink:
+    """
+    按格式打开流式输出
+
+    Args:
+        format_type: 'csv' 或 'jsonl'
+        filename: 文件名
+
+    Raises:
+        ValueError: 不支持流式写入的格式
+    """
+    if format_type == 'csv':
+        return CsvSink(filename, **kwargs)
+    if format_type == 'jsonl':
+        return JsonLinesSink(filename, **kwargs)
+    raise ValueError(f"不支持流式导出的格式: {format_type}")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+被动操作系统识别模块（根据应答的TTL和TCP窗口）
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+# 常见的初始TTL及对应的系统族：(初始TTL, 系统族)，按TTL升序
+TTL_FAMILIES: List[Tuple[int, str]] = [
+    (32, "Windows 9x"),
+    (64, "Linux/Unix"),
+    (128, "Windows"),
+    (255, "网络设备"),
+]
+
+# 初始TTL相同时，用SYN-ACK的TCP窗口大小细分：(初始TTL, 窗口) -> 系统
+WINDOW_HINTS: Dict[Tuple[int, int], str] = {
+    (64, 5840): "Linux",
+    (64, 14600): "Linux",
+    (64, 29200): "Linux",
+    (64, 64240): "Linux",
+    (64, 65160): "Linux",
+    (64, 65535): "macOS/BSD",
+    (128, 8192): "Windows",
+    (128, 64240): "Windows",
+    (128, 65535): "Windows",
+    (255, 4128): "Cisco IOS",
+    (255, 8760): "Solaris",
+}
+
+
+def initial_ttl(ttl: int) -> int:
+    """推算报文发出时的初始TTL（不小于观测值的最小常见初始值），ttl无效时返回0"""
+    if ttl <= 0:
+        return 0
+    for value, _ in TTL_FAMILIES:
+        if ttl <= value:
+            return value
+    return 0
+
+
+def hop_count(ttl: int) -> int:
+    """估算到目标经过的跳数"""
+    start = initial_ttl(ttl)
+    return start - ttl if start else 0
+
+
+def guess_os(ttl: int, window: Optional[int] = None) -> str:
+    """
+    根据应答的TTL（以及可用时的TCP窗口大小）猜测操作系统
+
+    Args:
+        ttl: 应答报文的IP TTL
+        window: SYN-ACK中的TCP窗口大小，没有时为None
+
+    Returns:
+        系统族名称，无法判断时返回"未知"
+    """
+    start = initial_ttl(ttl)
+    if not start:
+        return "未知"
+    if window is not None and (start, window) in WINDOW_HINTS:
+        return WINDOW_HINTS[(start, window)]
+    for value, family in TTL_FAMILIES:
+        if value == start:
+            return family
+    return "未知"
@@ -238,9 +238,12 @@ class ScannerGUI:
         self.log_text.see(tk.END)
         self.root.update()
         
-    def update_progress(self, completed: int, total: int):
-        """更新进度"""
-        self.progress_var.set(f"{completed}/{total}")
+    def update_progress(self, completed: int, total: int, rate: float = 0):
+        """更新进度（限速时同时显示当前发包速率）"""
+        if rate:
+            self.progress_var.set(f"{completed}/{total} ({rate:.0f}包/秒)")
+        else:
+            self.progress_var.set(f"{completed}/{total}")
         if total > 0:
             progress = (completed / total) * 100
             self.progress_bar['value'] = progress
@@ -0,0 +1,955 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ICMP回显探测引擎模块
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import asyncio
+import errno
+import itertools
+import os
+import queue
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+# ICMP报文类型
+ICMP_ECHO_REPLY = 0
+ICMP_DEST_UNREACH = 3
+ICMP_ECHO_REQUEST = 8
+
+# 全局序列号计数器，保证同一进程内并发探测的序列号互不相同
+_sequence = itertools.count(1)
+
+
+def next_sequence() -> int:
+    """分配一个回显请求序列号（进程内所有ICMP探测共用，线程安全）"""
+    return next(_sequence) & 0xffff
+
+
+@dataclass
+class EchoReply:
+    """ICMP回显应答"""
+    ip: str
+    rtt: float  # 往返时间（毫秒）
+    ttl: int = 0
+    ident: int = 0
+    seq: int = 0
+
+
+def checksum(data: bytes) -> int:
+    """计算ICMP校验和（RFC 1071）"""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack('!%dH' % (len(data) // 2), data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def build_echo_request(ident: int, seq: int, payload: bytes = b'') -> bytes:
+    """构造ICMP回显请求报文"""
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    csum = checksum(header + payload)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, csum, ident, seq) + payload
+
+
+def parse_icmp_packet(data: bytes) -> Optional[Tuple[int, int, int, int, int]]:
+    """
+    解析收到的ICMP报文
+
+    原始套接字与macOS的DGRAM套接字会带上IP头，Linux的DGRAM套接字不带，
+    这里根据首字节的版本号自动判断。
+
+    Returns:
+        (类型, 代码, 标识符, 序列号, TTL)，无法解析时返回None
+    """
+    ttl = 0
+    if len(data) >= 20 and data[0] >> 4 == 4:
+        header_len = (data[0] & 0x0f) * 4
+        ttl = data[8]
+        data = data[header_len:]
+
+    if len(data) < 8:
+        return None
+
+    icmp_type, code, _, ident, seq = struct.unpack('!BBHHH', data[:8])
+    return icmp_type, code, ident, seq, ttl
+
+
+def parse_unreachable(data: bytes) -> Optional[Tuple[str, int, int]]:
+    """
+    解析ICMP目标不可达报文中引用的原始回显请求
+
+    Returns:
+        (原请求的目的地址, 标识符, 序列号)，不是针对回显请求的不可达报文时返回None
+    """
+    if len(data) >= 20 and data[0] >> 4 == 4:
+        data = data[(data[0] & 0x0f) * 4:]
+    if len(data) < 8 + 20 or data[0] != ICMP_DEST_UNREACH:
+        return None
+
+    inner = data[8:]
+    header_len = (inner[0] & 0x0f) * 4
+    if inner[0] >> 4 != 4 or len(inner) < header_len + 8:
+        return None
+    icmp_type, _, _, ident, seq = struct.unpack('!BBHHH', inner[header_len:header_len + 8])
+    if icmp_type != ICMP_ECHO_REQUEST:
+        return None
+    return socket.inet_ntoa(inner[16:20]), ident, seq
+
+
+# 部分Python版本没有导出 IP_RECVTTL，按平台补上（Linux为12，macOS为24）
+IP_RECVTTL = getattr(socket, 'IP_RECVTTL', 24 if sys.platform == 'darwin' else 12)
+# 接收TTL的辅助数据类型：Linux为IP_TTL，macOS/BSD为IP_RECVTTL
+_TTL_CMSG_TYPES = {getattr(socket, 'IP_TTL', 2), IP_RECVTTL}
+
+
+def enable_recv_ttl(sock: socket.socket) -> bool:
+    """请求内核随每个报文附带IP头中的TTL（DGRAM套接字收不到IP头时使用）"""
+    try:
+        sock.setsockopt(socket.IPPROTO_IP, IP_RECVTTL, 1)
+        return True
+    except OSError:
+        return False
+
+
+def recv_icmp(sock: socket.socket, bufsize: int = 2048) -> Tuple[bytes, Tuple[str, int], int]:
+    """
+    接收一个ICMP报文，同时取出辅助数据中的TTL
+
+    Returns:
+        (报文, 源地址, TTL)，没有辅助数据（原始套接字或不支持recvmsg的系统）时TTL为0，
+        此时由 parse_icmp_packet 从IP头中读取
+    """
+    if not hasattr(sock, 'recvmsg'):
+        data, addr = sock.recvfrom(bufsize)
+        return data, addr, 0
+
+    data, ancdata, _, addr = sock.recvmsg(bufsize, socket.CMSG_SPACE(4))
+    ttl = 0
+    for level, cmsg_type, cmsg_data in ancdata:
+        if level == socket.IPPROTO_IP and cmsg_type in _TTL_CMSG_TYPES and cmsg_data:
+            # Linux为int，macOS为单字节
+            ttl = cmsg_data[0] if len(cmsg_data) == 1 else int.from_bytes(cmsg_data[:4], sys.byteorder)
+    return data, addr, ttl
+
+
+# Linux上让套接字把收到的ICMP差错报文放入错误队列（DGRAM的ICMP套接字只能这样收到目标不可达）
+IP_RECVERR = getattr(socket, 'IP_RECVERR', 11)
+MSG_ERRQUEUE = getattr(socket, 'MSG_ERRQUEUE', 0x2000)
+SO_EE_ORIGIN_ICMP = 2
+# 队列中有ICMP差错时，普通 recv 会先以这些错误码报错一次
+ICMP_ERRNOS = frozenset({errno.EHOSTUNREACH, errno.ENETUNREACH, errno.ECONNREFUSED,
+                         errno.EHOSTDOWN, errno.EPROTO, errno.EMSGSIZE, errno.EACCES})
+
+
+def enable_recv_errors(sock: socket.socket) -> bool:
+    """开启 IP_RECVERR（仅Linux）"""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        sock.setsockopt(socket.SOL_IP, IP_RECVERR, 1)
+        return True
+    except OSError:
+        return False
+
+
+def parse_recv_error(ancdata) -> Optional[Tuple[int, int]]:
+    """
+    解析错误队列的控制消息（struct sock_extended_err）
+
+    Returns:
+        ICMP的 (类型, 代码)，不是ICMP差错时返回None
+    """
+    for level, kind, data in ancdata:
+        if level != socket.SOL_IP or kind != IP_RECVERR or len(data) < 16:
+            continue
+        _, origin, icmp_type, code, _, _, _ = struct.unpack('=IBBBBII', data[:16])
+        if origin == SO_EE_ORIGIN_ICMP:
+            return icmp_type, code
+    return None
+
+
+def recv_errors(sock: socket.socket) -> List[Tuple[Tuple[str, int], bytes, int, int]]:
+    """
+    读空套接字的错误队列（需先开启 IP_RECVERR，否则总是返回空列表）
+
+    Returns:
+        [(出错数据报的目的地址, 数据报内容, ICMP类型, 代码)]
+    """
+    errors = []
+    while True:
+        # 带超时的套接字在 recvmsg 前会先等待可读，先确认有事件再读，避免空等
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            if not readable:
+                break
+            data, ancdata, _, address = sock.recvmsg(512, 512, MSG_ERRQUEUE)
+        except (OSError, ValueError):
+            break
+        error = parse_recv_error(ancdata)
+        if error is not None and address:
+            errors.append((address, data, error[0], error[1]))
+    return errors
+
+
+def echo_errors(sock: socket.socket) -> List[Tuple[str, int]]:
+    """
+    读出错误队列中针对回显请求的目标不可达差错
+
+    Returns:
+        [(原请求的目的地址, 序列号)]
+    """
+    unreachable = []
+    for address, data, icmp_type, _ in recv_errors(sock):
+        if icmp_type == ICMP_DEST_UNREACH and len(data) >= 8 and data[0] == ICMP_ECHO_REQUEST:
+            unreachable.append((address[0], struct.unpack('!H', data[6:8])[0]))
+    return unreachable
+
+
+def open_icmp_socket() -> Tuple[socket.socket, str]:
+    """
+    打开ICMP套接字
+
+    优先使用无需特权的 SOCK_DGRAM/IPPROTO_ICMP（Linux需在
+    net.ipv4.ping_group_range 范围内，macOS默认可用），失败时再尝试
+    需要root/管理员权限的原始套接字。DGRAM套接字收不到ICMP差错报文本身，
+    在Linux上开启 IP_RECVERR，目标不可达改由 echo_errors() 从错误队列读出。
+
+    Returns:
+        (套接字, 模式 'dgram' 或 'raw')
+
+    Raises:
+        OSError: 两种套接字都无法创建
+    """
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        enable_recv_ttl(sock)
+        enable_recv_errors(sock)
+        return sock, 'dgram'
+    except OSError:
+        pass
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+    return sock, 'raw'
+
+
+class IcmpEngine:
+    """进程内ICMP回显探测引擎，不再为每个目标启动ping进程"""
+
+    def __init__(self, payload_size: int = 32):
+        """
+        初始化探测引擎
+
+        Args:
+            payload_size: 回显请求数据部分的字节数
+        """
+        self.payload = bytes(i & 0xff for i in range(payload_size))
+        self.ident = os.getpid() & 0xffff
+        self._available = None
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """检查当前进程能否打开ICMP套接字（结果会被缓存）"""
+        if self._available is None:
+            with self._lock:
+                if self._available is None:
+                    try:
+                        sock, _ = open_icmp_socket()
+                        sock.close()
+                        self._available = True
+                    except OSError:
+                        self._available = False
+        return self._available
+
+    def ping(self, ip: str, timeout: float) -> Optional[EchoReply]:
+        """
+        发送一个回显请求并等待应答
+
+        Args:
+            ip: 目标IP地址
+            timeout: 超时时间（秒）
+
+        Returns:
+            收到应答时返回EchoReply，超时或出错时返回None
+        """
+        try:
+            sock, mode = open_icmp_socket()
+        except OSError:
+            return None
+
+        seq = next_sequence()
+        packet = build_echo_request(self.ident, seq, self.payload)
+
+        with sock:
+            try:
+                start = time.perf_counter()
+                deadline = start + timeout
+                sock.sendto(packet, (ip, 0))
+
+                while True:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        return None
+                    sock.settimeout(remaining)
+
+                    try:
+                        data, addr, cmsg_ttl = recv_icmp(sock)
+                    except socket.timeout:
+                        return None
+                    elapsed = (time.perf_counter() - start) * 1000
+
+                    parsed = parse_icmp_packet(data)
+                    if parsed is None or addr[0] != ip:
+                        continue
+
+                    icmp_type, _, ident, reply_seq, ttl = parsed
+                    ttl = ttl or cmsg_ttl
+                    if icmp_type != ICMP_ECHO_REPLY or reply_seq != seq:
+                        continue
+                    # DGRAM模式下内核会改写标识符并只投递本套接字的应答
+                    if mode == 'raw' and ident != self.ident:
+                        continue
+
+                    return EchoReply(ip=ip, rtt=elapsed, ttl=ttl, ident=ident, seq=reply_seq)
+            except OSError:
+                return None
+
+
+class TimeoutWheel:
+    """超时时间轮：按到期时间把待定探测分到固定粒度的槽里，批量过期"""
+
+    def __init__(self, tick: float = 0.01):
+        """
+        初始化时间轮
+
+        Args:
+            tick: 槽粒度（秒）
+        """
+        self.tick = tick
+        self._slots: Dict[int, List[Hashable]] = {}
+        self._cursor: Optional[int] = None
+
+    def add(self, key: Hashable, deadline: float):
+        """登记一个在 deadline 到期的键"""
+        slot = int(deadline / self.tick)
+        if self._cursor is not None and slot < self._cursor:
+            slot = self._cursor
+        self._slots.setdefault(slot, []).append(key)
+
+    def expire(self, now: float) -> List[Hashable]:
+        """取出所有在 now 之前到期的键"""
+        current = int(now / self.tick)
+        if not self._slots:
+            self._cursor = current
+            return []
+        if self._cursor is None:
+            self._cursor = min(self._slots)
+
+        expired = []
+        while self._cursor < current:
+            if not self._slots:
+                self._cursor = current
+                break
+            expired.extend(self._slots.pop(self._cursor, ()))
+            self._cursor += 1
+        return expired
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._slots.values())
+
+
+class BaseSweeper:
+    """
+    单套接字扫描器基类
+
+    一个发送线程向整个目标列表连续发送请求，一个接收线程按探测键把应答匹配回目标，
+    未应答的探测由时间轮判定超时，首轮发送完之后再向超时的主机补发。
+    子类提供打开套接字、构造请求、发送和解析应答的钩子。
+    """
+
+    thread_name = "sweep"
+
+    def __init__(self, timeout: float, max_inflight: int = 1024, tick: float = 0.01, adaptive=None,
+                 retries: int = 0, backoff: float = 2.0, limiter=None):
+        """
+        初始化扫描器
+
+        Args:
+            timeout: 每个探测的超时时间（秒）
+            max_inflight: 同时等待应答的最大探测数
+            tick: 时间轮粒度及接收线程的轮询间隔（秒）
+            adaptive: 自适应超时（AdaptiveTimeout），设置后每个探测的超时由其按
+                      已收到的应答决定，timeout 不再使用
+            retries: 未应答主机的重试次数；重试在首轮发送完之后才发出，收到应答即停止
+            backoff: 每次重试的超时相对上一次的倍数
+            limiter: 发包速率限制（RateLimiter），同时接收应答的统计
+        """
+        self.timeout = timeout
+        self.adaptive = adaptive
+        self.retries = retries
+        self.backoff = backoff
+        self.limiter = limiter
+        self.max_inflight = max_inflight
+        self.tick = tick
+        self._running = False
+
+    def stop(self):
+        """停止扫描"""
+        self._running = False
+
+    def _timeout_for(self, ip: str, attempt: int = 0) -> float:
+        timeout = self.adaptive.timeout_for(ip) if self.adaptive is not None else self.timeout
+        return timeout * self.backoff ** attempt
+
+    def _observe(self, ip: str, rtt: float):
+        if self.adaptive is not None:
+            self.adaptive.observe(ip, rtt)
+
+    def _first_check(self, ip: str, attempt: int = 0) -> float:
+        """发送后第一次检查超时的间隔：自适应时先按下限检查，届时再按最新估计决定"""
+        timeout = self.adaptive.floor if self.adaptive is not None else self.timeout
+        return timeout * self.backoff ** attempt
+
+    def _open_socket(self) -> socket.socket:
+        """打开扫描用的套接字（子类实现）"""
+        raise NotImplementedError
+
+    def _request(self, ip: str) -> Tuple[Hashable, bytes]:
+        """构造发往 ip 的请求，返回 (探测键, 报文)（子类实现）"""
+        raise NotImplementedError
+
+    def _send(self, sock: socket.socket, packet: bytes, ip: str) -> bool:
+        """发送请求，失败时返回False（子类实现）"""
+        raise NotImplementedError
+
+    def _receive(self, sock: socket.socket):
+        """
+        读取并解析一个报文（子类实现）
+
+        Returns:
+            (探测键, 应答)，应答的 rtt 由基类填写；不是本扫描的应答时返回None
+
+        Raises:
+            socket.timeout: 轮询间隔内没有报文
+            OSError: 套接字出错，扫描结束
+        """
+        raise NotImplementedError
+
+    def _local_reply(self, ip: str):
+        """不需要发送请求就能确定的应答（如本机地址），默认没有"""
+        return None
+
+    def sweep(self, targets: Iterable[str]) -> Iterator[Tuple[str, Any]]:
+        """
+        扫描所有目标
+
+        Args:
+            targets: 目标IP地址
+
+        Yields:
+            (IP地址, 应答)，重试用完仍超时或发送失败时应答为None，按完成顺序产出，
+            每个目标只产出一次；接收时套接字出错，尚未得到结果的目标（包括还没发出的）
+            应答均为None
+
+        Raises:
+            OSError: 无法打开套接字
+        """
+        sock = self._open_socket()
+        sock.settimeout(self.tick)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        except OSError:
+            pass
+
+        # 探测键 -> (IP, 发送时间, 第几次重试)
+        pending: Dict[Hashable, Tuple[str, float, int]] = {}
+        # 超时后等待重试的主机
+        retry_queue: List[Tuple[str, int]] = []
+        wheel = TimeoutWheel(self.tick)
+        lock = threading.Lock()
+        slots = threading.Semaphore(self.max_inflight)
+        results: "queue.Queue[Optional[Tuple[str, Any]]]" = queue.Queue()
+        sender_done = threading.Event()
+        # 接收出错：之后的目标不再发送，直接按未应答产出
+        failed = threading.Event()
+        self._running = True
+
+        def probe(ip: str, attempt: int) -> bool:
+            """发出一个探测，扫描已停止时返回False"""
+            key, packet = self._request(ip)
+            with lock:
+                # 同一目标的请求还在等待应答（目标列表中有重复）
+                if key in pending:
+                    return True
+            while not slots.acquire(timeout=self.tick):
+                if not self._running:
+                    return False
+                if failed.is_set():
+                    results.put((ip, None))
+                    return True
+            if not self._running:
+                return False
+            if self.limiter is not None:
+                self.limiter.acquire()
+
+            now = time.perf_counter()
+            with lock:
+                if failed.is_set():
+                    slots.release()
+                    results.put((ip, None))
+                    return True
+                pending[key] = (ip, now, attempt)
+                wheel.add(key, now + self._first_check(ip, attempt))
+
+            if not self._send(sock, packet, ip):
+                with lock:
+                    sent = pending.pop(key, None)
+                if sent is not None:
+                    slots.release()
+                    results.put((ip, None))
+            return True
+
+        def sender():
+            try:
+                for ip in targets:
+                    reply = self._local_reply(ip)
+                    if reply is not None:
+                        results.put((ip, reply))
+                        continue
+                    if not probe(ip, 0):
+                        return
+
+                # 首轮发完后只向超时未应答的主机补发，直到全部应答或重试用完
+                while self._running and self.retries and not failed.is_set():
+                    with lock:
+                        batch = retry_queue[:]
+                        retry_queue.clear()
+                        if not batch and not pending:
+                            break
+                    if not batch:
+                        time.sleep(self.tick)
+                        continue
+                    for ip, attempt in batch:
+                        if not probe(ip, attempt):
+                            return
+            finally:
+                sender_done.set()
+
+        def receiver():
+            try:
+                while self._running:
+                    try:
+                        received = self._receive(sock)
+                    except socket.timeout:
+                        received = None
+                    except OSError as e:
+                        print(f"扫描套接字出错: {e}，未完成的目标按未应答处理")
+                        with lock:
+                            failed.set()
+                            abandoned = [ip for ip, _, _ in pending.values()]
+                            retrying = [ip for ip, _ in retry_queue]
+                            pending.clear()
+                            retry_queue.clear()
+                        for ip in abandoned:
+                            slots.release()
+                            results.put((ip, None))
+                        for ip in retrying:
+                            results.put((ip, None))
+                        # 发送线程把剩下的目标按未应答产出后才结束
+                        sender_done.wait()
+                        break
+                    now = time.perf_counter()
+
+                    if received is not None:
+                        key, reply = received
+                        with lock:
+                            sent = pending.pop(key, None)
+                        if sent is not None:
+                            ip, sent_at, attempt = sent
+                            slots.release()
+                            reply.rtt = (now - sent_at) * 1000
+                            self._observe(ip, reply.rtt)
+                            if self.limiter is not None:
+                                self.limiter.on_reply(retry=attempt > 0)
+                            results.put((ip, reply))
+
+                    with lock:
+                        expired = []
+                        retried = 0
+                        for key in wheel.expire(now):
+                            entry = pending.get(key)
+                            if entry is None:
+                                continue
+                            ip, sent_at, attempt = entry
+                            # 发送之后超时估计可能已经变化，按最新估计重新判断
+                            deadline = sent_at + self._timeout_for(ip, attempt)
+                            if deadline > now:
+                                wheel.add(key, deadline)
+                                continue
+                            del pending[key]
+                            if attempt < self.retries:
+                                retry_queue.append((ip, attempt + 1))
+                                retried += 1
+                            else:
+                                expired.append(ip)
+                        finished = sender_done.is_set() and not pending
+                    for _ in range(retried):
+                        slots.release()
+                    for ip in expired:
+                        slots.release()
+                        results.put((ip, None))
+                    if finished:
+                        break
+            finally:
+                results.put(None)
+
+        threads = [
+            threading.Thread(target=sender, name=f"{self.thread_name}-sender", daemon=True),
+            threading.Thread(target=receiver, name=f"{self.thread_name}-receiver", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = results.get()
+                if item is None:
+                    break
+                yield item
+        finally:
+            self._running = False
+            for thread in threads:
+                thread.join()
+            sock.close()
+
+
+class IcmpSweeper(BaseSweeper):
+    """
+    单套接字ICMP扫描器
+
+    一个发送线程向整个目标列表连续发送回显请求，一个接收线程按
+    (源地址, 序列号) 以及标识符把应答匹配回目标，未应答的探测由时间轮判定超时。
+    """
+
+    thread_name = "icmp-sweep"
+
+    def __init__(self, engine: IcmpEngine, timeout: float, max_inflight: int = 1024,
+                 tick: float = 0.01, adaptive=None, retries: int = 0, backoff: float = 2.0,
+                 limiter=None):
+        """
+        初始化扫描器
+
+        Args:
+            engine: 提供标识符和数据负载的ICMP引擎
+            其余参数见 BaseSweeper；limiter 同时接收不可达报文的统计
+        """
+        super().__init__(timeout, max_inflight, tick, adaptive, retries, backoff, limiter)
+        self.engine = engine
+        self._mode = 'raw'
+
+    def _open_socket(self) -> socket.socket:
+        sock, self._mode = open_icmp_socket()
+        return sock
+
+    def _request(self, ip: str) -> Tuple[Hashable, bytes]:
+        seq = next_sequence()
+        return (ip, seq), build_echo_request(self.engine.ident, seq, self.engine.payload)
+
+    def _send(self, sock: socket.socket, packet: bytes, ip: str) -> bool:
+        for _ in range(100):
+            try:
+                sock.sendto(packet, (ip, 0))
+                return True
+            except OSError as e:
+                # 发送缓冲区已满时稍等重试
+                if e.errno != errno.ENOBUFS:
+                    return False
+                time.sleep(0.001)
+        return False
+
+    def _receive(self, sock: socket.socket) -> Optional[Tuple[Hashable, EchoReply]]:
+        try:
+            data, addr, cmsg_ttl = recv_icmp(sock)
+        except OSError as e:
+            if e.errno not in ICMP_ERRNOS:
+                raise
+            # DGRAM套接字的目标不可达在错误队列里
+            if self.limiter is not None:
+                for _ in echo_errors(sock):
+                    self.limiter.on_unreachable()
+            return None
+
+        parsed = parse_icmp_packet(data) if data else None
+        if parsed is None:
+            return None
+        icmp_type, _, ident, seq, ttl = parsed
+        own = self._mode != 'raw' or ident == self.engine.ident
+        if icmp_type == ICMP_ECHO_REPLY and own:
+            return (addr[0], seq), EchoReply(ip=addr[0], rtt=0.0, ttl=ttl or cmsg_ttl, ident=ident, seq=seq)
+        if icmp_type == ICMP_DEST_UNREACH and self.limiter is not None:
+            quoted = parse_unreachable(data)
+            if quoted is not None and (self._mode != 'raw' or quoted[1] == self.engine.ident):
+                self.limiter.on_unreachable()
+        return None
+
+
+class IcmpReplyListener:
+    """
+    共享ICMP套接字的应答分发器
+
+    所有探测共用一个ICMP套接字，由一个后台线程接收应答，按 (源地址, 序列号)
+    交给发送时登记的Future，不必为每个主机打开一个套接字。
+    """
+
+    thread_name = "icmp-listener"
+
+    def __init__(self, engine: IcmpEngine, tick: float = 0.05, limiter=None):
+        """
+        初始化
+
+        Args:
+            engine: 提供标识符和数据负载的ICMP引擎
+            tick: 接收线程的轮询间隔（秒）
+            limiter: 发包速率限制（RateLimiter），收到应答和不可达报文时通知它
+        """
+        self.engine = engine
+        self.tick = tick
+        self.limiter = limiter
+        self._lock = threading.Lock()
+        # (IP, 序列号) -> (发送时间, Future)
+        self._pending: Dict[Tuple[str, int], Tuple[float, Future]] = {}
+        self._sock: Optional[socket.socket] = None
+        self._mode = 'raw'
+        self._thread: Optional[threading.Thread] = None
+
+    def send(self, ip: str) -> Future:
+        """
+        向 ip 发出一个回显请求
+
+        Returns:
+            结果为EchoReply的Future，发送失败时结果为None；不再等待时调用 cancel()
+
+        Raises:
+            OSError: 无法打开ICMP套接字
+        """
+        seq = next_sequence()
+        key = (ip, seq)
+        future: Future = Future()
+        with self._lock:
+            if self._sock is None:
+                self._start()
+            sock = self._sock
+            self._pending[key] = (time.perf_counter(), future)
+        future.add_done_callback(lambda _: self._discard(key))
+
+        try:
+            sock.sendto(build_echo_request(self.engine.ident, seq, self.engine.payload), (ip, 0))
+        except OSError:
+            if future.set_running_or_notify_cancel():
+                future.set_result(None)
+        return future
+
+    def _discard(self, key: Tuple[str, int]):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _start(self):
+        """打开套接字并启动接收线程（调用方持有锁）"""
+        sock, self._mode = open_icmp_socket()
+        sock.settimeout(self.tick)
+        self._sock = sock
+        self._thread = threading.Thread(target=self._loop, args=(sock,), name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """停止接收线程并关闭套接字，仍在等待的探测结果为None"""
+        with self._lock:
+            sock, thread = self._sock, self._thread
+            self._sock = self._thread = None
+        if sock is None:
+            return
+        thread.join()
+        sock.close()
+
+    def _loop(self, sock: socket.socket):
+        while self._sock is sock:
+            try:
+                data, addr, cmsg_ttl = recv_icmp(sock)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if e.errno not in ICMP_ERRNOS:
+                    break
+                # DGRAM套接字的目标不可达在错误队列里
+                if self.limiter is not None:
+                    for _ in echo_errors(sock):
+                        self.limiter.on_unreachable()
+                continue
+            now = time.perf_counter()
+
+            parsed = parse_icmp_packet(data)
+            if parsed is None:
+                continue
+            icmp_type, _, ident, seq, ttl = parsed
+            own = self._mode != 'raw' or ident == self.engine.ident
+            if icmp_type == ICMP_ECHO_REPLY and own:
+                with self._lock:
+                    entry = self._pending.pop((addr[0], seq), None)
+                if entry is None:
+                    continue
+                sent, future = entry
+                if self.limiter is not None:
+                    self.limiter.on_reply()
+                if future.set_running_or_notify_cancel():
+                    future.set_result(EchoReply(ip=addr[0], rtt=(now - sent) * 1000,
+                                                ttl=ttl or cmsg_ttl, ident=ident, seq=seq))
+            elif icmp_type == ICMP_DEST_UNREACH and self.limiter is not None:
+                quoted = parse_unreachable(data)
+                if quoted is not None and (self._mode != 'raw' or quoted[1] == self.engine.ident):
+                    self.limiter.on_unreachable()
+
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+            if self._sock is sock:
+                # 套接字出错，下次发送时重新打开
+                self._sock = self._thread = None
+                sock.close()
+        for _, future in pending:
+            if future.set_running_or_notify_cancel():
+                future.set_result(None)
+
+
+class AsyncIcmpPinger:
+    """基于asyncio的ICMP探测器：单个套接字承载所有并发探测，无需额外线程"""
+
+    def __init__(self, engine: IcmpEngine, limiter=None):
+        """
+        初始化探测器
+
+        Args:
+            engine: 提供标识符和数据负载的ICMP引擎
+            limiter: 发包速率限制（RateLimiter），收到不可达报文时通知它
+        """
+        self.engine = engine
+        self.limiter = limiter
+        self._pending: Dict[Tuple[str, int], Tuple[float, asyncio.Future]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sock: Optional[socket.socket] = None
+        self._mode: Optional[str] = None
+
+    async def start(self):
+        """
+        打开ICMP套接字并注册到事件循环
+
+        Raises:
+            OSError: 无法打开ICMP套接字
+            NotImplementedError: 事件循环不支持监听原始套接字（如Windows的Proactor）
+        """
+        self._loop = asyncio.get_running_loop()
+        sock, mode = open_icmp_socket()
+        sock.setblocking(False)
+        self._sock, self._mode = sock, mode
+
+        try:
+            # 直接注册读事件而不用 create_datagram_endpoint：后者不接受原始套接字，
+            # 也拿不到DGRAM套接字 recvmsg 辅助数据中的TTL
+            self._loop.add_reader(sock.fileno(), self._on_readable)
+        except BaseException:
+            sock.close()
+            self._sock = None
+            raise
+
+    def close(self):
+        """关闭套接字，未完成的探测按超时处理"""
+        if self._sock is not None:
+            self._loop.remove_reader(self._sock.fileno())
+            self._sock.close()
+        self._sock = None
+
+        for _, future in self._pending.values():
+            if not future.done():
+                future.set_result(None)
+        self._pending.clear()
+
+    def _on_readable(self):
+        """套接字可读时取出所有报文"""
+        while self._sock is not None:
+            try:
+                data, addr, ttl = recv_icmp(self._sock)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                if e.errno not in ICMP_ERRNOS:
+                    return
+                # DGRAM套接字的目标不可达在错误队列里
+                if self.limiter is not None:
+                    for _ in echo_errors(self._sock):
+                        self.limiter.on_unreachable()
+                continue
+            self.datagram_received(data, addr, ttl)
+
+    def datagram_received(self, data: bytes, addr, cmsg_ttl: int = 0):
+        """匹配回显应答并唤醒等待中的探测"""
+        parsed = parse_icmp_packet(data)
+        if parsed is None:
+            return
+
+        icmp_type, _, ident, seq, ttl = parsed
+        ttl = ttl or cmsg_ttl
+        if icmp_type == ICMP_DEST_UNREACH and self.limiter is not None:
+            quoted = parse_unreachable(data)
+            if quoted is not None and (self._mode != 'raw' or quoted[1] == self.engine.ident):
+                self.limiter.on_unreachable()
+            return
+        if icmp_type != ICMP_ECHO_REPLY:
+            return
+        if self._mode == 'raw' and ident != self.engine.ident:
+            return
+
+        entry = self._pending.pop((addr[0], seq), None)
+        if entry is None:
+            return
+        sent, future = entry
+        if not future.done():
+            rtt = (time.perf_counter() - sent) * 1000
+            future.set_result(EchoReply(ip=addr[0], rtt=rtt, ttl=ttl, ident=ident, seq=seq))
+
+    async def ping(self, ip: str, timeout: float) -> Optional[EchoReply]:
+        """
+        发送一个回显请求并等待应答
+
+        Args:
+            ip: 目标IP地址
+            timeout: 超时时间（秒）
+
+        Returns:
+            收到应答时返回EchoReply，超时或出错时返回None
+        """
+        if self._sock is None:
+            return None
+
+        seq = next_sequence()
+        key = (ip, seq)
+        future = self._loop.create_future()
+        self._pending[key] = (time.perf_counter(), future)
+        packet = build_echo_request(self.engine.ident, seq, self.engine.payload)
+
+        try:
+            self._sock.sendto(packet, (ip, 0))
+            return await asyncio.wait_for(future, timeout)
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            self._pending.pop(key, None)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多探测并发存活检测模块（ICMP / TCP连接 / ARP 竞速）
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import asyncio
+import errno
+import ipaddress
+import selectors
+import socket
+import time
+from concurrent.futures import Future, wait
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    from .icmp import IcmpEngine, IcmpReplyListener
+    from .arp import ETH_P_ARP, Interface, build_arp_request, format_mac, list_interfaces, parse_arp_reply
+except ImportError:  # 直接运行时
+    from icmp import IcmpEngine, IcmpReplyListener
+    from arp import ETH_P_ARP, Interface, build_arp_request, format_mac, list_interfaces, parse_arp_reply
+
+# 可用的探测方式
+PROBE_TYPES = ('icmp', 'tcp', 'arp')
+
+# 非阻塞connect的"进行中"错误码（Windows上为WSAEWOULDBLOCK）
+_CONNECT_PENDING = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY,
+                    getattr(errno, 'WSAEWOULDBLOCK', 10035)}
+# 收到RST，说明主机在线
+_CONNECT_REFUSED = {errno.ECONNREFUSED, getattr(errno, 'WSAECONNREFUSED', 10061)}
+# 路由器回了ICMP不可达
+_CONNECT_UNREACHABLE = {errno.EHOSTUNREACH, errno.ENETUNREACH,
+                        getattr(errno, 'WSAEHOSTUNREACH', 10065), getattr(errno, 'WSAENETUNREACH', 10051)}
+
+
+@dataclass
+class Proof:
+    """证明主机在线的应答"""
+    method: str               # 'ICMP'、'TCP/端口' 或 'ARP'
+    rtt: float                # 往返时间（毫秒）
+    ttl: int = 0              # ICMP应答的TTL，其他方式为0
+    mac: Optional[str] = None # ARP应答中的MAC地址
+
+
+def parse_probes(text: str) -> Tuple[str, ...]:
+    """
+    解析逗号分隔的探测方式列表
+
+    Raises:
+        ValueError: 含有不支持的探测方式
+    """
+    probes = tuple(dict.fromkeys(item.strip().lower() for item in text.split(',') if item.strip()))
+    unknown = [probe for probe in probes if probe not in PROBE_TYPES]
+    if unknown or not probes:
+        raise ValueError(f"不支持的探测方式: {','.join(unknown) or text}（可选 {','.join(PROBE_TYPES)}）")
+    return probes
+
+
+class LivenessProber:
+    """
+    多探测竞速
+
+    对同一主机同时发出ICMP回显请求、向若干端口发起非阻塞TCP连接，目标位于直连网段时
+    再发一个ARP请求；任一探测得到肯定应答（TCP收到RST也算）即判定在线，
+    其余探测随即取消（关闭套接字）。这样屏蔽了ICMP的主机也能在一次探测中发现，
+    不必在ICMP扫描之后再单独跑一遍TCP扫描。
+
+    所有主机的ICMP探测共用 IcmpReplyListener 的一个套接字，用完后应调用 close()。
+    """
+
+    def __init__(self, engine: IcmpEngine, probes: Iterable[str] = PROBE_TYPES,
+                 ports: Iterable[int] = (22, 80, 443, 445, 3389), limiter=None, tick: float = 0.01):
+        """
+        初始化
+
+        Args:
+            engine: 提供标识符和数据负载的ICMP引擎
+            probes: 启用的探测方式（'icmp'、'tcp'、'arp'）
+            ports: TCP连接探测的端口
+            limiter: 发包速率限制（RateLimiter），每个探测报文取一个令牌
+            tick: 同时有ICMP和其他探测时，检查ICMP应答的间隔（秒）
+        """
+        self.engine = engine
+        self.probes = tuple(probes)
+        self.ports = tuple(ports)
+        self.limiter = limiter
+        self.tick = tick
+        self.icmp_listener = IcmpReplyListener(engine, limiter=limiter) if 'icmp' in self.probes else None
+
+        self.interfaces: List[Interface] = []
+        if 'arp' in self.probes:
+            try:
+                self.interfaces = list_interfaces()
+            except (OSError, AttributeError):
+                self.interfaces = []
+
+    def close(self):
+        """关闭共享的ICMP套接字"""
+        if self.icmp_listener is not None:
+            self.icmp_listener.close()
+
+    def _interface_for(self, ip: str) -> Optional[Interface]:
+        """目标所在的直连网段接口（ARP只在本链路上有效）"""
+        address = ipaddress.ip_address(ip)
+        for interface in self.interfaces:
+            if address in interface.network and ip != interface.ip:
+                return interface
+        return None
+
+    def _packet_count(self, ip: str) -> int:
+        count = len(self.ports) if 'tcp' in self.probes else 0
+        if 'icmp' in self.probes:
+            count += 1
+        if 'arp' in self.probes and self._interface_for(ip) is not None:
+            count += 1
+        return count
+
+    def probe(self, ip: str, timeout: float) -> Optional[Proof]:
+        """
+        同时用所有启用的方式探测一个主机
+
+        Args:
+            ip: 目标IP地址
+            timeout: 超时时间（秒）
+
+        Returns:
+            第一个肯定应答，全部超时或失败时返回None
+        """
+        if self.limiter is not None:
+            self.limiter.acquire(max(1, self._packet_count(ip)))
+
+        selector = selectors.DefaultSelector()
+        sockets: List[socket.socket] = []
+        start = time.perf_counter()
+        deadline = start + timeout
+        icmp: Optional[Future] = None
+
+        try:
+            if self.icmp_listener is not None and self.engine.available():
+                icmp = self._start_icmp(ip)
+            if 'arp' in self.probes:
+                self._start_arp(ip, selector, sockets)
+            if 'tcp' in self.probes:
+                for port in self.ports:
+                    proof = self._start_tcp(ip, port, selector, sockets, start)
+                    if proof is not None:
+                        return proof
+
+            while icmp is not None or selector.get_map():
+                if icmp is not None and icmp.done():
+                    reply = icmp.result()
+                    if reply is not None:
+                        return Proof(method="ICMP", rtt=reply.rtt, ttl=reply.ttl)
+                    icmp = None
+                    continue
+
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                if not selector.get_map():
+                    # 只剩ICMP探测，等监听线程交付应答
+                    wait([icmp], remaining)
+                    continue
+                # ICMP应答在监听线程中到达，有ICMP探测时按 tick 检查
+                for key, _ in selector.select(min(remaining, self.tick) if icmp is not None else remaining):
+                    proof = self._handle(ip, key, selector, start)
+                    if proof is not None:
+                        return proof
+            return None
+        finally:
+            # 放弃其余探测：取消ICMP等待，关闭套接字，未完成的连接随之取消
+            if icmp is not None:
+                icmp.cancel()
+            selector.close()
+            for sock in sockets:
+                sock.close()
+
+    def _start_icmp(self, ip: str) -> Optional[Future]:
+        try:
+            return self.icmp_listener.send(ip)
+        except OSError:
+            return None
+
+    def _start_arp(self, ip: str, selector, sockets: List[socket.socket]):
+        interface = self._interface_for(ip)
+        if interface is None:
+            return
+        try:
+            sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+        except (OSError, AttributeError):
+            # 没有权限或不是Linux，跳过ARP探测
+            return
+        sockets.append(sock)
+        try:
+            sock.bind((interface.name, ETH_P_ARP))
+            sock.setblocking(False)
+            sock.send(build_arp_request(interface.mac, interface.ip, ip))
+        except OSError:
+            return
+        selector.register(sock, selectors.EVENT_READ, ('arp',))
+
+    def _start_tcp(self, ip: str, port: int, selector, sockets: List[socket.socket],
+                   start: float) -> Optional[Proof]:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sockets.append(sock)
+        sock.setblocking(False)
+        err = sock.connect_ex((ip, port))
+        if err == 0 or err in _CONNECT_REFUSED:
+            return Proof(method=f"TCP/{port}", rtt=(time.perf_counter() - start) * 1000)
+        if err in _CONNECT_PENDING:
+            selector.register(sock, selectors.EVENT_WRITE, ('tcp', port))
+        elif err in _CONNECT_UNREACHABLE and self.limiter is not None:
+            self.limiter.on_unreachable()
+        return None
+
+    def _handle(self, ip: str, key, selector, start: float) -> Optional[Proof]:
+        """处理一个就绪的探测套接字，得到肯定应答时返回Proof"""
+        sock = key.fileobj
+        kind = key.data[0]
+        now = time.perf_counter()
+
+        if kind == 'tcp':
+            selector.unregister(sock)
+            err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if err == 0 or err in _CONNECT_REFUSED:
+                return Proof(method=f"TCP/{key.data[1]}", rtt=(now - start) * 1000)
+            if err in _CONNECT_UNREACHABLE and self.limiter is not None:
+                self.limiter.on_unreachable()
+            return None
+
+        # ARP套接字可能收到其他主机的应答，读空后继续等待
+        while True:
+            try:
+                data = sock.recv(2048)
+            except (BlockingIOError, InterruptedError):
+                return None
+            except OSError:
+                selector.unregister(sock)
+                return None
+
+            parsed = parse_arp_reply(data)
+            if parsed is not None and parsed[0] == ip:
+                return Proof(method="ARP", rtt=(now - start) * 1000, mac=format_mac(parsed[1]))
+
+    async def arp_probe_async(self, ip: str, timeout: float) -> Optional[Proof]:
+        """
+        异步ARP探测（目标不在直连网段或无法打开 AF_PACKET 套接字时直接返回None）
+        """
+        interface = self._interface_for(ip)
+        if interface is None:
+            return None
+        try:
+            sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ARP))
+        except (OSError, AttributeError):
+            return None
+
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        deadline = start + timeout
+        try:
+            sock.bind((interface.name, ETH_P_ARP))
+            sock.setblocking(False)
+            await loop.sock_sendall(sock, build_arp_request(interface.mac, interface.ip, ip))
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                try:
+                    frame = await asyncio.wait_for(loop.sock_recv(sock, 2048), remaining)
+                except asyncio.TimeoutError:
+                    return None
+                parsed = parse_arp_reply(frame)
+                if parsed is not None and parsed[0] == ip:
+                    rtt = (time.perf_counter() - start) * 1000
+                    return Proof(method="ARP", rtt=rtt, mac=format_mac(parsed[1]))
+        except OSError:
+            return None
+        finally:
+            sock.close()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地链路名称解析模块（mDNS / LLMNR）
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import socket
+import struct
+from concurrent.futures import Future
+from typing import Tuple
+
+try:
+    from .rdns import PtrResult, RCODE_NOERROR, CLASS_IN, TYPE_PTR, encode_name, parse_ptr_response, reverse_name
+    from .udpclient import UdpQueryClient
+except ImportError:  # 直接运行时
+    from rdns import PtrResult, RCODE_NOERROR, CLASS_IN, TYPE_PTR, encode_name, parse_ptr_response, reverse_name
+    from udpclient import UdpQueryClient
+
+MDNS_GROUP = "224.0.0.251"
+MDNS_PORT = 5353
+LLMNR_PORT = 5355
+
+
+def build_local_ptr_query(query_id: int, name: str) -> bytes:
+    """构造不请求递归的PTR查询（mDNS传统单播查询和LLMNR都使用DNS报文格式）"""
+    header = struct.pack('!HHHHHH', query_id, 0, 1, 0, 0, 0)
+    return header + encode_name(name) + struct.pack('!HH', TYPE_PTR, CLASS_IN)
+
+
+class _LocalPtrClient(UdpQueryClient):
+    """本地链路PTR查询的公共部分：只接受带PTR记录的应答，否则等到超时"""
+
+    def query(self, ip: str) -> Future:
+        """
+        发出一个反向查询
+
+        Returns:
+            结果为 PtrResult 的Future，没有应答时 hostname 为None
+        """
+        return self._submit(ip, reverse_name(ip))
+
+    def _build(self, query, query_id: int) -> bytes:
+        return build_local_ptr_query(query_id, query.name)
+
+    def _parse(self, message: bytes, address: Tuple[str, int]):
+        parsed = parse_ptr_response(message)
+        if parsed is None:
+            return None
+        return parsed[0], (address[0],) + parsed[1:]
+
+    def _accept_source(self, query, source: str) -> bool:
+        return True
+
+    def _result(self, query, parsed):
+        source, rcode, qname, hostname, ttl = parsed
+        if qname.lower() != query.name.lower() or not self._accept_source(query, source):
+            return None
+        if rcode != RCODE_NOERROR or not hostname:
+            # 其他响应者的否定应答，继续等待真正的所有者
+            return None
+        return PtrResult(ip=query.ip, hostname=hostname.rstrip('.'), ttl=ttl, rcode=rcode)
+
+    def _empty_result(self, query) -> PtrResult:
+        return PtrResult(ip=query.ip, hostname=None)
+
+
+class MdnsResolver(_LocalPtrClient):
+    """
+    mDNS反向解析
+
+    从临时端口向 224.0.0.251:5353 发出传统单播（legacy unicast）查询，
+    拥有该地址的响应者把应答单播回来并带上原查询ID，因此不需要占用5353端口
+    或加入组播组，所有查询共用一个套接字。只能解析本地链路上的主机。
+    """
+
+    thread_name = "mdns-receiver"
+
+    def __init__(self, group: str = MDNS_GROUP, port: int = MDNS_PORT, timeout: float = 1.0,
+                 retries: int = 0, max_inflight: int = 512, tick: float = 0.01):
+        """
+        初始化解析器
+
+        Args:
+            group: 查询发往的地址（默认mDNS组播地址）
+            port: 目标端口
+            timeout: 收集应答的时间（秒）
+            retries: 超时后的重试次数
+            max_inflight: 同时在途的最大查询数
+            tick: 时间轮粒度及接收线程的轮询间隔（秒）
+        """
+        super().__init__(timeout=timeout, retries=retries, max_inflight=max_inflight, tick=tick)
+        self.group = group
+        self.port = port
+
+    def _open_socket(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # RFC 6762 要求组播报文的TTL为255
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 255)
+        return sock
+
+    def _destination(self, query) -> Tuple[str, int]:
+        return self.group, self.port
+
+
+class LlmnrResolver(_LocalPtrClient):
+    """
+    LLMNR反向解析
+
+    RFC 4795 规定反向查询直接单播到被查询的地址（UDP 5355），
+    只接受来自该地址的应答。
+    """
+
+    thread_name = "llmnr-receiver"
+
+    def __init__(self, port: int = LLMNR_PORT, timeout: float = 1.0, retries: int = 0,
+                 max_inflight: int = 512, tick: float = 0.01):
+        """
+        初始化解析器
+
+        Args:
+            port: 目标端口
+            timeout: 收集应答的时间（秒）
+            retries: 超时后的重试次数
+            max_inflight: 同时在途的最大查询数
+            tick: 时间轮粒度及接收线程的轮询间隔（秒）
+        """
+        super().__init__(timeout=timeout, retries=retries, max_inflight=max_inflight, tick=tick)
+        self.port = port
+
+    def _destination(self, query) -> Tuple[str, int]:
+        return query.ip, self.port
+
+    def _accept_source(self, query, source: str) -> bool:
+        return source == query.ip
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+主机名缓存模块
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class CacheEntry:
+    """一条主机名缓存"""
+    hostname: Optional[str]  # None 表示确认没有名称（否定缓存）
+    expires: float           # 过期时间（Unix时间戳，便于保存到磁盘）
+    source: str = 'dns'      # 名称来源：dns / netbios 等
+
+    @property
+    def negative(self) -> bool:
+        return self.hostname is None
+
+
+class HostnameCache:
+    """
+    按IP缓存的主机名
+
+    肯定结果按记录自身的TTL缓存（限制在 [min_ttl, max_ttl] 内），确认查不到的
+    结果以较短的 negative_ttl 缓存；超过 max_entries 时淘汰最久未使用的条目。
+    可以保存为JSON文件，下次运行时加载，重复扫描同一网段时几乎不再需要查询。
+    """
+
+    VERSION = 1
+
+    def __init__(self, max_entries: int = 65536, negative_ttl: float = 300, min_ttl: float = 60,
+                 max_ttl: float = 86400, default_ttl: float = 3600):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最大条目数
+            negative_ttl: 否定结果的缓存时间（秒）
+            min_ttl: 肯定结果的最短缓存时间（秒）
+            max_ttl: 肯定结果的最长缓存时间（秒）
+            default_ttl: 来源没有TTL时（如NetBIOS）的缓存时间（秒）
+        """
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, ip: str) -> Optional[CacheEntry]:
+        """
+        查找未过期的缓存
+
+        Returns:
+            缓存条目（hostname 为None表示否定缓存），没有缓存或已过期时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(ip)
+            if entry is not None and entry.expires <= time.time():
+                del self._entries[ip]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(ip)
+            self.hits += 1
+            return entry
+
+    def put(self, ip: str, hostname: str, ttl: Optional[float] = None, source: str = 'dns'):
+        """
+        缓存一个名称
+
+        Args:
+            ip: IP地址
+            hostname: 主机名
+            ttl: 记录的TTL（秒），为None时使用 default_ttl
+            source: 名称来源
+        """
+        ttl = self.default_ttl if ttl is None else min(max(ttl, self.min_ttl), self.max_ttl)
+        self._store(ip, CacheEntry(hostname, time.time() + ttl, source))
+
+    def put_negative(self, ip: str, source: str = 'dns'):
+        """缓存“确认没有名称”的结果"""
+        self._store(ip, CacheEntry(None, time.time() + self.negative_ttl, source))
+
+    def _store(self, ip: str, entry: CacheEntry):
+        with self._lock:
+            self._entries[ip] = entry
+            self._entries.move_to_end(ip)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def load(self, filename: str) -> int:
+        """
+        从文件加载缓存（跳过已过期的条目），文件不存在或格式错误时忽略
+
+        Returns:
+            加载的条目数
+        """
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if not isinstance(data, dict) or data.get('version') != self.VERSION:
+            return 0
+
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            for item in data.get('entries', []):
+                try:
+                    ip, hostname, expires, source = item
+                except (TypeError, ValueError):
+                    continue
+                if expires <= now:
+                    continue
+                self._entries[ip] = CacheEntry(hostname, expires, source)
+                self._entries.move_to_end(ip)
+                loaded += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return loaded
+
+    def save(self, filename: str):
+        """
+        保存未过期的条目（按使用顺序，先写入临时文件再替换，中途退出不会损坏原文件）
+
+        Raises:
+            OSError: 写入失败
+        """
+        now = time.time()
+        with self._lock:
+            entries = [[ip, entry.hostname, entry.expires, entry.source]
+                       for ip, entry in self._entries.items() if entry.expires > now]
+
+        directory = os.path.dirname(os.path.abspath(filename))
+        os.makedirs(directory, exist_ok=True)
+        temp = f"{filename}.tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.VERSION, 'entries': entries}, f, ensure_ascii=False)
+        os.replace(temp, filename)
+
+    def __len__(self) -> int:
+        return len(self._entries)
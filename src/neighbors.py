@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+邻居表（ARP缓存）快照模块
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import os
+import platform
+import re
+import subprocess
+import threading
+import time
+from typing import Dict, Optional
+
+PROC_NET_ARP = "/proc/net/arp"
+
+# ARP表项标志：ATF_COM 表示已解析完成
+ATF_COM = 0x02
+
+# 匹配 arp -a 输出中的 IP 和 MAC：
+# Windows: "  192.168.1.1           00-11-22-33-44-55     动态"
+# macOS:   "? (192.168.1.1) at 0:11:22:33:44:55 on en0 ifscope [ethernet]"
+_ARP_LINE = re.compile(
+    r'(\d+\.\d+\.\d+\.\d+)\)?\s+(?:at\s+)?([0-9A-Fa-f]{1,2}(?:[:-][0-9A-Fa-f]{1,2}){5})'
+)
+
+
+def normalize_mac(mac: str) -> str:
+    """统一为大写、冒号分隔、每段两位的格式（macOS会省略前导0）"""
+    parts = re.split(r'[:-]', mac)
+    return ':'.join(part.zfill(2).upper() for part in parts)
+
+
+def parse_proc_net_arp(text: str) -> Dict[str, str]:
+    """解析 /proc/net/arp 内容为 IP -> MAC 字典"""
+    table = {}
+    for line in text.splitlines()[1:]:
+        fields = line.split()
+        if len(fields) < 4:
+            continue
+        ip, _, flags, mac = fields[:4]
+        try:
+            if not int(flags, 16) & ATF_COM:
+                continue
+        except ValueError:
+            continue
+        if mac == "00:00:00:00:00:00":
+            continue
+        table[ip] = normalize_mac(mac)
+    return table
+
+
+def parse_arp_output(text: str) -> Dict[str, str]:
+    """解析 arp -a 输出为 IP -> MAC 字典"""
+    table = {}
+    for line in text.splitlines():
+        match = _ARP_LINE.search(line)
+        if match:
+            mac = normalize_mac(match.group(2))
+            if mac not in ("00:00:00:00:00:00", "FF:FF:FF:FF:FF:FF"):
+                table[match.group(1)] = mac
+    return table
+
+
+class NeighborTable:
+    """
+    内核邻居表快照
+
+    每次扫描只整体读取一次邻居表（Linux读 /proc/net/arp，其他系统运行一次
+    arp -a），之后按IP O(1) 查找；查不到时最多每 refresh_interval 秒重新读取一次。
+    """
+
+    def __init__(self, refresh_interval: float = 1.0):
+        """
+        初始化邻居表
+
+        Args:
+            refresh_interval: 两次读取之间的最短间隔（秒）
+        """
+        self.refresh_interval = refresh_interval
+        self._table: Dict[str, str] = {}
+        self._last_refresh = 0.0
+        self._available = True
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        """邻居表是否可读（最近一次读取成功）"""
+        return self._available
+
+    def _read(self) -> Optional[Dict[str, str]]:
+        """读取一次邻居表，失败时返回None"""
+        if os.path.exists(PROC_NET_ARP):
+            try:
+                with open(PROC_NET_ARP, 'r', encoding='utf-8') as f:
+                    return parse_proc_net_arp(f.read())
+            except OSError:
+                return None
+
+        try:
+            kwargs = {}
+            encoding = 'utf-8'
+            if platform.system() == "Windows":
+                kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
+                encoding = 'gbk'
+            output = subprocess.run(
+                ["arp", "-a"] if platform.system() == "Windows" else ["arp", "-an"],
+                capture_output=True,
+                text=True,
+                encoding=encoding,
+                timeout=5,
+                **kwargs
+            ).stdout
+            return parse_arp_output(output)
+        except Exception:
+            return None
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        重新读取邻居表
+
+        Args:
+            force: 是否忽略最短间隔
+
+        Returns:
+            是否实际读取了邻居表
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return False
+            self._last_refresh = now
+
+            table = self._read()
+            self._available = table is not None
+            if table is not None:
+                self._table = table
+            return True
+
+    def lookup(self, ip: str) -> Optional[str]:
+        """
+        查找IP对应的MAC地址
+
+        Returns:
+            MAC地址，邻居表中没有该IP时返回None
+        """
+        mac = self._table.get(ip)
+        if mac is None and self.refresh():
+            mac = self._table.get(ip)
+        return mac
+
+    def __len__(self) -> int:
+        return len(self._table)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+NetBIOS节点状态（NBSTAT）查询模块
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import struct
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+try:
+    from .rdns import decode_name
+    from .udpclient import UdpQueryClient
+except ImportError:  # 直接运行时
+    from rdns import decode_name
+    from udpclient import UdpQueryClient
+
+NETBIOS_NS_PORT = 137
+TYPE_NBSTAT = 0x21
+CLASS_IN = 1
+FLAG_RESPONSE = 0x8000
+
+# 名称表项标志：组名
+NAME_FLAG_GROUP = 0x8000
+# 名称后缀：<00> 为工作站服务
+SUFFIX_WORKSTATION = 0x00
+
+# 通配名称 "*" 的一级编码（RFC 1002 4.1）
+WILDCARD_NAME = b'\x20' + b'CK' + b'A' * 30 + b'\x00'
+
+
+@dataclass
+class NetbiosResult:
+    """一次NBSTAT查询的结果"""
+    ip: str
+    name: Optional[str] = None       # <00> UNIQUE 名称（计算机名）
+    workgroup: Optional[str] = None  # <00> GROUP 名称（工作组或域）
+    mac: Optional[str] = None        # 应答中的网卡地址
+
+
+def build_nbstat_query(transaction_id: int) -> bytes:
+    """构造NBSTAT查询报文"""
+    header = struct.pack('!HHHHHH', transaction_id, 0, 1, 0, 0, 0)
+    return header + WILDCARD_NAME + struct.pack('!HH', TYPE_NBSTAT, CLASS_IN)
+
+
+def parse_nbstat_response(message: bytes) -> Optional[Tuple[int, List[Tuple[str, int, int]], Optional[str]]]:
+    """
+    解析NBSTAT应答
+
+    Returns:
+        (事务ID, [(名称, 后缀, 标志), ...], MAC地址)，不是NBSTAT应答时返回None
+    """
+    try:
+        transaction_id, flags, _, ancount, _, _ = struct.unpack('!HHHHHH', message[:12])
+        if not flags & FLAG_RESPONSE or ancount < 1:
+            return None
+
+        _, offset = decode_name(message, 12)
+        rtype, _, _, _ = struct.unpack('!HHIH', message[offset:offset + 10])
+        if rtype != TYPE_NBSTAT:
+            return None
+        offset += 10
+
+        count = message[offset]
+        offset += 1
+        names = []
+        for _ in range(count):
+            entry = message[offset:offset + 18]
+            if len(entry) < 18:
+                return None
+            name = entry[:15].decode('ascii', errors='replace').rstrip(' \x00')
+            suffix = entry[15]
+            name_flags = struct.unpack('!H', entry[16:18])[0]
+            names.append((name, suffix, name_flags))
+            offset += 18
+
+        mac = None
+        unit_id = message[offset:offset + 6]
+        if len(unit_id) == 6 and unit_id != b'\x00' * 6:
+            mac = ':'.join(f"{b:02X}" for b in unit_id)
+    except (struct.error, ValueError, IndexError):
+        return None
+    return transaction_id, names, mac
+
+
+class NetbiosClient(UdpQueryClient):
+    """
+    批量NetBIOS名称查询客户端
+
+    从一个UDP套接字向所有目标的137端口发出NBSTAT请求，并发接收应答，
+    取名称表中的 <00> UNIQUE 名称作为主机名。整个网段的查询大约在一个
+    超时周期内完成，不再为每个主机启动 nmblookup/nbtstat 进程。
+    """
+
+    thread_name = "netbios-receiver"
+
+    def __init__(self, port: int = NETBIOS_NS_PORT, timeout: float = 1.0, retries: int = 1,
+                 max_inflight: int = 512, tick: float = 0.01):
+        """
+        初始化客户端
+
+        Args:
+            port: 目标端口
+            timeout: 单次请求的超时时间（秒）
+            retries: 超时后的重试次数
+            max_inflight: 同时在途的最大查询数
+            tick: 时间轮粒度及接收线程的轮询间隔（秒）
+        """
+        super().__init__(timeout=timeout, retries=retries, max_inflight=max_inflight, tick=tick)
+        self.port = port
+
+    def query(self, ip: str) -> Future:
+        """
+        向一个主机发出NBSTAT查询
+
+        Returns:
+            结果为 NetbiosResult 的Future
+        """
+        return self._submit(ip)
+
+    def _destination(self, query) -> Tuple[str, int]:
+        return query.ip, self.port
+
+    def _build(self, query, query_id: int) -> bytes:
+        return build_nbstat_query(query_id)
+
+    def _parse(self, message: bytes, address: Tuple[str, int]):
+        parsed = parse_nbstat_response(message)
+        if parsed is None:
+            return None
+        transaction_id, names, mac = parsed
+        return transaction_id, (address[0], names, mac)
+
+    def _result(self, query, parsed):
+        source, names, mac = parsed
+        if source != query.ip:
+            return None
+
+        result = NetbiosResult(ip=query.ip, mac=mac)
+        for name, suffix, flags in names:
+            if suffix != SUFFIX_WORKSTATION:
+                continue
+            if flags & NAME_FLAG_GROUP:
+                result.workgroup = result.workgroup or name
+            else:
+                result.name = result.name or name
+        return result
+
+    def _empty_result(self, query) -> NetbiosResult:
+        return NetbiosResult(ip=query.ip)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分阶段扫描流水线模块
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import heapq
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+
+
+@dataclass
+class StageStats:
+    """流水线阶段统计"""
+    name: str
+    workers: int
+    processed: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    started: float = 0.0
+    finished: float = 0.0
+
+    def mark(self, now: float):
+        """记录一次处理的时间点"""
+        if not self.started:
+            self.started = now
+        self.finished = now
+
+    @property
+    def elapsed(self) -> float:
+        """从第一次到最后一次处理经过的时间（秒）"""
+        return max(self.finished - self.started, 0.0)
+
+    @property
+    def throughput(self) -> float:
+        """吞吐量（个/秒）"""
+        if self.elapsed <= 0:
+            return float(self.processed)
+        return self.processed / self.elapsed
+
+    def __str__(self) -> str:
+        text = f"{self.name}: {self.processed} 个, {self.throughput:.1f} 个/秒, 并发 {self.workers}"
+        if self.timeouts:
+            text += f", 超时 {self.timeouts}"
+        if self.errors:
+            text += f", 出错 {self.errors}"
+        return text
+
+
+class _Job:
+    """阶段中的一个待处理主机（放行后不再引用主机）"""
+    __slots__ = ('host', 'forwarded', 'armed')
+
+    def __init__(self, host):
+        self.host = host
+        self.forwarded = False
+        self.armed = False  # 是否已放入截止时间堆
+
+
+class EnrichmentStage:
+    """
+    信息补充阶段
+
+    拥有独立的线程池和超时时间。阶段函数接收IP、返回字段值，由阶段负责写回
+    HostInfo；超时的主机保持默认值直接进入下一阶段，之后迟到的结果会被丢弃，
+    因此已经交出去的主机不会再被修改。
+
+    提前完成的主机在截止时间堆中留下的条目到期时才弹出，这类条目超过一半时
+    整理一次堆，避免长时间超时的阶段堆积已完成的任务。
+
+    多个主机共用一个扫描器队列时（端口、服务、UDP阶段），排在后面的主机要等前面的
+    做完，这类阶段设置 deadline_on_start：阶段函数多接收一个 started 回调，
+    扫描器开始处理该主机时调用，超时从这时开始计算。
+    """
+
+    # 堆中条目少于这个数时不整理
+    COMPACT_MIN = 64
+
+    def __init__(self, name: str, field: str, func: Callable[[str], Any], workers: int, timeout: float,
+                 skip: Optional[Callable[[Any], bool]] = None, nonblocking: bool = False,
+                 apply: Optional[Callable[[Any, Any], None]] = None, by_host: bool = False,
+                 deadline_on_start: bool = False):
+        """
+        初始化阶段
+
+        Args:
+            name: 阶段名称（用于统计输出）
+            field: 写回的HostInfo字段名
+            func: 阶段函数，参数为IP地址，返回字段值
+            workers: 线程数
+            timeout: 每个主机在本阶段的最长等待时间（秒）
+            skip: 返回True的主机不经过本阶段直接放行（例如发现阶段已得到该字段）
+            nonblocking: func 是否直接返回结果为字段值的Future（不占用线程池线程，
+                         workers 只用于统计输出）
+            apply: 把结果写回主机的函数 apply(host, value)，默认写到 field 字段
+            by_host: func 的参数是否为整个HostInfo（需要前面阶段的结果时使用）
+            deadline_on_start: 超时是否从 func 的第二个参数 started() 被调用时开始计算
+                               （仅用于 nonblocking，func 须保证返回的Future最终完成）
+        """
+        self.name = name
+        self.field = field
+        self.func = func
+        self.workers = workers
+        self.timeout = timeout
+        self.skip = skip
+        self.nonblocking = nonblocking
+        self.apply = apply
+        self.by_host = by_host
+        self.deadline_on_start = deadline_on_start
+        self.stats = StageStats(name, workers)
+        self._forward: Callable[[Any], None] = lambda host: None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._deadlines: list = []
+        self._settled = 0  # 堆中已放行的条目数
+        self._counter = itertools.count()
+
+    def start(self, forward: Callable[[Any], None]):
+        """启动线程池，forward 用于把处理完的主机交给下一阶段"""
+        self._forward = forward
+        self._stopped = False
+        if not self.nonblocking:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+
+    def submit(self, host):
+        """提交一个主机"""
+        if self.skip is not None and self.skip(host):
+            self._forward(host)
+            return
+
+        job = _Job(host)
+        arg = host if self.by_host else host.ip
+        if not self.deadline_on_start:
+            self._arm(job)
+        try:
+            if self.nonblocking:
+                if self._stopped:
+                    raise RuntimeError("阶段已停止")
+                if self.deadline_on_start:
+                    future = self.func(arg, lambda: self._arm(job))
+                else:
+                    future = self.func(arg)
+            else:
+                future = self._executor.submit(self.func, arg)
+        except Exception:
+            # 线程池已关闭（扫描被停止）或阶段函数提交失败，直接放行
+            with self._lock:
+                self.stats.errors += 1
+            self._release(job)
+            return
+        future.add_done_callback(lambda f: self._complete(job, f))
+
+    def _arm(self, job: _Job):
+        """从现在开始计算任务的超时（重复调用无效）"""
+        with self._lock:
+            if job.armed or job.forwarded:
+                return
+            job.armed = True
+            heapq.heappush(self._deadlines, (time.monotonic() + self.timeout, next(self._counter), job))
+
+    def _settle(self, job: _Job):
+        """
+        提前放行一个仍在堆中的任务（调用方持有锁）
+
+        Returns:
+            任务的主机
+        """
+        host, job.host = job.host, None
+        job.forwarded = True
+        if not job.armed:
+            return host
+        self._settled += 1
+        if self._settled * 2 > len(self._deadlines) >= self.COMPACT_MIN:
+            self._deadlines = [entry for entry in self._deadlines if not entry[2].forwarded]
+            heapq.heapify(self._deadlines)
+            self._settled = 0
+        return host
+
+    def _release(self, job: _Job):
+        with self._lock:
+            if job.forwarded:
+                return
+            host = self._settle(job)
+        self._forward(host)
+
+    def _complete(self, job: _Job, future: Future):
+        with self._lock:
+            if job.forwarded:
+                return
+            host = self._settle(job)
+            try:
+                if self.apply is not None:
+                    self.apply(host, future.result())
+                else:
+                    setattr(host, self.field, future.result())
+                self.stats.processed += 1
+            except Exception:
+                self.stats.errors += 1
+            self.stats.mark(time.monotonic())
+        self._forward(host)
+
+    def expire(self, now: float):
+        """放行所有超时的主机"""
+        expired = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, _, job = heapq.heappop(self._deadlines)
+                if job.forwarded:
+                    self._settled -= 1
+                    continue
+                job.forwarded = True
+                host, job.host = job.host, None
+                self.stats.timeouts += 1
+                self.stats.mark(now)
+                expired.append(host)
+        for host in expired:
+            self._forward(host)
+
+    def shutdown(self):
+        """关闭线程池（不等待仍在运行的任务）"""
+        self._stopped = True
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+
+class ScanPipeline:
+    """
+    分阶段扫描流水线
+
+    发现阶段只负责探测，离线主机直接输出，在线主机依次经过各信息补充阶段，
+    每个阶段有自己的并发数和超时，互不阻塞。
+    """
+
+    _DONE = object()
+
+    def __init__(self, stages: List[EnrichmentStage], discovery_workers: int, tick: float = 0.05):
+        """
+        初始化流水线
+
+        Args:
+            stages: 信息补充阶段（按顺序执行）
+            discovery_workers: 发现阶段的并发数（仅用于统计输出）
+            tick: 超时检查间隔（秒）
+        """
+        self.stages = stages
+        self.tick = tick
+        self.discovery_stats = StageStats("发现", discovery_workers)
+        self._stopped = threading.Event()
+
+    @property
+    def stats(self) -> List[StageStats]:
+        """各阶段统计"""
+        return [self.discovery_stats] + [stage.stats for stage in self.stages]
+
+    def stop(self):
+        """停止流水线"""
+        self._stopped.set()
+
+    def run(self, discovered: Iterable) -> Iterator:
+        """
+        运行流水线
+
+        Args:
+            discovered: 发现阶段产出的HostInfo（只含探测结果）
+
+        Yields:
+            完成所有阶段的HostInfo，按完成顺序产出
+        """
+        output: "queue.Queue" = queue.Queue()
+        lock = threading.Lock()
+        state = {'in_flight': 0, 'discovery_done': False}
+
+        def finish(host):
+            output.put(host)
+            with lock:
+                state['in_flight'] -= 1
+                done = state['discovery_done'] and state['in_flight'] == 0
+            if done:
+                output.put(self._DONE)
+
+        # 串联各阶段
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.start(next_stage.submit)
+        if self.stages:
+            self.stages[-1].start(finish)
+
+        def discover():
+            stats = self.discovery_stats
+            try:
+                for host in discovered:
+                    if self._stopped.is_set():
+                        break
+                    stats.processed += 1
+                    stats.mark(time.monotonic())
+
+                    if host.status == '在线' and self.stages:
+                        with lock:
+                            state['in_flight'] += 1
+                        self.stages[0].submit(host)
+                    else:
+                        output.put(host)
+            except Exception as e:
+                print(f"发现阶段出错: {e}")
+                stats.errors += 1
+            finally:
+                close = getattr(discovered, 'close', None)
+                if close is not None:
+                    close()
+                with lock:
+                    state['discovery_done'] = True
+                    done = state['in_flight'] == 0
+                if done:
+                    output.put(self._DONE)
+
+        def monitor():
+            while not self._stopped.wait(self.tick):
+                now = time.monotonic()
+                for stage in self.stages:
+                    stage.expire(now)
+
+        threads = [
+            threading.Thread(target=discover, name="pipeline-discovery", daemon=True),
+            threading.Thread(target=monitor, name="pipeline-monitor", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                item = output.get()
+                if item is self._DONE:
+                    break
+                yield item
+        finally:
+            self._stopped.set()
+            for thread in threads:
+                thread.join()
+            for stage in self.stages:
+                stage.shutdown()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TCP端口扫描模块（selectors/epoll 非阻塞连接）
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import collections
+import errno
+import os
+import selectors
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows没有resource模块
+    resource = None
+
+try:
+    from .icmp import TimeoutWheel
+except ImportError:  # 直接运行时
+    from icmp import TimeoutWheel
+
+# 最常见的TCP端口（按出现频率排序），"topN" 取前N个
+TOP_PORTS: List[int] = [
+    80, 23, 443, 21, 22, 25, 3389, 110, 445, 139, 143, 53, 135, 3306, 8080, 1723, 111, 995, 993, 5900,
+    1025, 587, 8888, 199, 1720, 465, 548, 113, 81, 6001, 10000, 514, 5060, 179, 1026, 2000, 8443, 8000,
+    32768, 554, 26, 1433, 49152, 2001, 515, 8008, 49154, 1027, 5666, 646, 5000, 5631, 631, 49153, 8081,
+    2049, 88, 79, 5800, 106, 2121, 1110, 49155, 6000, 513, 990, 5357, 427, 49156, 543, 544, 5101, 144,
+    7, 389, 8009, 3128, 444, 9999, 5009, 7070, 5190, 3000, 5432, 1900, 3986, 13, 1029, 9, 5051, 6646,
+    49157, 1028, 873, 1755, 2717, 4899, 9100, 119, 37,
+]
+
+# 非阻塞connect的"进行中"错误码（Windows上为WSAEWOULDBLOCK）
+_CONNECT_PENDING = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY,
+                    getattr(errno, 'WSAEWOULDBLOCK', 10035)}
+# 套接字用尽
+_NO_DESCRIPTORS = {errno.EMFILE, errno.ENFILE, errno.ENOBUFS}
+
+
+def parse_ports(text: str) -> List[int]:
+    """
+    解析端口列表
+
+    支持逗号分隔的单个端口、范围和常用端口预设，例如 "22,80,8000-8100,top100"，
+    重复的端口只保留第一次出现的位置。
+
+    Raises:
+        ValueError: 格式错误或端口超出 1-65535
+    """
+    ports: Dict[int, None] = {}
+    for item in text.split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        if item.startswith('top'):
+            count = int(item[3:].lstrip('-'))
+            if not 0 < count <= len(TOP_PORTS):
+                raise ValueError(f"常用端口预设最多 top{len(TOP_PORTS)}: {item}")
+            ports.update(dict.fromkeys(TOP_PORTS[:count]))
+        elif '-' in item:
+            start, end = (int(part) for part in item.split('-', 1))
+            if not 0 < start <= end <= 65535:
+                raise ValueError(f"无效的端口范围: {item}")
+            ports.update(dict.fromkeys(range(start, end + 1)))
+        else:
+            port = int(item)
+            if not 0 < port <= 65535:
+                raise ValueError(f"无效的端口: {item}")
+            ports[port] = None
+    if not ports:
+        raise ValueError(f"没有端口: {text}")
+    return list(ports)
+
+
+def fd_budget(reserve: int = 256, cap: int = 8192) -> int:
+    """
+    端口扫描可同时打开的套接字数
+
+    取 RLIMIT_NOFILE 软限制减去进程已打开的描述符和 reserve 个余量（留给发现阶段、
+    名称查询和输出文件），最多 cap 个。Windows上 select 最多监视512个套接字。
+    """
+    if resource is None:
+        return 500
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return cap
+    try:
+        used = len(os.listdir('/proc/self/fd'))
+    except OSError:
+        used = 0
+    return max(16, min(cap, soft - used - reserve))
+
+
+class _Scan:
+    """一个主机的端口扫描任务"""
+    __slots__ = ('ip', 'ports', 'index', 'remaining', 'open_ports', 'future', 'on_start')
+
+    def __init__(self, ip: str, ports: List[int], future: Future,
+                 on_start: Optional[Callable[[], None]] = None):
+        self.ip = ip
+        self.ports = ports
+        self.index = 0
+        self.remaining = len(ports)
+        self.open_ports: List[int] = []
+        self.future = future
+        self.on_start = on_start
+
+
+class PortScanner:
+    """
+    TCP连接端口扫描器
+
+    一个后台线程通过 selectors（Linux上为epoll）同时驱动成千上万个非阻塞connect：
+    连接建立即为开放端口，收到RST为关闭，到期仍未完成的连接由时间轮关闭并视为过滤。
+    同时打开的套接字数不超过 max_inflight（默认按 RLIMIT_NOFILE 计算），
+    超出的连接排队，按主机提交顺序依次发出。
+    """
+
+    thread_name = "port-scanner"
+
+    def __init__(self, timeout: float = 1.0, max_inflight: Optional[int] = None, limiter=None,
+                 tick: float = 0.01):
+        """
+        初始化扫描器
+
+        Args:
+            timeout: 每个连接的超时时间（秒）
+            max_inflight: 同时进行的最大连接数，默认由 fd_budget() 计算
+            limiter: 发包速率限制（RateLimiter），每个连接取一个令牌
+            tick: 时间轮粒度及轮询间隔（秒）
+        """
+        self.timeout = timeout
+        self.max_inflight = max_inflight or fd_budget()
+        self.limiter = limiter
+        self.tick = tick
+
+        self._lock = threading.Lock()
+        self._backlog: Deque[_Scan] = collections.deque()
+        self._selector: Optional[selectors.BaseSelector] = None
+        # 套接字 -> (任务, 端口, 截止时间)
+        self._inflight: Dict[socket.socket, Tuple[_Scan, int, float]] = {}
+        self._wheel = TimeoutWheel(tick)
+        self._hold_until = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def scan(self, ip: str, ports: List[int], on_start: Optional[Callable[[], None]] = None) -> Future:
+        """
+        提交一个主机的端口扫描
+
+        Args:
+            ip: 目标地址
+            ports: 端口列表
+            on_start: 该主机的第一个连接出队时在扫描线程中调用（排队等待的时间不算超时）
+
+        Returns:
+            结果为开放端口列表（升序）的Future
+        """
+        future: Future = Future()
+        if not ports:
+            future.set_result([])
+            return future
+
+        with self._lock:
+            if not self._running:
+                self._selector = selectors.DefaultSelector()
+                self._running = True
+                self._thread = threading.Thread(target=self._loop, name=self.thread_name, daemon=True)
+                self._thread.start()
+            self._backlog.append(_Scan(ip, list(ports), future, on_start))
+        return future
+
+    def close(self):
+        """停止扫描线程，未完成的任务以已发现的开放端口完成"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            thread = self._thread
+        thread.join()
+
+        scans = {scan for scan, _, _ in self._inflight.values()} | set(self._backlog)
+        for sock in self._inflight:
+            sock.close()
+        self._inflight.clear()
+        self._backlog.clear()
+        self._wheel = TimeoutWheel(self.tick)
+        self._selector.close()
+        for scan in scans:
+            self._finish(scan)
+
+    def _finish(self, scan: _Scan):
+        if not scan.future.done():
+            scan.future.set_result(sorted(scan.open_ports))
+
+    def _fail(self, error: Exception):
+        """扫描线程出错退出：所有未完成的任务以该异常结束，下次提交时重新启动线程"""
+        # 持有锁完成清理，scan() 之后才能重新启动线程
+        with self._lock:
+            self._running = False
+            scans = {scan for scan, _, _ in self._inflight.values()} | set(self._backlog)
+            self._backlog.clear()
+            for sock in self._inflight:
+                sock.close()
+            self._inflight.clear()
+            self._wheel = TimeoutWheel(self.tick)
+            self._selector.close()
+        for scan in scans:
+            if not scan.future.done():
+                scan.future.set_exception(error)
+
+    def _done(self, scan: _Scan, port: int, is_open: bool) -> Optional[_Scan]:
+        """记录一个端口的结果，主机全部端口完成时返回该任务"""
+        if is_open:
+            scan.open_ports.append(port)
+        scan.remaining -= 1
+        return scan if scan.remaining == 0 else None
+
+    def _close(self, sock: socket.socket):
+        self._selector.unregister(sock)
+        del self._inflight[sock]
+        sock.close()
+
+    def _connect(self, now: float) -> List[_Scan]:
+        """从队列中发出新的连接，直到达到并发上限"""
+        finished = []
+        while len(self._inflight) < self.max_inflight and now >= self._hold_until:
+            with self._lock:
+                if not self._backlog:
+                    break
+                scan = self._backlog[0]
+                port = scan.ports[scan.index]
+                scan.index += 1
+                if scan.index == len(scan.ports):
+                    self._backlog.popleft()
+            if scan.on_start is not None:
+                scan.on_start()
+                scan.on_start = None
+
+            if self.limiter is not None:
+                # 令牌不足时本次照常发出，之后的连接推迟到令牌补足
+                wait = self.limiter.reserve()
+                if wait > 0:
+                    self._hold_until = now + wait
+
+            try:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            except OSError as e:
+                if e.errno in _NO_DESCRIPTORS:
+                    # 描述符用尽，退回队列等已有连接结束后再发
+                    with self._lock:
+                        if scan.index == len(scan.ports):
+                            self._backlog.appendleft(scan)
+                        scan.index -= 1
+                    break
+                done = self._done(scan, port, False)
+                if done is not None:
+                    finished.append(done)
+                continue
+            sock.setblocking(False)
+            err = sock.connect_ex((scan.ip, port))
+            if err in _CONNECT_PENDING:
+                deadline = now + self.timeout
+                self._inflight[sock] = (scan, port, deadline)
+                self._selector.register(sock, selectors.EVENT_WRITE)
+                self._wheel.add(sock, deadline)
+                continue
+
+            # 立即完成：本机连接可能直接建立，或者立即被拒绝/不可达
+            sock.close()
+            done = self._done(scan, port, err == 0)
+            if done is not None:
+                finished.append(done)
+        return finished
+
+    def _loop(self):
+        try:
+            self._run()
+        except Exception as e:
+            print(f"端口扫描线程出错: {e}")
+            self._fail(e)
+
+    def _run(self):
+        while self._running:
+            if self._inflight:
+                events = self._selector.select(self.tick)
+            else:
+                # 没有连接时 select 在部分平台上会报错，直接等待
+                events = []
+                time.sleep(self.tick)
+
+            finished = []
+            for key, _ in events:
+                sock = key.fileobj
+                scan, port, _ = self._inflight[sock]
+                is_open = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
+                self._close(sock)
+                done = self._done(scan, port, is_open)
+                if done is not None:
+                    finished.append(done)
+
+            now = time.perf_counter()
+            for sock in self._wheel.expire(now):
+                entry = self._inflight.get(sock)
+                if entry is None or entry[2] > now:
+                    continue
+                # 到期仍未建立连接：端口被过滤或主机不应答
+                self._close(sock)
+                done = self._done(entry[0], entry[1], False)
+                if done is not None:
+                    finished.append(done)
+
+            finished.extend(self._connect(now))
+            for scan in finished:
+                self._finish(scan)
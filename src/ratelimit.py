@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+发包速率限制模块（令牌桶与拥塞退避）
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import asyncio
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    全局发包速率限制
+
+    所有探测（ICMP、ARP、TCP连接）发包前都从同一个令牌桶取令牌，令牌按 rate 包/秒
+    补充，最多积累 burst 个。限制器同时统计每个时间窗口内的发包数和应答情况，
+    出现以下任一情况时把速率减半（不低于 min_rate），否则逐步恢复到设定值：
+
+    - 丢包：重试探测收到了应答，说明之前的探测在路上丢失
+    - ICMP不可达风暴：目标不可达报文占发包数的比例过高
+    - 应答率下降：窗口内的应答率低于此前平均水平的一半
+
+    rate 为0时不限速，acquire 立即返回。
+    """
+
+    # 判定拥塞的阈值
+    LOSS_RATIO = 0.05          # 重试应答 / 全部应答
+    UNREACHABLE_RATIO = 0.25   # 不可达报文 / 发包数
+    REPLY_DROP = 0.5           # 应答率 / 平均应答率
+    MIN_WINDOW_PACKETS = 20    # 发包数不足时不调整速率
+
+    def __init__(self, rate: float = 0, burst: int = 0, min_rate: float = 0, interval: float = 1.0):
+        """
+        初始化限速器
+
+        Args:
+            rate: 最大发包速率（包/秒），0为不限速
+            burst: 令牌桶容量，默认为约50毫秒的发包量
+            min_rate: 退避的下限（包/秒），默认为 rate 的1/20
+            interval: 统计窗口长度（秒）
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst or max(1, int(rate / 20))
+        self.min_rate = min_rate or max(1.0, rate / 20)
+        self.interval = interval
+        self.backoffs = 0
+
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._stamp = time.perf_counter()
+
+        # 当前窗口的统计
+        self._window_start = self._stamp
+        self._sent = 0
+        self._replies = 0
+        self._losses = 0
+        self._unreachable = 0
+        # 此前各窗口应答率的平滑平均
+        self._reply_ratio = None
+
+    @property
+    def enabled(self) -> bool:
+        """是否限速"""
+        return self.max_rate > 0
+
+    def reserve(self, count: int = 1) -> float:
+        """
+        预订 count 个令牌
+
+        Returns:
+            发包前需要等待的时间（秒）
+        """
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = time.perf_counter()
+            self._adjust(now)
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= count
+            self._sent += count
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self, count: int = 1):
+        """阻塞到可以发出 count 个包"""
+        wait = self.reserve(count)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, count: int = 1):
+        """acquire 的协程版本"""
+        wait = self.reserve(count)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def on_reply(self, retry: bool = False):
+        """
+        记录一个应答
+
+        Args:
+            retry: 是否为重试探测的应答
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._replies += 1
+            if retry:
+                self._losses += 1
+
+    def on_unreachable(self):
+        """记录一个ICMP目标不可达报文"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._unreachable += 1
+
+    def _adjust(self, now: float):
+        """窗口结束时根据统计调整速率（调用方持有锁）"""
+        if now - self._window_start < self.interval or self._sent < self.MIN_WINDOW_PACKETS:
+            return
+
+        reply_ratio = self._replies / self._sent
+        lossy = (self._losses > self.LOSS_RATIO * self._replies
+                 or self._unreachable > self.UNREACHABLE_RATIO * self._sent)
+        dropped = self._reply_ratio is not None and reply_ratio < self.REPLY_DROP * self._reply_ratio
+
+        if lossy or dropped:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.backoffs += 1
+        else:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+        # 有明确丢包时不更新平均应答率；只是应答率下降时直接以它为新的基准，
+        # 这样扫进大片空地址只退避一次，速率随后恢复
+        if not lossy:
+            if self._reply_ratio is None or dropped:
+                self._reply_ratio = reply_ratio
+            else:
+                self._reply_ratio = 0.75 * self._reply_ratio + 0.25 * reply_ratio
+
+        self._window_start = now
+        self._sent = self._replies = self._losses = self._unreachable = 0
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量反向DNS（PTR）解析模块
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import ipaddress
+import os
+import platform
+import struct
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from .udpclient import UdpQueryClient
+except ImportError:  # 直接运行时
+    from udpclient import UdpQueryClient
+
+RESOLV_CONF = "/etc/resolv.conf"
+
+DNS_PORT = 53
+TYPE_PTR = 12
+CLASS_IN = 1
+FLAG_QR = 0x8000
+FLAG_RD = 0x0100
+
+# 响应码
+RCODE_NOERROR = 0
+RCODE_SERVFAIL = 2
+RCODE_NXDOMAIN = 3
+
+# 解析名称时最多跟随的压缩指针数，防止恶意报文造成死循环
+_MAX_POINTERS = 32
+
+
+@dataclass
+class PtrResult:
+    """一次PTR查询的结果"""
+    ip: str
+    hostname: Optional[str]  # 没有PTR记录或查询超时时为None
+    ttl: int = 0             # 记录的TTL（秒），否定应答或超时为0
+    rcode: int = -1          # DNS响应码，超时为-1
+
+    @property
+    def answered(self) -> bool:
+        """服务器是否给出了确定的答复（有记录，或确认没有记录）"""
+        return self.rcode in (RCODE_NOERROR, RCODE_NXDOMAIN)
+
+
+def read_nameservers(path: str = RESOLV_CONF) -> List[str]:
+    """读取 resolv.conf 中的IPv4 DNS服务器，文件不存在时返回空列表"""
+    servers = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == 'nameserver':
+                    try:
+                        servers.append(str(ipaddress.IPv4Address(fields[1])))
+                    except ValueError:
+                        continue  # 跳过IPv6服务器
+    except OSError:
+        pass
+    return servers
+
+
+def hosts_file_path() -> str:
+    """系统hosts文件路径"""
+    if platform.system() == "Windows":
+        root = os.environ.get('SystemRoot', r'C:\Windows')
+        return os.path.join(root, 'System32', 'drivers', 'etc', 'hosts')
+    return "/etc/hosts"
+
+
+def read_hosts_file(path: Optional[str] = None) -> Dict[str, str]:
+    """读取hosts文件为 IP -> 主机名 字典（同一IP取第一个名称）"""
+    table: Dict[str, str] = {}
+    try:
+        with open(path or hosts_file_path(), 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                fields = line.split('#', 1)[0].split()
+                if len(fields) >= 2 and fields[0] not in table:
+                    table[fields[0]] = fields[1]
+    except OSError:
+        pass
+    return table
+
+
+def reverse_name(ip: str) -> str:
+    """IPv4地址对应的 in-addr.arpa 反向域名"""
+    return '.'.join(reversed(ip.split('.'))) + '.in-addr.arpa'
+
+
+def encode_name(name: str) -> bytes:
+    """域名编码为DNS报文中的标签序列"""
+    data = b''
+    for label in name.rstrip('.').split('.'):
+        raw = label.encode('ascii')
+        data += struct.pack('!B', len(raw)) + raw
+    return data + b'\x00'
+
+
+def decode_name(message: bytes, offset: int) -> Tuple[str, int]:
+    """
+    从报文 offset 处解码域名（支持压缩指针）
+
+    Returns:
+        (域名, 名称之后的偏移)
+
+    Raises:
+        ValueError: 报文格式错误
+    """
+    labels = []
+    end = None
+    pointers = 0
+    while True:
+        if offset >= len(message):
+            raise ValueError("域名超出报文范围")
+        length = message[offset]
+        if length & 0xc0 == 0xc0:
+            if offset + 1 >= len(message):
+                raise ValueError("压缩指针不完整")
+            pointers += 1
+            if pointers > _MAX_POINTERS:
+                raise ValueError("压缩指针过多")
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3f) << 8) | message[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(message[offset:offset + length].decode('ascii', errors='replace'))
+        offset += length
+    return '.'.join(labels), end if end is not None else offset
+
+
+def build_ptr_query(query_id: int, name: str) -> bytes:
+    """构造一个请求递归的PTR查询报文"""
+    header = struct.pack('!HHHHHH', query_id, FLAG_RD, 1, 0, 0, 0)
+    return header + encode_name(name) + struct.pack('!HH', TYPE_PTR, CLASS_IN)
+
+
+def parse_ptr_response(message: bytes) -> Optional[Tuple[int, int, str, Optional[str], int]]:
+    """
+    解析PTR查询的响应
+
+    应答部分可能先出现CNAME（RFC 2317 无类别反向委派），取其中第一条PTR记录。
+
+    Returns:
+        (查询ID, 响应码, 查询的域名, 主机名, TTL)，不是有效响应时返回None
+    """
+    try:
+        query_id, flags, qdcount, ancount, _, _ = struct.unpack('!HHHHHH', message[:12])
+        if not flags & FLAG_QR or qdcount != 1:
+            return None
+        rcode = flags & 0x0f
+
+        qname, offset = decode_name(message, 12)
+        offset += 4
+
+        for _ in range(ancount):
+            _, offset = decode_name(message, offset)
+            rtype, _, ttl, rdlength = struct.unpack('!HHIH', message[offset:offset + 10])
+            offset += 10
+            if rtype == TYPE_PTR:
+                hostname, _ = decode_name(message, offset)
+                return query_id, rcode, qname, hostname.rstrip('.') or None, ttl
+            offset += rdlength
+    except (struct.error, ValueError):
+        return None
+    return query_id, rcode, qname, None, 0
+
+
+class ReverseResolver(UdpQueryClient):
+    """
+    批量反向DNS解析器
+
+    所有PTR查询共用一个UDP套接字，直接发往系统配置的DNS服务器，按查询ID和问题
+    名称匹配应答；超时或服务器返回SERVFAIL时换下一个服务器重发。
+    """
+
+    thread_name = "rdns-receiver"
+
+    def __init__(self, nameservers: Optional[List[str]] = None, port: int = DNS_PORT,
+                 timeout: float = 1.0, retries: int = 2, max_inflight: int = 512,
+                 tick: float = 0.01):
+        """
+        初始化解析器
+
+        Args:
+            nameservers: DNS服务器IPv4地址列表，默认读取 /etc/resolv.conf
+            port: DNS服务器端口
+            timeout: 单次请求的超时时间（秒）
+            retries: 超时后的重试次数（轮流使用各服务器）
+            max_inflight: 同时在途的最大查询数，超出的查询排队等待
+            tick: 时间轮粒度及接收线程的轮询间隔（秒）
+        """
+        super().__init__(timeout=timeout, retries=retries, max_inflight=max_inflight, tick=tick)
+        self.nameservers = read_nameservers() if nameservers is None else list(nameservers)
+        self.port = port
+
+    def available(self) -> bool:
+        """是否配置了可用的DNS服务器（Windows等没有 resolv.conf 的系统上不可用）"""
+        return bool(self.nameservers)
+
+    def query(self, ip: str) -> Future:
+        """
+        发出一个PTR查询
+
+        Returns:
+            结果为 PtrResult 的Future
+
+        Raises:
+            RuntimeError: 没有配置DNS服务器
+        """
+        if not self.nameservers:
+            raise RuntimeError("没有可用的DNS服务器")
+        return self._submit(ip, reverse_name(ip))
+
+    def _destination(self, query) -> Tuple[str, int]:
+        return self.nameservers[query.attempt % len(self.nameservers)], self.port
+
+    def _build(self, query, query_id: int) -> bytes:
+        return build_ptr_query(query_id, query.name)
+
+    def _parse(self, message: bytes, address: Tuple[str, int]):
+        parsed = parse_ptr_response(message)
+        if parsed is None or address[0] not in self.nameservers:
+            return None
+        return parsed[0], parsed[1:]
+
+    def _result(self, query, parsed):
+        rcode, qname, hostname, ttl = parsed
+        if qname.lower() != query.name.lower():
+            return None
+        if rcode == RCODE_SERVFAIL:
+            # 服务器暂时无法解析，换下一个服务器重试
+            return self.RETRY
+        return PtrResult(ip=query.ip, hostname=hostname, ttl=ttl, rcode=rcode)
+
+    def _empty_result(self, query) -> PtrResult:
+        return PtrResult(ip=query.ip, hostname=None)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+自适应超时模块（SRTT/RTTVAR估计）
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import threading
+from typing import Dict, Optional
+
+try:
+    from .targets import ip_to_int
+except ImportError:  # 直接运行时
+    from targets import ip_to_int
+
+
+class RttEstimator:
+    """
+    RFC 6298 风格的往返时间估计器
+
+    SRTT 和 RTTVAR 按 1/8、1/4 的权重平滑，超时取 SRTT + 4×RTTVAR，
+    并限制在 [floor, ceiling] 内；没有样本时使用 ceiling。
+    """
+
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    def __init__(self, floor: float, ceiling: float):
+        """
+        初始化估计器
+
+        Args:
+            floor: 超时下限（秒）
+            ceiling: 超时上限（秒），也是没有样本时的超时
+        """
+        self.floor = floor
+        self.ceiling = ceiling
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.samples = 0
+
+    def update(self, rtt: float):
+        """加入一个RTT样本（秒）"""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+        self.samples += 1
+
+    def timeout(self) -> float:
+        """当前的超时时间（秒）"""
+        if self.srtt is None:
+            return self.ceiling
+        return min(max(self.srtt + self.K * self.rttvar, self.floor), self.ceiling)
+
+
+class AdaptiveTimeout:
+    """
+    按子网自适应的探测超时
+
+    每个子网（默认 /24）各有一个RTT估计器，由该子网已收到的应答更新，
+    有应答的子网中其余主机不必等满固定超时。还没有应答的子网使用上限：
+    其他子网的RTT不能说明这个子网有多远（局域网样本会让远端网段过早超时）。
+    """
+
+    def __init__(self, floor: float = 0.1, ceiling: float = 2.0, prefix: int = 24):
+        """
+        初始化
+
+        Args:
+            floor: 超时下限（秒）
+            ceiling: 超时上限（秒）
+            prefix: 子网前缀长度
+        """
+        self.floor = floor
+        self.ceiling = ceiling
+        self.prefix = prefix
+        self._mask = (0xffffffff << (32 - prefix)) & 0xffffffff
+        self._global = RttEstimator(floor, ceiling)
+        self._subnets: Dict[int, RttEstimator] = {}
+        self._lock = threading.Lock()
+
+    def _subnet(self, ip: str) -> int:
+        return ip_to_int(ip) & self._mask
+
+    def observe(self, ip: str, rtt_ms: float):
+        """
+        记录一个应答的往返时间
+
+        Args:
+            ip: 应答主机
+            rtt_ms: 往返时间（毫秒）
+        """
+        rtt = rtt_ms / 1000
+        key = self._subnet(ip)
+        with self._lock:
+            estimator = self._subnets.get(key)
+            if estimator is None:
+                estimator = self._subnets[key] = RttEstimator(self.floor, self.ceiling)
+            estimator.update(rtt)
+            self._global.update(rtt)
+
+    def timeout_for(self, ip: str) -> float:
+        """探测 ip 时应使用的超时（秒）"""
+        key = self._subnet(ip)
+        with self._lock:
+            estimator = self._subnets.get(key)
+            return estimator.timeout() if estimator is not None else self.ceiling
+
+    def reset(self):
+        """清空所有样本"""
+        with self._lock:
+            self._global = RttEstimator(self.floor, self.ceiling)
+            self._subnets.clear()
+
+    @property
+    def samples(self) -> int:
+        """已记录的样本数"""
+        return self._global.samples
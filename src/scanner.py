@@ -7,9 +7,11 @@
 学号：542307280233
 """
 
+import asyncio
 import subprocess
 import platform
 import ipaddress
+import random
 import threading
 import queue
 import time
@@ -18,9 +20,50 @@ import struct
 import ctypes
 import os
 import re
-from dataclasses import dataclass
-from typing import List, Dict, Tuple, Optional, Callable
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import functools
+import math
+from dataclasses import dataclass, field
+from typing import List, Dict, Tuple, Optional, Callable, Awaitable, AsyncIterator, Iterable, Iterator, Any, Union
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+
+try:
+    from .icmp import IcmpEngine, IcmpSweeper, AsyncIcmpPinger
+    from .targets import TargetPlan, TargetPermutation, ip_to_int
+    from .exporters import CSV_COLUMNS, CsvSink, JsonLinesSink, field_value, format_ports, format_services, host_to_dict
+    from .pipeline import EnrichmentStage, ScanPipeline
+    from .neighbors import NeighborTable
+    from .arp import ArpSweeper, find_interface
+    from .rdns import ReverseResolver, PtrResult, read_hosts_file
+    from .namecache import HostnameCache
+    from .netbios import NetbiosClient
+    from .localnames import MdnsResolver, LlmnrResolver
+    from .fingerprint import guess_os
+    from .rtt import AdaptiveTimeout
+    from .ratelimit import RateLimiter
+    from .liveness import LivenessProber, Proof
+    from .portscan import PortScanner
+    from .synscan import SynScanner
+    from .banner import BannerGrabber
+    from .udpscan import UdpServiceScanner
+except ImportError:  # 直接运行 scanner.py 时
+    from icmp import IcmpEngine, IcmpSweeper, AsyncIcmpPinger
+    from targets import TargetPlan, TargetPermutation, ip_to_int
+    from exporters import CSV_COLUMNS, CsvSink, JsonLinesSink, field_value, format_ports, format_services, host_to_dict
+    from pipeline import EnrichmentStage, ScanPipeline
+    from neighbors import NeighborTable
+    from arp import ArpSweeper, find_interface
+    from rdns import ReverseResolver, PtrResult, read_hosts_file
+    from namecache import HostnameCache
+    from netbios import NetbiosClient
+    from localnames import MdnsResolver, LlmnrResolver
+    from fingerprint import guess_os
+    from rtt import AdaptiveTimeout
+    from ratelimit import RateLimiter
+    from liveness import LivenessProber, Proof
+    from portscan import PortScanner
+    from synscan import SynScanner
+    from banner import BannerGrabber
+    from udpscan import UdpServiceScanner
 
 # Windows下需要特殊处理
 if platform.system() == "Windows":
@@ -35,25 +78,113 @@ class HostInfo:
     hostname: str = "未知"
     response_time: float = 0.0
     os_type: str = "未知"
+    alive_by: str = "未知"  # 证明主机在线的探测：'ICMP'、'TCP/端口' 或 'ARP'
+    open_ports: List[int] = field(default_factory=list)
+    services: Dict[int, str] = field(default_factory=dict)  # 开放端口 -> 识别出的服务
+    udp_services: Dict[int, str] = field(default_factory=dict)  # UDP端口 -> 服务、"关闭" 或 "过滤"
 
 class NetworkScanner:
     """网络扫描器主类"""
     
-    def __init__(self, max_threads=100, timeout=2):
+    # 无法使用ICMP时，异步扫描用TCP连接探测的端口
+    TCP_PROBE_PORTS = (80, 443, 22, 445, 3389)
+    
+    def __init__(self, max_threads=100, timeout=2, use_native_icmp=True, sweep_mode=False,
+                 exclude=None, exclude_file=None, randomize=False, seed=None, resume_position=0,
+                 use_arp=True, adaptive_timeout=False, min_timeout=0.1, retries=0, retry_backoff=2.0,
+                 rate=0, probes=('icmp',), tcp_ports=None, ports=None,
+                 syn_scan=False, banners=False, udp_ports=None):
         """
         初始化扫描器
         
         Args:
             max_threads: 最大线程数
             timeout: 超时时间（秒）
+            use_native_icmp: 是否优先使用进程内ICMP引擎（不可用时回退到ping命令）
+            sweep_mode: 是否使用单套接字扫描模式（一个发送线程+一个接收线程完成存活探测）
+            exclude: 不扫描的目标（格式与扫描目标相同，可用逗号分隔多个）
+            exclude_file: 排除列表文件，每行一个目标
+            randomize: 是否以伪随机顺序访问目标（避免对同一子网集中突发探测）
+            seed: 随机顺序的种子，为None时随机生成
+            resume_position: 随机顺序下从该位置继续扫描（取自上次扫描的 target_order.resume_position）
+            use_arp: 目标全部位于本机直连网段时是否改用ARP扫描（仅Linux，需要root权限；
+                     指定了 sweep_mode 或多种 probes 时以指定的探测方式为准）
+            adaptive_timeout: 是否按各子网已测得的往返时间自适应调整探测超时（timeout 为上限，
+                              默认关闭；没有应答的子网始终等满 timeout）
+            min_timeout: 自适应超时的下限（秒），应明显大于目标网络的往返时间
+            retries: 未应答主机的重试次数，重试在首轮探测结束后只发给未应答的主机
+            retry_backoff: 每次重试的超时相对上一次的倍数
+            rate: 所有探测共用的最大发包速率（包/秒），出现丢包或拥塞时自动降低，0为不限速
+            probes: 存活探测方式（'icmp'、'tcp'、'arp'），多于ICMP一种时对每个主机同时发出，
+                    第一个肯定应答胜出
+            tcp_ports: TCP连接探测的端口，默认为 TCP_PROBE_PORTS
+            ports: 对在线主机扫描的TCP端口，为空时不做端口扫描
+            syn_scan: 端口扫描是否改用原始套接字SYN扫描（需要root权限，否则退回TCP连接扫描）
+            banners: 是否抓取开放端口的横幅识别服务（需要同时指定 ports）
+            udp_ports: 对在线主机探测的UDP端口，为空时不做UDP探测
         """
         self.max_threads = max_threads
         self.timeout = timeout
+        self.use_native_icmp = use_native_icmp
+        self.sweep_mode = sweep_mode
+        self.exclude = exclude
+        self.exclude_file = exclude_file
+        self.randomize = randomize
+        self.seed = seed
+        self.resume_position = resume_position
+        self.use_arp = use_arp
+        self.adaptive_timeout = adaptive_timeout
+        self.min_timeout = min_timeout
+        self.rtt_estimator = AdaptiveTimeout(min_timeout, timeout)
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.rate = rate
+        self.rate_limiter = RateLimiter(rate)
+        self.probes = tuple(probes)
+        self.tcp_ports = tuple(tcp_ports) if tcp_ports else self.TCP_PROBE_PORTS
+        self.prober = None
+        self.ports = list(ports) if ports else []
+        self.port_timeout = 1.0
+        self.syn_scan = syn_scan
+        self.port_scanner = None
+        self.banners = banners
+        self.banner_timeout = 2.0
+        self.banner_grabber = None
+        self.udp_ports = list(udp_ports) if udp_ports else []
+        self.udp_timeout = 1.0
+        self.udp_scanner = None
+        self.target_order = None
+        
+        # 流水线信息补充阶段的并发数和超时（秒），发现阶段的并发数为 max_threads
+        self.mac_workers = 16
+        self.mac_timeout = 3.0
+        self.hostname_workers = 32
+        self.hostname_timeout = 5.0
+        # 端口、服务、UDP阶段的超时按工作量计算（见 _stage_timeout），另加这段余量
+        self.stage_slack = 5.0
+        self.stage_stats = []
+        self.icmp_engine = IcmpEngine()
+        self.neighbor_table = NeighborTable()
+        self.dns_resolver = ReverseResolver()
+        self.hostname_cache = HostnameCache()
+        self.netbios_client = NetbiosClient()
+        self.use_netbios = True
+        # 仍没有名称的主机再用mDNS和LLMNR批量查询一次
+        self.mdns_resolver = MdnsResolver()
+        self.llmnr_resolver = LlmnrResolver()
+        self.use_local_names = True
+        self.local_name_timeout = 2.0
+        self._hosts_table = None
+        self._sweeper = None
         self.results = []
         self.is_scanning = False
         self.scan_progress = 0
         self.total_targets = 0
         
+    def _can_get_mac(self) -> bool:
+        """能否获取MAC地址：邻居表可读，或具有管理员权限可以调用arp命令"""
+        return self.neighbor_table.available or self._is_windows_admin()
+    
     def _is_windows_admin(self) -> bool:
         """检查是否以管理员权限运行"""
         if platform.system() != "Windows":
@@ -74,21 +205,216 @@ class NetworkScanner:
         Returns:
             (是否在线, 响应时间毫秒)
         """
-        # 获取当前操作系统
-        current_os = platform.system().lower()
+        is_online, response_time, _ = self._ping_with_ttl(ip)
+        return is_online, response_time
+    
+    def _ping_with_ttl(self, ip: str, attempt: int = 0) -> Tuple[bool, float, int]:
+        """
+        Ping并取出应答的TTL
         
-        # 根据操作系统选择ping命令参数
-        if current_os == "windows":
-            # Windows系统
-            return self._ping_windows(ip)
-        elif current_os == "darwin":
-            # macOS系统
-            return self._ping_macos(ip)
+        Args:
+            ip: 目标IP地址
+            attempt: 第几次重试（进程内引擎按 retry_backoff 延长超时，ping命令沿用 timeout）
+        
+        Returns:
+            (是否在线, 响应时间毫秒, 应答TTL)，拿不到TTL时为0
+        """
+        self.rate_limiter.acquire()
+        
+        # 优先使用进程内ICMP引擎
+        result = self._ping_native(ip, attempt)
+        if result is None:
+            # 获取当前操作系统
+            current_os = platform.system().lower()
+            
+            # 根据操作系统选择ping命令参数
+            if current_os == "windows":
+                # Windows系统
+                result = self._ping_windows(ip)
+            elif current_os == "darwin":
+                # macOS系统
+                result = self._ping_macos(ip)
+            else:
+                # Linux和其他Unix-like系统
+                result = self._ping_linux(ip)
+        
+        if result[0]:
+            self.rate_limiter.on_reply(retry=attempt > 0)
+        return result
+    
+    def _ping_native(self, ip: str, attempt: int = 0) -> Optional[Tuple[bool, float, int]]:
+        """
+        使用进程内ICMP引擎Ping
+        
+        Returns:
+            (是否在线, 响应时间毫秒, 应答TTL)，引擎不可用时返回None以回退到ping命令
+        """
+        if not self.use_native_icmp or not self.icmp_engine.available():
+            return None
+        
+        reply = self.icmp_engine.ping(ip, self._probe_timeout(ip, attempt))
+        if reply is None:
+            return False, 0.0, 0
+        self._observe_rtt(ip, reply.rtt)
+        return True, reply.rtt, reply.ttl
+    
+    def _reset_rtt(self):
+        """新的扫描开始时清空RTT样本（超时上限取当前的 timeout）"""
+        self.rtt_estimator = AdaptiveTimeout(min(self.min_timeout, self.timeout), self.timeout)
+    
+    def _reset_rate(self):
+        """新的扫描开始时按当前的 rate 重建限速器"""
+        self.rate_limiter = RateLimiter(self.rate)
+    
+    def _racing(self) -> bool:
+        """是否启用了ICMP以外的存活探测"""
+        return set(self.probes) != {'icmp'}
+    
+    def _reset_prober(self):
+        """新的扫描开始时创建多探测竞速器（与当前的限速器绑定）"""
+        self.prober = None
+        if self._racing():
+            self.prober = LivenessProber(self.icmp_engine, self.probes, self.tcp_ports,
+                                         limiter=self.rate_limiter)
+    
+    def _close_prober(self):
+        if self.prober is not None:
+            self.prober.close()
+    
+    def _reset_port_scanner(self):
+        """新的扫描开始时创建端口扫描器和横幅抓取器（与当前的限速器绑定）"""
+        self.port_scanner = None
+        self.banner_grabber = None
+        if not self.ports:
+            return
+        if self.banners:
+            self.banner_grabber = BannerGrabber(timeout=self.banner_timeout, limiter=self.rate_limiter)
+        if self.syn_scan:
+            if SynScanner.available():
+                self.port_scanner = SynScanner(timeout=self.port_timeout, limiter=self.rate_limiter)
+                return
+            print("无法打开原始套接字（需要root权限），SYN扫描改用TCP连接扫描")
+        self.port_scanner = PortScanner(timeout=self.port_timeout, limiter=self.rate_limiter)
+    
+    def _close_port_scanner(self):
+        if self.port_scanner is not None:
+            self.port_scanner.close()
+        if self.banner_grabber is not None:
+            self.banner_grabber.close()
+    
+    def _reset_udp_scanner(self):
+        """新的扫描开始时创建UDP探测器（与当前的限速器绑定）"""
+        self.udp_scanner = None
+        if self.udp_ports:
+            self.udp_scanner = UdpServiceScanner(timeout=self.udp_timeout, limiter=self.rate_limiter)
+    
+    def _close_udp_scanner(self):
+        if self.udp_scanner is not None:
+            self.udp_scanner.close()
+    
+    def _udp_future(self, ip: str, on_start: Optional[Callable[[], None]] = None) -> Future:
+        """探测在线主机的UDP端口，返回结果为 {端口: 服务或状态} 的Future（on_start 在开始发送该主机的探测时调用）"""
+        return self.udp_scanner.scan(ip, self.udp_ports, on_start)
+    
+    def _port_future(self, ip: str, on_start: Optional[Callable[[], None]] = None) -> Future:
+        """扫描在线主机的端口，返回结果为开放端口列表的Future（on_start 在扫描器开始处理该主机时调用）"""
+        return self.port_scanner.scan(ip, self.ports, on_start)
+    
+    def _service_future(self, host_info: HostInfo, on_start: Optional[Callable[[], None]] = None) -> Future:
+        """抓取主机各开放端口的横幅，返回结果为 {端口: 服务} 的Future（on_start 在开始抓取该主机时调用）"""
+        return self.banner_grabber.grab(host_info.ip, host_info.open_ports, on_start)
+    
+    def _apply_ports(self, host_info: HostInfo, ports: List[int]):
+        """写回开放端口；SYN扫描得到的TTL和窗口大小用来细化操作系统猜测"""
+        host_info.open_ports = ports
+        if isinstance(self.port_scanner, SynScanner):
+            ttl, window = self.port_scanner.fingerprint(host_info.ip)
+            if ttl:
+                os_type = guess_os(ttl, window)
+                if os_type != "未知":
+                    host_info.os_type = os_type
+    
+    def _stage_timeout(self, count: int, per_batch: float, inflight: int) -> float:
+        """
+        排队执行的阶段中每个主机的超时（秒），从扫描器开始处理该主机时算起
+        
+        count 项工作按 inflight 并发分批完成，每批最长 per_batch 秒；限速时再加上按退避下限
+        发出 count 个包的时间。另留一批和 stage_slack 的余量给仍在进行的前一个主机。
+        """
+        timeout = (math.ceil(count / max(1, inflight)) + 1) * per_batch + self.stage_slack
+        if self.rate_limiter.enabled:
+            timeout += count / self.rate_limiter.min_rate
+        return timeout
+    
+    def _port_stage_timeout(self) -> float:
+        """端口阶段每个主机的超时（秒）"""
+        inflight = getattr(self.port_scanner, 'max_inflight', len(self.ports))
+        return self._stage_timeout(len(self.ports), self.port_timeout, inflight)
+    
+    def _service_stage_timeout(self) -> float:
+        """服务阶段每个主机的超时（秒）：开放端口不会多于扫描的端口"""
+        return self._stage_timeout(len(self.ports), self.banner_timeout, self.banner_grabber.max_inflight)
+    
+    def _udp_stage_timeout(self) -> float:
+        """UDP阶段每个主机的超时（秒）：每个端口最多发 retries+1 次"""
+        probes = len(self.udp_ports) * (self.udp_scanner.retries + 1)
+        return self._stage_timeout(probes, self.udp_timeout, self.udp_scanner.max_inflight)
+    
+    async def _await_queued(self, submit: Callable[[Callable[[], None]], Future], timeout: float, default: Any) -> Any:
+        """
+        异步等待共用扫描器的结果，超时与流水线阶段一致：从扫描器开始处理该主机时算起
+        
+        Args:
+            submit: 提交任务的函数，参数为扫描器开始处理时调用的 on_start，返回Future
+            timeout: 开始处理后的超时（秒）
+            default: 超时时返回的值
+        """
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+        
+        def on_start():
+            try:
+                loop.call_soon_threadsafe(started.set)
+            except RuntimeError:
+                # 事件循环已关闭（扫描已结束）
+                pass
+        
+        # shield：超时后不取消扫描器的Future，结果由扫描器自行完成后丢弃
+        future = asyncio.wrap_future(submit(on_start))
+        waiter = asyncio.ensure_future(started.wait())
+        try:
+            await asyncio.wait({future, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return default
+    
+    def _report_progress(self, callback: Callable[[int, int, float], None], completed: int):
+        """调用进度回调：(已完成数, 目标总数, 当前允许的发包速率，不限速时为0)"""
+        callback(completed, self.total_targets, self.rate_limiter.rate)
+    
+    def _probe_timeout(self, ip: str, attempt: int = 0) -> float:
+        """第 attempt 次重试探测 ip 时使用的超时（秒）"""
+        if self.adaptive_timeout:
+            timeout = self.rtt_estimator.timeout_for(ip)
         else:
-            # Linux和其他Unix-like系统
-            return self._ping_linux(ip)
+            timeout = self.timeout
+        return timeout * self.retry_backoff ** attempt
+    
+    def _observe_rtt(self, ip: str, rtt: float):
+        """记录一次应答的往返时间（毫秒）"""
+        if self.adaptive_timeout:
+            self.rtt_estimator.observe(ip, rtt)
+    
+    @staticmethod
+    def _parse_ttl(output: str) -> int:
+        """从ping命令输出中提取应答TTL（"TTL=64" 或 "ttl=64"）"""
+        match = re.search(r'ttl[=:]\s*(\d+)', output, re.IGNORECASE)
+        return int(match.group(1)) if match else 0
     
-    def _ping_windows(self, ip: str) -> Tuple[bool, float]:
+    def _ping_windows(self, ip: str) -> Tuple[bool, float, int]:
         """Windows系统Ping实现"""
         # Windows ping命令参数:
         # -n 次数
@@ -140,7 +466,7 @@ class NetworkScanner:
             is_online = any(indicator in output for indicator in online_indicators)
             
             if not is_online:
-                return False, 0.0
+                return False, 0.0, 0
             
             # 提取响应时间
             response_time = 0.0
@@ -166,19 +492,19 @@ class NetworkScanner:
                         continue
             
             # 如果没找到响应时间，但主机在线，返回默认值
-            return True, response_time
+            return True, response_time, self._parse_ttl(output)
             
         except subprocess.TimeoutExpired:
             # 命令执行超时
-            return False, 0.0
+            return False, 0.0, 0
         except subprocess.CalledProcessError:
             # 命令执行出错
-            return False, 0.0
+            return False, 0.0, 0
         except Exception:
             # 其他异常
-            return False, 0.0
+            return False, 0.0, 0
     
-    def _ping_linux(self, ip: str) -> Tuple[bool, float]:
+    def _ping_linux(self, ip: str) -> Tuple[bool, float, int]:
         """Linux系统Ping实现"""
         # Linux ping命令参数:
         # -c 次数
@@ -226,7 +552,7 @@ class NetworkScanner:
                         break
             
             if not is_online:
-                return False, 0.0
+                return False, 0.0, 0
             
             # 提取响应时间
             response_time = 0.0
@@ -248,16 +574,16 @@ class NetworkScanner:
                     except ValueError:
                         continue
             
-            return True, response_time
+            return True, response_time, self._parse_ttl(output)
             
         except subprocess.TimeoutExpired:
-            return False, 0.0
+            return False, 0.0, 0
         except subprocess.CalledProcessError:
-            return False, 0.0
+            return False, 0.0, 0
         except Exception:
-            return False, 0.0
+            return False, 0.0, 0
     
-    def _ping_macos(self, ip: str) -> Tuple[bool, float]:
+    def _ping_macos(self, ip: str) -> Tuple[bool, float, int]:
         """macOS系统Ping实现"""
         # macOS ping命令参数:
         # -c 次数
@@ -303,7 +629,7 @@ class NetworkScanner:
                         break
             
             if not is_online:
-                return False, 0.0
+                return False, 0.0, 0
             
             # 提取响应时间
             response_time = 0.0
@@ -325,14 +651,14 @@ class NetworkScanner:
                     except ValueError:
                         continue
             
-            return True, response_time
+            return True, response_time, self._parse_ttl(output)
             
         except subprocess.TimeoutExpired:
-            return False, 0.0
+            return False, 0.0, 0
         except subprocess.CalledProcessError:
-            return False, 0.0
+            return False, 0.0, 0
         except Exception:
-            return False, 0.0
+            return False, 0.0, 0
     
     def get_mac_address(self, ip: str) -> str:
         """
@@ -344,6 +670,13 @@ class NetworkScanner:
         Returns:
             MAC地址字符串
         """
+        # 优先查询邻居表快照：整张表一次读取，不再为每个主机运行ping和arp
+        mac = self.neighbor_table.lookup(ip)
+        if mac is not None:
+            return mac
+        if self.neighbor_table.available:
+            return "未知"
+        
         current_os = platform.system().lower()
         
         if current_os == "windows":
@@ -481,63 +814,161 @@ class NetworkScanner:
         Returns:
             主机名
         """
+        # 优先使用批量DNS解析器，不阻塞在系统解析器上；超时按查不到主机名处理
+        if self.dns_resolver.available():
+            try:
+                return self._hostname_future(ip).result(timeout=self.timeout)
+            except FutureTimeout:
+                return "未知"
+        
+        entry = self.hostname_cache.get(ip)
+        if entry is not None:
+            return entry.hostname or "未知"
+        
+        hostname = self._get_hostname_blocking(ip)
+        if hostname in ("未知", ip):
+            # getfqdn 查不到时原样返回IP
+            self.hostname_cache.put_negative(ip)
+            return "未知"
+        self.hostname_cache.put(ip, hostname)
+        return hostname
+    
+    def _get_hostname_blocking(self, ip: str) -> str:
+        """使用系统解析器获取主机名（每次调用可能阻塞到解析器超时）"""
         try:
             # 尝试反向DNS解析
             hostname, _, _ = socket.gethostbyaddr(ip)
             return hostname
         except socket.herror:
-            # 如果反向DNS失败，尝试使用socket.getfqdn
+            # 反向DNS失败，尝试NetBIOS名称，最后使用socket.getfqdn
+            hostname = self._get_hostname_netbios(ip)
+            if hostname != "未知":
+                return hostname
             try:
                 return socket.getfqdn(ip)
-            except:
-                # 最后尝试使用系统命令
-                return self._get_hostname_system(ip)
+            except Exception:
+                return "未知"
         except Exception:
             return "未知"
     
-    def _get_hostname_system(self, ip: str) -> str:
-        """使用系统命令获取主机名"""
-        current_os = platform.system().lower()
+    def _hostname_future(self, ip: str) -> Future:
+        """
+        非阻塞获取主机名：依次查hosts文件、主机名缓存，最后同时发出PTR查询和
+        NetBIOS节点状态查询，优先使用DNS名称，没有PTR记录时使用NetBIOS名称
+        
+        Returns:
+            结果为主机名（查不到时为"未知"）的Future
+        """
+        if self._hosts_table is None:
+            self._hosts_table = read_hosts_file()
+        
+        result: Future = Future()
+        if ip in self._hosts_table:
+            result.set_result(self._hosts_table[ip])
+            return result
+        
+        entry = self.hostname_cache.get(ip)
+        if entry is not None:
+            result.set_result(entry.hostname or "未知")
+            return result
+        
+        answers: Dict[str, Any] = {}
+        lock = threading.Lock()
+        
+        def settle():
+            """两个查询中任一完成时调用（持有锁）"""
+            if result.done():
+                return
+            dns = answers.get('dns')
+            netbios = answers.get('netbios')
+            if dns is not None and dns.hostname:
+                self.hostname_cache.put(ip, dns.hostname, dns.ttl)
+                result.set_result(dns.hostname)
+            elif dns is not None and 'netbios' in answers:
+                if netbios is not None and netbios.name:
+                    self.hostname_cache.put(ip, netbios.name, source='netbios')
+                    result.set_result(netbios.name)
+                    return
+                # DNS确认没有记录时才做否定缓存，超时不缓存，下次扫描重新查询
+                if dns.answered:
+                    self.hostname_cache.put_negative(ip)
+                result.set_result("未知")
         
+        def collect(kind: str, query: Future):
+            with lock:
+                try:
+                    answers[kind] = query.result()
+                    settle()
+                except Exception as e:
+                    if not result.done():
+                        result.set_exception(e)
+        
+        if not self.use_netbios:
+            answers['netbios'] = None
+        else:
+            try:
+                self.netbios_client.query(ip).add_done_callback(lambda f: collect('netbios', f))
+            except OSError:
+                with lock:
+                    answers['netbios'] = None
+                    settle()
         try:
-            if current_os == "windows":
-                # Windows使用nbtstat命令
-                command = ["nbtstat", "-A", ip]
-                output = subprocess.run(
-                    command,
-                    capture_output=True,
-                    text=True,
-                    encoding='gbk',
-                    timeout=2
-                ).stdout
-                
-                # 解析Windows输出中的主机名
-                for line in output.split('\n'):
-                    if "<00>" in line and "UNIQUE" in line:
-                        parts = line.split()
-                        if len(parts) > 0:
-                            return parts[0]
-            else:
-                # Linux/macOS使用nmblookup命令
-                command = ["nmblookup", "-A", ip]
-                output = subprocess.run(
-                    command,
-                    capture_output=True,
-                    text=True,
-                    encoding='utf-8',
-                    timeout=2
-                ).stdout
-                
-                # 解析NetBIOS名称
-                for line in output.split('\n'):
-                    if "<00>" in line and "UNIQUE" in line:
-                        parts = line.split()
-                        if len(parts) > 1:
-                            return parts[0]
-        except Exception:
-            pass
+            self.dns_resolver.query(ip).add_done_callback(lambda f: collect('dns', f))
+        except (OSError, RuntimeError):
+            with lock:
+                answers['dns'] = PtrResult(ip=ip, hostname=None)
+                settle()
+        return result
+    
+    def _local_name_future(self, ip: str) -> Future:
+        """
+        非阻塞查询本地链路名称：同时发出mDNS和LLMNR反向查询，采用先到的名称
         
-        return "未知"
+        Returns:
+            结果为主机名（都没有应答时为"未知"）的Future
+        """
+        result: Future = Future()
+        clients = [('mdns', self.mdns_resolver), ('llmnr', self.llmnr_resolver)]
+        remaining = {'count': len(clients)}
+        lock = threading.Lock()
+        
+        def collect(source: str, query: Future):
+            with lock:
+                remaining['count'] -= 1
+                if result.done():
+                    return
+                try:
+                    hostname = query.result().hostname
+                except Exception:
+                    hostname = None
+                if hostname:
+                    self.hostname_cache.put(ip, hostname, source=source)
+                    result.set_result(hostname)
+                elif remaining['count'] == 0:
+                    result.set_result("未知")
+        
+        for source, client in clients:
+            try:
+                client.query(ip).add_done_callback(lambda f, source=source: collect(source, f))
+            except OSError:
+                empty: Future = Future()
+                empty.set_result(PtrResult(ip=ip, hostname=None))
+                collect(source, empty)
+        return result
+    
+    def _close_name_clients(self):
+        """关闭各名称查询客户端的套接字和接收线程"""
+        for client in (self.dns_resolver, self.netbios_client, self.mdns_resolver, self.llmnr_resolver):
+            client.close()
+    
+    def _get_hostname_netbios(self, ip: str) -> str:
+        """NBSTAT查询NetBIOS计算机名（<00> UNIQUE）"""
+        if not self.use_netbios:
+            return "未知"
+        try:
+            return self.netbios_client.resolve(ip).name or "未知"
+        except OSError:
+            return "未知"
     
     def _get_local_network(self) -> str:
         """获取本地网络地址 - 跨平台实现"""
@@ -581,19 +1012,23 @@ class NetworkScanner:
                         text=True
                     ).stdout
                 
-                # 解析网络接口信息
+                # 解析网络接口信息（跳过回环接口）
                 for line in output.split('\n'):
                     if "inet " in line:
-                        match = re.search(r'inet (\d+\.\d+\.\d+\.\d+)', line)
-                        if match:
+                        match = re.search(r'inet (?:addr:)?(\d+\.\d+\.\d+\.\d+)(?:/(\d+))?', line)
+                        if match and not match.group(1).startswith('127.'):
                             ip = match.group(1)
+                            # ip命令输出 CIDR 前缀长度
+                            if match.group(2):
+                                network = ipaddress.ip_network(f"{ip}/{match.group(2)}", strict=False)
+                                return str(network)
                             # 获取子网掩码
                             mask_match = re.search(r'netmask (\d+\.\d+\.\d+\.\d+)', line)
                             if mask_match:
                                 mask = mask_match.group(1)
                                 # 计算CIDR
                                 cidr = sum(bin(int(x)).count('1') for x in mask.split('.'))
-                                return f"{ip}/{cidr}"
+                                return str(ipaddress.ip_network(f"{ip}/{cidr}", strict=False))
                             else:
                                 # 假设使用C类地址
                                 parts = ip.split('.')
@@ -604,17 +1039,19 @@ class NetworkScanner:
         # 默认返回常见的内网网段
         return "192.168.1.0/24"
     
-    def _parse_targets(self, target_input: str) -> List[str]:
+    def _parse_targets(self, target_input: str, hosts_only: bool = True) -> TargetPlan:
         """
         解析目标输入 - 增强的跨平台解析
         
         Args:
-            target_input: 可以是单个IP、IP范围、CIDR
+            target_input: 可以是单个IP、IP范围、CIDR、逗号分隔的列表或.txt文件
+            hosts_only: CIDR是否去掉网络地址和广播地址（解析排除列表时应为False）
             
         Returns:
-            IP地址列表
+            目标区间集合（已合并去重，可迭代出IP字符串，len()为目标总数）
         """
-        targets = []
+        targets = TargetPlan()
+        target_input = target_input.strip()
         
         # 检查是否为"自动检测"
         if target_input in ["自动检测", "auto", "autodetect"]:
@@ -622,11 +1059,20 @@ class NetworkScanner:
             target_input = network
         
         try:
+            # 逗号分隔的目标列表，每一项可以是任意支持的格式
+            if ',' in target_input:
+                for item in target_input.split(','):
+                    item = item.strip()
+                    if item:
+                        targets.extend(self._parse_targets(item, hosts_only))
+            
+            # IP列表文件
+            elif target_input.endswith('.txt'):
+                targets.extend(self._parse_target_file(target_input, hosts_only))
+            
             # 单个IP
-            if re.match(r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$', target_input):
-                # 验证IP有效性
-                ipaddress.ip_address(target_input)
-                targets.append(target_input)
+            elif re.match(r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$', target_input):
+                targets.add_ip(target_input)
             
             # IP范围 192.168.1.1-100
             elif '-' in target_input:
@@ -641,42 +1087,18 @@ class NetworkScanner:
                     if start < 0 or start > 255 or end < 0 or end > 255:
                         raise ValueError("IP范围必须在0-255之间")
                     
-                    if start > end:
-                        start, end = end, start
-                    
-                    for i in range(start, end + 1):
-                        ip = f"{base_parts[0]}.{base_parts[1]}.{base_parts[2]}.{i}"
-                        targets.append(ip)
+                    base = ip_to_int(f"{base_parts[0]}.{base_parts[1]}.{base_parts[2]}.0")
+                    targets.add_range(base + start, base + end)
             
             # CIDR格式 192.168.1.0/24
             elif '/' in target_input:
                 network = ipaddress.ip_network(target_input, strict=False)
-                for ip in network.hosts():
-                    targets.append(str(ip))
-            
-            # 逗号分隔的IP列表
-            elif ',' in target_input:
-                for ip in target_input.split(','):
-                    ip = ip.strip()
-                    if re.match(r'^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}$', ip):
-                        targets.append(ip)
-            
-            # IP列表文件
-            elif target_input.endswith('.txt'):
-                if os.path.exists(target_input):
-                    with open(target_input, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            line = line.strip()
-                            if line and not line.startswith('#'):
-                                targets.extend(self._parse_targets(line))
-                else:
-                    print(f"文件不存在: {target_input}")
+                targets.add_network(network, hosts_only)
             
             else:
                 # 尝试解析为单个IP
                 try:
-                    ipaddress.ip_address(target_input)
-                    targets.append(target_input)
+                    targets.add_ip(target_input)
                 except ValueError:
                     print(f"无法解析的目标格式: {target_input}")
                     
@@ -685,103 +1107,732 @@ class NetworkScanner:
             
         return targets
     
+    def _parse_target_file(self, filename: str, hosts_only: bool = True) -> TargetPlan:
+        """
+        解析目标列表文件，每行一个目标，#开头为注释
+        
+        Args:
+            filename: 文件名
+            hosts_only: CIDR是否去掉网络地址和广播地址
+            
+        Returns:
+            目标区间集合
+        """
+        targets = TargetPlan()
+        
+        if not os.path.exists(filename):
+            print(f"文件不存在: {filename}")
+            return targets
+        
+        with open(filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    targets.extend(self._parse_targets(line, hosts_only))
+        
+        return targets
+    
     def scan_single(self, ip: str) -> HostInfo:
         """扫描单个主机"""
+        host_info = self._probe_host(ip)
+        
+        # 获取更多信息（如果在线）
+        if host_info.status == '在线':
+            self._enrich_host(host_info)
+        
+        return host_info
+    
+    def _probe_host(self, ip: str, attempt: int = 0) -> HostInfo:
+        """只做存活探测，不补充其他信息（attempt 为第几次重试）"""
         host_info = HostInfo(ip=ip, status='离线')
         
         try:
-            # Ping扫描
-            is_online, response_time = self.ping_host(ip)
+            if self.prober is not None:
+                # 多种探测同时发出，第一个肯定应答胜出
+                proof = self.prober.probe(ip, self._probe_timeout(ip, attempt))
+                if proof is not None:
+                    self.rate_limiter.on_reply(retry=attempt > 0)
+                    self._observe_rtt(ip, proof.rtt)
+                    self._apply_proof(host_info, proof)
+                return host_info
+            
+            # Ping扫描，顺便根据应答TTL猜测操作系统（不额外发包）
+            is_online, response_time, ttl = self._ping_with_ttl(ip, attempt)
             
             if is_online:
                 host_info.status = '在线'
                 host_info.response_time = response_time
-                
-                # 获取更多信息（如果在线）
-                try:
-                    # 获取MAC地址（需要权限）
-                    if self._is_windows_admin():
-                        host_info.mac = self.get_mac_address(ip)
-                    
-                    # 获取主机名
-                    host_info.hostname = self.get_hostname(ip)
-                    
-                    # 简单猜测操作系统类型（根据TTL值）
-                    # 注：这是一个简化的猜测，实际应用中需要更复杂的方法
-                    if response_time > 0:
-                        # Windows默认TTL=128，Linux/Unix默认TTL=64
-                        pass
-                except Exception as e:
-                    print(f"获取主机 {ip} 额外信息时出错: {e}")
+                host_info.os_type = guess_os(ttl)
+                host_info.alive_by = "ICMP"
         except Exception as e:
             print(f"扫描 {ip} 时出错: {e}")
         
         return host_info
     
-    def scan_range(self, target_input: str, progress_callback: Optional[Callable[[int, int], None]] = None) -> List[HostInfo]:
+    @staticmethod
+    def _apply_proof(host_info: HostInfo, proof: Proof):
+        """按探测应答把主机标为在线"""
+        host_info.status = '在线'
+        host_info.response_time = proof.rtt
+        host_info.os_type = guess_os(proof.ttl)
+        host_info.alive_by = proof.method
+        if proof.mac:
+            host_info.mac = proof.mac
+    
+    def _enrich_host(self, host_info: HostInfo) -> HostInfo:
+        """补充在线主机的MAC地址、主机名等信息"""
+        ip = host_info.ip
+        try:
+            # 获取MAC地址
+            if self._can_get_mac():
+                host_info.mac = self.get_mac_address(ip)
+            
+            # 获取主机名
+            host_info.hostname = self.get_hostname(ip)
+        except Exception as e:
+            print(f"获取主机 {ip} 额外信息时出错: {e}")
+        
+        return host_info
+    
+    def _prepare_targets(self, target_input: str) -> Union[TargetPlan, TargetPermutation]:
+        """
+        解析目标、减去排除列表并更新 total_targets，解析不到目标时自动使用本地网络
+        
+        Returns:
+            目标区间集合；开启随机顺序时返回其伪随机排列（同时保存在 target_order 中）
+        """
+        targets = self._parse_targets(target_input)
+        
+        if len(targets) == 0:
+            # 自动获取本地网络
+            network = self._get_local_network()
+            targets = self._parse_targets(network)
+        
+        # 排除列表按完整网段处理，不去掉网络地址和广播地址
+        if self.exclude:
+            targets.exclude(self._parse_targets(self.exclude, hosts_only=False))
+        if self.exclude_file:
+            targets.exclude(self._parse_target_file(self.exclude_file, hosts_only=False))
+        
+        self.total_targets = len(targets)
+        
+        if self.randomize:
+            seed = self.seed if self.seed is not None else random.randrange(1 << 32)
+            targets = TargetPermutation(targets, seed)
+            if self.resume_position:
+                targets.seek(self.resume_position)
+        
+        self.target_order = targets
+        return targets
+    
+    def _mark_done(self, ip: str):
+        """随机顺序下记录一个目标已产出结果，用于计算中断后继续扫描的位置"""
+        if isinstance(self.target_order, TargetPermutation):
+            self.target_order.mark_done(ip)
+    
+    def scan_range(self, target_input: str, progress_callback: Optional[Callable[[int, int, float], None]] = None) -> List[HostInfo]:
         """
         扫描指定范围的主机
         
         Args:
             target_input: 目标输入
-            progress_callback: 进度回调函数
+            progress_callback: 进度回调函数，参数为 (已完成数, 目标总数, 当前允许的发包速率)
             
         Returns:
             扫描结果列表
         """
-        self.is_scanning = True
         self.results = []
         
-        # 解析目标
-        targets = self._parse_targets(target_input)
-        self.total_targets = len(targets)
-        
-        if self.total_targets == 0:
-            # 自动获取本地网络
-            network = self._get_local_network()
-            targets = self._parse_targets(network)
-            self.total_targets = len(targets)
+        for host_info in self.iter_scan(target_input, progress_callback):
+            self.results.append(host_info)
         
         if self.total_targets == 0:
-            print("没有可扫描的目标")
             return []
         
-        print(f"开始扫描 {self.total_targets} 个目标...")
-        print(f"操作系统: {platform.system()} {platform.release()}")
-        print(f"线程数: {self.max_threads}, 超时: {self.timeout}秒")
+        # 统计结果
+        online_count = len([h for h in self.results if h.status == '在线'])
+        print(f"扫描完成! 在线主机: {online_count}/{self.total_targets}")
         
-        # 使用线程池并发扫描
-        with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
-            future_to_ip = {executor.submit(self.scan_single, ip): ip for ip in targets}
+        return self.results
+    
+    def iter_scan(self, target_input: str, progress_callback: Optional[Callable[[int, int, float], None]] = None,
+                  online_only: bool = False) -> Iterator[HostInfo]:
+        """
+        流式扫描，每个主机的结果一确定就立即产出，不保存在 self.results 中
+        
+        Args:
+            target_input: 目标输入
+            progress_callback: 进度回调函数，参数为 (已完成数, 目标总数, 当前允许的发包速率)
+            online_only: 是否只产出在线主机（离线主机在源头丢弃，内存不随扫描规模增长）
+            
+        Yields:
+            按完成顺序产出的HostInfo
+        """
+        self.is_scanning = True
+        source = None
+        
+        try:
+            targets = self._prepare_targets(target_input)
+            if self.total_targets == 0:
+                print("没有可扫描的目标")
+                return
+            self._reset_rtt()
+            self._reset_rate()
+            self._reset_prober()
+            self._reset_port_scanner()
+            self._reset_udp_scanner()
+            
+            print(f"开始扫描 {self.total_targets} 个目标...")
+            print(f"操作系统: {platform.system()} {platform.release()}")
+            if self.adaptive_timeout:
+                print(f"线程数: {self.max_threads}, 超时: {self.min_timeout}~{self.timeout}秒（按往返时间自适应）")
+            else:
+                print(f"线程数: {self.max_threads}, 超时: {self.timeout}秒")
+            if self.retries:
+                print(f"未应答主机重试: {self.retries}次，超时倍数 {self.retry_backoff}")
+            if self.rate:
+                print(f"发包速率上限: {self.rate}包/秒")
+            if self._racing():
+                ports = ','.join(str(port) for port in self.tcp_ports)
+                print(f"存活探测: {'+'.join(self.probes)}（TCP端口 {ports}），第一个应答胜出")
+            if isinstance(self.port_scanner, SynScanner):
+                print(f"端口扫描: {len(self.ports)} 个端口，SYN扫描（源端口 {self.port_scanner.src_port}）")
+            elif self.port_scanner is not None:
+                print(f"端口扫描: {len(self.ports)} 个端口，最多同时 {self.port_scanner.max_inflight} 个连接")
+            if self.banner_grabber is not None:
+                print(f"服务识别: 每个开放端口最多 {self.banner_timeout}秒，{self.banner_grabber.max_bytes} 字节")
+            if self.udp_scanner is not None:
+                print(f"UDP探测: {','.join(str(port) for port in self.udp_ports)}，"
+                      f"{self.udp_scanner.pool_size} 个套接字")
+            
+            interface = self._auto_arp_interface(targets)
+            if interface is not None:
+                print(f"目标位于直连网段，改用ARP扫描（接口 {interface.name}，--no-arp 可关闭）")
+                discovered = self._iter_arp(targets, interface)
+            elif self.sweep_mode and not self._racing() and self.use_native_icmp and self.icmp_engine.available():
+                discovered = self._iter_sweep(targets)
+            else:
+                discovered = self._iter_pool(targets)
+            
+            pipeline = self._build_pipeline()
+            source = pipeline.run(discovered)
             
             completed = 0
-            for future in as_completed(future_to_ip):
-                if not self.is_scanning:
-                    print("扫描被用户停止")
+            for host_info in source:
+                completed += 1
+                self._mark_done(host_info.ip)
+                if progress_callback:
+                    self._report_progress(progress_callback, completed)
+                
+                if online_only and host_info.status != '在线':
+                    continue
+                yield host_info
+            
+            if not self.is_scanning:
+                print("扫描被用户停止")
+            
+            self.stage_stats = pipeline.stats
+            print("各阶段吞吐:")
+            for stats in self.stage_stats:
+                print(f"  {stats}")
+        finally:
+            self.is_scanning = False
+            if source is not None:
+                source.close()
+            self._close_name_clients()
+            self._close_prober()
+            self._close_port_scanner()
+            self._close_udp_scanner()
+    
+    def _build_pipeline(self) -> ScanPipeline:
+        """按当前设置创建扫描流水线：发现 -> MAC地址 -> 主机名 -> 本地名称 -> 端口 -> 服务 -> UDP"""
+        stages = []
+        
+        # 获取MAC地址（ARP扫描已经得到MAC的主机跳过）
+        if self._can_get_mac():
+            stages.append(EnrichmentStage("MAC地址", 'mac', self.get_mac_address,
+                                          self.mac_workers, self.mac_timeout,
+                                          skip=lambda host: host.mac != "未知"))
+        
+        # 有DNS服务器时所有PTR查询共用一个套接字同时在途，不占用线程
+        if self.dns_resolver.available():
+            stages.append(EnrichmentStage("主机名", 'hostname', self._hostname_future,
+                                          self.dns_resolver.max_inflight, self.hostname_timeout,
+                                          nonblocking=True))
+        else:
+            stages.append(EnrichmentStage("主机名", 'hostname', self.get_hostname,
+                                          self.hostname_workers, self.hostname_timeout))
+        
+        # DNS和NetBIOS都查不到名称的主机，再批量发出mDNS/LLMNR查询
+        if self.use_local_names:
+            stages.append(EnrichmentStage("本地名称", 'hostname', self._local_name_future,
+                                          self.mdns_resolver.max_inflight, self.local_name_timeout,
+                                          skip=lambda host: host.hostname != "未知",
+                                          nonblocking=True))
+        
+        # 端口扫描由单个线程按主机提交顺序驱动所有连接（SYN扫描为一个原始套接字，一次发出
+        # 全部端口）；阶段超时按端口数、并发数和每个连接的超时计算，从扫描器开始处理该主机时算起，
+        # 排队等待前面主机的时间不计入
+        if self.port_scanner is not None:
+            stages.append(EnrichmentStage("端口", 'open_ports', self._port_future,
+                                          getattr(self.port_scanner, 'max_inflight', len(self.ports)),
+                                          self._port_stage_timeout(),
+                                          nonblocking=True, apply=self._apply_ports, deadline_on_start=True))
+        
+        # 横幅抓取需要端口阶段的结果，阶段函数接收整个主机；所有主机共用抓取器的并发名额，
+        # 开放端口不会多于扫描的端口，阶段超时按扫描端口数、连接并发数和每个连接的时间预算计算，
+        # 从该主机的第一个连接取得名额时算起
+        if self.banner_grabber is not None:
+            stages.append(EnrichmentStage("服务", 'services', self._service_future,
+                                          self.banner_grabber.max_inflight, self._service_stage_timeout(),
+                                          skip=lambda host: not host.open_ports,
+                                          nonblocking=True, by_host=True, deadline_on_start=True))
+        
+        # 所有在线主机的UDP探测共用一个队列和一小组套接字，每个端口最多发 retries+1 次，
+        # 阶段超时按发包次数、在途上限和单次探测的超时计算，从该主机的第一个探测离开队列时算起
+        if self.udp_scanner is not None:
+            stages.append(EnrichmentStage("UDP", 'udp_services', self._udp_future,
+                                          self.udp_scanner.max_inflight, self._udp_stage_timeout(),
+                                          nonblocking=True, deadline_on_start=True))
+        
+        return ScanPipeline(stages, discovery_workers=self.max_threads)
+    
+    def _iter_pool(self, targets: Iterable[str]) -> Iterator[HostInfo]:
+        """
+        线程池发现：每个工作线程只做存活探测，在途任务数受窗口限制
+        
+        首轮未应答的主机先不产出，等整轮结束后再单独重试，
+        在线主机不受影响，重试只增加一轮针对未应答主机的时间。
+        """
+        with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
+            failed: List[str] = []
+            yield from self._probe_pass(executor, targets, 0, failed)
+            
+            for attempt in range(1, self.retries + 1):
+                if not failed or not self.is_scanning:
                     break
-                    
-                ip = future_to_ip[future]
+                batch, failed = failed, []
+                yield from self._probe_pass(executor, batch, attempt, failed)
+            
+            # 扫描被停止时剩下的主机按离线产出
+            for ip in failed:
+                yield HostInfo(ip=ip, status='离线')
+    
+    def _probe_pass(self, executor: ThreadPoolExecutor, targets: Iterable[str], attempt: int,
+                    failed: List[str]) -> Iterator[HostInfo]:
+        """
+        探测一轮
+        
+        Args:
+            executor: 线程池
+            targets: 本轮的目标
+            attempt: 第几次重试（首轮为0）
+            failed: 还有重试次数的未应答主机追加到这里，不产出
+        
+        Yields:
+            在线主机，以及重试用完的离线主机
+        """
+        probe = functools.partial(self._probe_host, attempt=attempt)
+        for ip, future in self._submit_bounded(executor, probe, targets):
+            try:
+                host_info = future.result()
+            except Exception as e:
+                print(f"扫描 {ip} 时出错: {e}")
+                host_info = HostInfo(ip=ip, status='离线')
+            
+            if host_info.status != '在线' and attempt < self.retries:
+                failed.append(ip)
+                continue
+            yield host_info
+    
+    def _submit_bounded(self, executor: ThreadPoolExecutor, func: Callable[[Any], Any],
+                        items: Iterable[Any], window: Optional[int] = None) -> Iterator[Tuple[Any, Future]]:
+        """
+        带背压的任务提交：最多保持 window 个在途任务，每完成一个再补交一个
+        
+        Args:
+            executor: 线程池
+            func: 对每个元素执行的函数
+            items: 待处理元素（可以是惰性迭代器）
+            window: 在途任务上限，默认为线程数的2倍
+            
+        Yields:
+            (元素, 已完成的Future)，按完成顺序产出；停止扫描后不再提交新任务
+        """
+        if window is None:
+            window = self.max_threads * 2
+        
+        item_iter = iter(items)
+        in_flight: Dict[Future, Any] = {}
+        exhausted = False
+        
+        while True:
+            while not exhausted and self.is_scanning and len(in_flight) < window:
                 try:
-                    result = future.result(timeout=self.timeout + 1)
-                    self.results.append(result)
-                except Exception as e:
-                    print(f"扫描 {ip} 时出错: {e}")
+                    item = next(item_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                in_flight[executor.submit(func, item)] = item
+            
+            if not in_flight:
+                break
+            
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield in_flight.pop(future), future
+    
+    def _iter_sweep(self, targets: Iterable[str]) -> Iterator[HostInfo]:
+        """
+        单套接字发现：由IcmpSweeper完成存活探测
+        
+        Args:
+            targets: 目标IP（可以是惰性迭代的目标计划）
+            
+        Yields:
+            只含探测结果的HostInfo
+        """
+        self._sweeper = IcmpSweeper(self.icmp_engine, timeout=self.timeout,
+                                    adaptive=self.rtt_estimator if self.adaptive_timeout else None,
+                                    retries=self.retries, backoff=self.retry_backoff,
+                                    limiter=self.rate_limiter)
+        
+        try:
+            for ip, reply in self._sweeper.sweep(targets):
+                if not self.is_scanning:
+                    break
                 
-                completed += 1
-                if progress_callback:
-                    progress_callback(completed, self.total_targets)
+                host_info = HostInfo(ip=ip, status='离线')
+                if reply is not None:
+                    host_info.status = '在线'
+                    host_info.response_time = reply.rtt
+                    host_info.os_type = guess_os(reply.ttl)
+                    host_info.alive_by = "ICMP"
+                yield host_info
+        finally:
+            self._sweeper = None
+    
+    def _auto_arp_interface(self, targets: Union[TargetPlan, TargetPermutation]):
+        """
+        是否自动改用ARP扫描：用户明确选择了单套接字扫描或多种存活探测时不覆盖其选择
         
-        self.is_scanning = False
+        Returns:
+            用于发送ARP请求的接口，不改用ARP扫描时返回None
+        """
+        if not self.use_arp:
+            return None
+        if self.sweep_mode or self._racing():
+            if self._arp_interface_for(targets) is not None:
+                print("目标位于直连网段，但已指定探测方式，不自动改用ARP扫描")
+            return None
+        return self._arp_interface_for(targets)
+    
+    def _arp_interface_for(self, targets: Union[TargetPlan, TargetPermutation]):
+        """
+        判断能否用ARP扫描：所有目标都位于 _get_local_network 返回的直连网段内，
+        且存在该网段的接口并能打开 AF_PACKET 套接字
         
-        # 统计结果
-        online_count = len([h for h in self.results if h.status == '在线'])
-        print(f"扫描完成! 在线主机: {online_count}/{self.total_targets}")
+        Returns:
+            用于发送ARP请求的接口，不能使用ARP扫描时返回None
+        """
+        plan = targets.plan if isinstance(targets, TargetPermutation) else targets
+        try:
+            local_network = ipaddress.ip_network(self._get_local_network(), strict=False)
+        except ValueError:
+            return None
+        
+        first = int(local_network.network_address)
+        last = int(local_network.broadcast_address)
+        if not all(first <= start and end <= last for start, end in plan.ranges()):
+            return None
+        
+        interface = find_interface(local_network)
+        if interface is None or not ArpSweeper.available():
+            return None
+        return interface
+    
+    def _iter_arp(self, targets: Iterable[str], interface) -> Iterator[HostInfo]:
+        """
+        ARP发现：一次报文交换同时得到存活状态和MAC地址
+        
+        Args:
+            targets: 目标IP（均位于接口的直连网段内）
+            interface: 发送ARP请求的接口
+            
+        Yields:
+            含探测结果和MAC地址的HostInfo
+        """
+        self._sweeper = ArpSweeper(interface, timeout=self.timeout,
+                                   adaptive=self.rtt_estimator if self.adaptive_timeout else None,
+                                   retries=self.retries, backoff=self.retry_backoff,
+                                   limiter=self.rate_limiter)
         
+        try:
+            for ip, reply in self._sweeper.sweep(targets):
+                if not self.is_scanning:
+                    break
+                
+                host_info = HostInfo(ip=ip, status='离线')
+                if reply is not None:
+                    host_info.status = '在线'
+                    host_info.response_time = reply.rtt
+                    host_info.mac = reply.mac
+                    host_info.alive_by = "ARP"
+                yield host_info
+        finally:
+            self._sweeper = None
+    
+    async def aiter_scan(self, target_input: str, concurrency: int = 512,
+                         progress_callback: Optional[Callable[[int, int, float], None]] = None,
+                         online_only: bool = False) -> AsyncIterator[HostInfo]:
+        """
+        异步扫描，按完成顺序逐个产出主机信息
+        
+        每个探测（ICMP回显、各端口的TCP连接、ARP请求）占用一个名额，同时在途的探测不超过
+        concurrency 个；在线主机的信息补充在发现名额之外进行，不占用探测名额。
+        
+        Args:
+            target_input: 目标输入
+            concurrency: 同时进行的探测数（而不是线程数）
+            progress_callback: 进度回调函数，参数为 (已完成数, 目标总数, 当前允许的发包速率)
+            online_only: 是否只产出在线主机
+            
+        Yields:
+            每个目标的HostInfo
+        """
+        pinger = None
+        discovering = set()
+        enriching = set()
+        
+        try:
+            self.is_scanning = True
+            targets = self._prepare_targets(target_input)
+            self._reset_rtt()
+            self._reset_rate()
+            self._reset_prober()
+            self._reset_port_scanner()
+            self._reset_udp_scanner()
+            
+            # ICMP不可用时退回到TCP连接探测
+            if self.use_native_icmp and self.icmp_engine.available():
+                pinger = AsyncIcmpPinger(self.icmp_engine, limiter=self.rate_limiter)
+                try:
+                    await pinger.start()
+                except (OSError, NotImplementedError):
+                    pinger = None
+            
+            # 探测名额；主机任务数同样以 concurrency 为窗口，避免一次创建全部目标的任务
+            slots = asyncio.Semaphore(concurrency)
+            # 首轮未应答的主机在整轮结束后再单独重试
+            target_iter = iter(targets)
+            attempt = 0
+            failed = []
+            completed = 0
+            
+            while True:
+                while self.is_scanning and len(discovering) < concurrency:
+                    ip = next(target_iter, None)
+                    if ip is None:
+                        break
+                    discovering.add(asyncio.ensure_future(self._scan_single_async(ip, pinger, slots, attempt)))
+                
+                if not discovering:
+                    if failed and self.is_scanning:
+                        attempt += 1
+                        target_iter = iter(failed)
+                        failed = []
+                        continue
+                    if not enriching:
+                        break
+                
+                done, _ = await asyncio.wait(discovering | enriching, return_when=asyncio.FIRST_COMPLETED)
+                finished = []
+                for task in done:
+                    host_info = task.result()
+                    if task in enriching:
+                        enriching.discard(task)
+                        finished.append(host_info)
+                        continue
+                    discovering.discard(task)
+                    if host_info.status == '在线':
+                        enriching.add(asyncio.ensure_future(self._enrich_host_async(host_info)))
+                    elif attempt < self.retries:
+                        failed.append(host_info.ip)
+                    else:
+                        finished.append(host_info)
+                
+                for host_info in finished:
+                    completed += 1
+                    self._mark_done(host_info.ip)
+                    if progress_callback:
+                        self._report_progress(progress_callback, completed)
+                    
+                    if online_only and host_info.status != '在线':
+                        continue
+                    yield host_info
+        finally:
+            for task in discovering | enriching:
+                task.cancel()
+            if pinger is not None:
+                pinger.close()
+            self._close_name_clients()
+            self._close_prober()
+            self._close_port_scanner()
+            self._close_udp_scanner()
+            self.is_scanning = False
+    
+    async def scan_range_async(self, target_input: str,
+                               progress_callback: Optional[Callable[[int, int, float], None]] = None,
+                               concurrency: int = 512) -> List[HostInfo]:
+        """
+        扫描指定范围的主机（asyncio版本）
+        
+        Args:
+            target_input: 目标输入
+            progress_callback: 进度回调函数，参数为 (已完成数, 目标总数, 当前允许的发包速率)
+            concurrency: 同时进行的探测数
+            
+        Returns:
+            扫描结果列表
+        """
+        self.results = []
+        async for host_info in self.aiter_scan(target_input, concurrency, progress_callback):
+            self.results.append(host_info)
         return self.results
     
+    async def _scan_single_async(self, ip: str, pinger: Optional[AsyncIcmpPinger],
+                                 slots: asyncio.Semaphore, attempt: int = 0) -> HostInfo:
+        """异步探测单个主机是否在线（attempt 为第几次重试，信息补充由调用方另行进行）"""
+        host_info = HostInfo(ip=ip, status='离线')
+        
+        try:
+            proof = await self._probe_async(ip, pinger, self._probe_timeout(ip, attempt), slots)
+            if proof is not None:
+                self.rate_limiter.on_reply(retry=attempt > 0)
+                self._observe_rtt(ip, proof.rtt)
+                self._apply_proof(host_info, proof)
+        except Exception as e:
+            print(f"扫描 {ip} 时出错: {e}")
+        
+        return host_info
+    
+    async def _probe_async(self, ip: str, pinger: Optional[AsyncIcmpPinger], timeout: float,
+                           slots: asyncio.Semaphore) -> Optional[Proof]:
+        """
+        按 probes 同时发出各种探测，第一个肯定应答胜出，其余探测随即取消；
+        ICMP不可用时退回到TCP连接探测。每个探测取得 slots 的名额后才发出，超时从发出时算起
+        
+        Returns:
+            证明主机在线的应答，全部失败时返回None
+        """
+        probes = set(self.probes)
+        if pinger is None:
+            probes.discard('icmp')
+            probes.add('tcp')
+        
+        pending = set()
+        if 'icmp' in probes:
+            pending.add(asyncio.ensure_future(self._limited(slots, self._icmp_probe_async, ip, pinger, timeout)))
+        if 'tcp' in probes:
+            for port in self.tcp_ports:
+                pending.add(asyncio.ensure_future(self._limited(slots, self._tcp_probe_async, ip, port, timeout)))
+        if 'arp' in probes and self.prober is not None:
+            pending.add(asyncio.ensure_future(self._limited(slots, self._arp_probe_async, ip, timeout)))
+        
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    proof = task.result()
+                    if proof is not None:
+                        return proof
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        return None
+    
+    @staticmethod
+    async def _limited(slots: asyncio.Semaphore, probe: Callable[..., Awaitable[Optional[Proof]]],
+                       *args) -> Optional[Proof]:
+        """取得一个探测名额后执行探测，结束时归还"""
+        async with slots:
+            return await probe(*args)
+    
+    async def _arp_probe_async(self, ip: str, timeout: float) -> Optional[Proof]:
+        """ARP探测"""
+        await self.rate_limiter.acquire_async()
+        return await self.prober.arp_probe_async(ip, timeout)
+    
+    async def _icmp_probe_async(self, ip: str, pinger: AsyncIcmpPinger, timeout: float) -> Optional[Proof]:
+        """ICMP回显探测"""
+        await self.rate_limiter.acquire_async()
+        reply = await pinger.ping(ip, timeout)
+        if reply is None:
+            return None
+        return Proof(method="ICMP", rtt=reply.rtt, ttl=reply.ttl)
+    
+    async def _tcp_probe_async(self, ip: str, port: int, timeout: float) -> Optional[Proof]:
+        """TCP连接探测：建立连接或被拒绝（收到RST）都说明主机在线"""
+        await self.rate_limiter.acquire_async()
+        start = time.perf_counter()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+            writer.close()
+        except ConnectionRefusedError:
+            pass
+        except (OSError, asyncio.TimeoutError):
+            return None
+        return Proof(method=f"TCP/{port}", rtt=(time.perf_counter() - start) * 1000)
+    
+    async def _enrich_host_async(self, host_info: HostInfo) -> HostInfo:
+        """异步补充在线主机的MAC地址、主机名和开放端口"""
+        loop = asyncio.get_running_loop()
+        ip = host_info.ip
+        
+        try:
+            # 邻居表可能需要刷新（非Linux系统会运行arp命令），放到默认线程池执行
+            if self._can_get_mac() and host_info.mac == "未知":
+                host_info.mac = await loop.run_in_executor(None, self.get_mac_address, ip)
+            
+            try:
+                if self.dns_resolver.available():
+                    host_info.hostname = await asyncio.wait_for(
+                        asyncio.wrap_future(self._hostname_future(ip)), self.hostname_timeout)
+                else:
+                    hostname, _ = await asyncio.wait_for(
+                        loop.getnameinfo((ip, 0), socket.NI_NAMEREQD), self.timeout)
+                    host_info.hostname = hostname
+            except (OSError, asyncio.TimeoutError):
+                pass
+            
+            if host_info.hostname == "未知" and self.use_local_names:
+                try:
+                    host_info.hostname = await asyncio.wait_for(
+                        asyncio.wrap_future(self._local_name_future(ip)), self.local_name_timeout)
+                except asyncio.TimeoutError:
+                    pass
+            
+            # 端口、服务和UDP与流水线使用相同的超时，超时的主机保持默认值
+            if self.port_scanner is not None:
+                self._apply_ports(host_info, await self._await_queued(
+                    functools.partial(self._port_future, ip), self._port_stage_timeout(), []))
+            if self.banner_grabber is not None and host_info.open_ports:
+                host_info.services = await self._await_queued(
+                    functools.partial(self._service_future, host_info), self._service_stage_timeout(), {})
+            if self.udp_scanner is not None:
+                host_info.udp_services = await self._await_queued(
+                    functools.partial(self._udp_future, ip), self._udp_stage_timeout(), {})
+        except Exception as e:
+            print(f"获取主机 {ip} 额外信息时出错: {e}")
+        
+        return host_info
+    
     def stop_scan(self):
         """停止扫描"""
         self.is_scanning = False
+        if self._sweeper is not None:
+            self._sweeper.stop()
         print("正在停止扫描...")
     
     def export_results(self, results: List[HostInfo], format_type: str, filename: str):
@@ -790,34 +1841,31 @@ class NetworkScanner:
         
         Args:
             results: 扫描结果
-            format_type: 导出格式 ('csv', 'json', 'txt', 'excel')
+            format_type: 导出格式 ('csv', 'json', 'jsonl', 'txt', 'excel')
             filename: 文件名
         """
         if format_type == 'csv':
             self._export_csv(results, filename)
         elif format_type == 'json':
             self._export_json(results, filename)
+        elif format_type == 'jsonl':
+            self._export_jsonl(results, filename)
         elif format_type == 'txt':
             self._export_txt(results, filename)
         elif format_type == 'excel':
             self._export_excel(results, filename)
     
-    def _export_csv(self, results: List[HostInfo], filename: str):
+    def _export_csv(self, results: Iterable[HostInfo], filename: str):
         """导出为CSV格式"""
-        import csv
-        
-        with open(filename, 'w', newline='', encoding='utf-8-sig') as f:
-            writer = csv.writer(f)
-            writer.writerow(['IP地址', '状态', 'MAC地址', '主机名', '响应时间(ms)', '操作系统'])
+        with CsvSink(filename) as sink:
             for host in results:
-                writer.writerow([
-                    host.ip, 
-                    host.status, 
-                    host.mac, 
-                    host.hostname, 
-                    f"{host.response_time:.1f}", 
-                    host.os_type
-                ])
+                sink.write(host)
+    
+    def _export_jsonl(self, results: Iterable[HostInfo], filename: str):
+        """导出为JSON Lines格式（每行一个主机）"""
+        with JsonLinesSink(filename) as sink:
+            for host in results:
+                sink.write(host)
     
     def _export_json(self, results: List[HostInfo], filename: str):
         """导出为JSON格式"""
@@ -833,17 +1881,7 @@ class NetworkScanner:
                 'max_threads': self.max_threads,
                 'timeout': self.timeout
             },
-            'results': [
-                {
-                    'ip': h.ip,
-                    'status': h.status,
-                    'mac': h.mac,
-                    'hostname': h.hostname,
-                    'response_time': h.response_time,
-                    'os_type': h.os_type
-                }
-                for h in results
-            ]
+            'results': [host_to_dict(h) for h in results]
         }
         
         with open(filename, 'w', encoding='utf-8') as f:
@@ -878,6 +1916,13 @@ class NetworkScanner:
                 f.write(f"     主机名: {host.hostname}\n")
                 f.write(f"     MAC地址: {host.mac}\n")
                 f.write(f"     响应时间: {host.response_time:.1f}ms\n")
+                f.write(f"     探测方式: {host.alive_by}\n")
+                if host.open_ports:
+                    f.write(f"     开放端口: {format_ports(host.open_ports)}\n")
+                if host.services:
+                    f.write(f"     服务: {format_services(host.services)}\n")
+                if host.udp_services:
+                    f.write(f"     UDP服务: {format_services(host.udp_services)}\n")
                 
                 if host.os_type != "未知":
                     f.write(f"     操作系统: {host.os_type}\n")
@@ -891,14 +1936,7 @@ class NetworkScanner:
             
             data = []
             for host in results:
-                data.append({
-                    'IP地址': host.ip,
-                    '状态': host.status,
-                    'MAC地址': host.mac,
-                    '主机名': host.hostname,
-                    '响应时间(ms)': host.response_time,
-                    '操作系统': host.os_type
-                })
+                data.append({title: field_value(host, name) for title, name in CSV_COLUMNS})
             
             df = pd.DataFrame(data)
             
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SYN（半开）端口扫描模块（原始套接字，无状态应答匹配）
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import collections
+import errno
+import hashlib
+import os
+import random
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+try:
+    from .icmp import TimeoutWheel, checksum
+except ImportError:  # 直接运行时
+    from icmp import TimeoutWheel, checksum
+
+# TCP标志位
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+SYN_WINDOW = 1024
+# MSS选项（kind=2, len=4, 1460），不带选项的SYN容易被当作异常报文丢弃
+MSS_OPTION = struct.pack('!BBH', 2, 4, 1460)
+
+
+def build_syn(src_ip: str, dst_ip: str, src_port: int, dst_port: int, seq: int) -> bytes:
+    """构造带校验和的TCP SYN报文段（IP头由内核填写）"""
+    offset = (20 + len(MSS_OPTION)) // 4
+    header = struct.pack('!HHIIBBHHH', src_port, dst_port, seq, 0, offset << 4, TCP_SYN,
+                         SYN_WINDOW, 0, 0) + MSS_OPTION
+    pseudo = socket.inet_aton(src_ip) + socket.inet_aton(dst_ip) + struct.pack('!BBH', 0, socket.IPPROTO_TCP, len(header))
+    csum = checksum(pseudo + header)
+    return header[:16] + struct.pack('!H', csum) + header[18:]
+
+
+def parse_tcp_packet(data: bytes) -> Optional[Tuple[str, int, int, int, int, int, int]]:
+    """
+    解析原始套接字收到的IPv4 TCP报文
+
+    Returns:
+        (源地址, 源端口, 目的端口, 确认号, 标志, 窗口, TTL)，无法解析时返回None
+    """
+    if len(data) < 20 or data[0] >> 4 != 4 or data[9] != socket.IPPROTO_TCP:
+        return None
+    header_len = (data[0] & 0x0f) * 4
+    segment = data[header_len:]
+    if len(segment) < 20:
+        return None
+    src_port, dst_port, _, ack, _, flags, window = struct.unpack('!HHIIBBH', segment[:16])
+    return socket.inet_ntoa(data[12:16]), src_port, dst_port, ack, flags, window, data[8]
+
+
+def source_address(ip: str) -> str:
+    """内核发往 ip 时使用的源地址（UDP connect 只查路由，不发包）"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.connect((ip, 9))
+        return sock.getsockname()[0]
+    finally:
+        sock.close()
+
+
+class _Scan:
+    """一个主机的SYN扫描任务"""
+    __slots__ = ('ip', 'ports', 'future', 'answered', 'open_ports', 'deadline', 'ttl', 'window', 'on_start')
+
+    def __init__(self, ip: str, ports: List[int], future: Future,
+                 on_start: Optional[Callable[[], None]] = None):
+        self.ip = ip
+        self.ports = ports
+        self.future = future
+        self.on_start = on_start
+        self.answered: Set[int] = set()
+        self.open_ports: List[int] = []
+        self.deadline = 0.0   # 全部SYN发出后才设置
+        self.ttl = 0          # 第一个SYN-ACK的TTL和窗口，用于识别操作系统
+        self.window = 0
+
+
+class SynScanner:
+    """
+    SYN端口扫描器（需要root或CAP_NET_RAW）
+
+    一个发送线程在一个原始套接字上连续发出SYN，序列号是由目标地址、端口和
+    进程内随机密钥算出的cookie；接收线程收到SYN-ACK（开放）或RST（关闭）后，
+    检查确认号是否等于cookie+1，不需要为每个探测保存状态，也不占用连接套接字，
+    吞吐量只受发包速率限制。收到SYN-ACK后内核会自动回RST，不会建立连接。
+
+    每个主机的端口全部发出后再等待 timeout 秒，没有应答的端口视为过滤；
+    截止时间登记在时间轮中，接收线程只处理到期的主机。
+    """
+
+    thread_name = "syn-scanner"
+
+    def __init__(self, timeout: float = 1.0, limiter=None, tick: float = 0.01):
+        """
+        初始化扫描器
+
+        Args:
+            timeout: 每个主机最后一个SYN发出后等待应答的时间（秒）
+            limiter: 发包速率限制（RateLimiter），每个SYN取一个令牌
+            tick: 接收线程的轮询间隔（秒）
+        """
+        self.timeout = timeout
+        self.limiter = limiter
+        self.tick = tick
+        # 固定的源端口，应答按目的端口过滤
+        self.src_port = random.randint(40000, 60999)
+        self._secret = os.urandom(16)
+
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._queue: Deque[_Scan] = collections.deque()
+        self._scans: Dict[str, _Scan] = {}
+        self._wheel = TimeoutWheel(tick)  # 主机IP，到期时间为 _Scan.deadline
+        # 主机 -> 第一个SYN-ACK的 (TTL, 窗口)
+        self._fingerprints: Dict[str, Tuple[int, int]] = {}
+        self._sock: Optional[socket.socket] = None
+        self._threads: List[threading.Thread] = []
+        self._running = False
+
+    @staticmethod
+    def available() -> bool:
+        """当前进程能否打开原始TCP套接字"""
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+        except (OSError, AttributeError):
+            return False
+        sock.close()
+        return True
+
+    def cookie(self, ip: str, port: int) -> int:
+        """SYN的序列号：目标地址、端口和源端口的带密钥哈希"""
+        digest = hashlib.blake2s(socket.inet_aton(ip) + struct.pack('!HH', port, self.src_port),
+                                 key=self._secret, digest_size=4).digest()
+        return struct.unpack('!I', digest)[0]
+
+    def scan(self, ip: str, ports: List[int], on_start: Optional[Callable[[], None]] = None) -> Future:
+        """
+        提交一个主机的端口扫描
+
+        Args:
+            ip: 目标地址
+            ports: 端口列表
+            on_start: 发送线程开始发出该主机的SYN时调用（排队等待的时间不算超时）
+
+        Returns:
+            结果为开放端口列表（升序）的Future
+
+        Raises:
+            OSError: 无法打开原始套接字
+        """
+        future: Future = Future()
+        if not ports:
+            future.set_result([])
+            return future
+
+        with self._lock:
+            if not self._running:
+                self._start()
+            scan = _Scan(ip, list(ports), future, on_start)
+            previous = self._scans.get(ip)
+            if previous is not None:
+                # 同一主机的重复请求等上一次结束后再扫描
+                previous.future.add_done_callback(lambda _: self._resubmit(scan))
+                return future
+            self._scans[ip] = scan
+            self._queue.append(scan)
+            self._ready.notify()
+        return future
+
+    def _resubmit(self, scan: _Scan):
+        with self._lock:
+            if not self._running:
+                scan.future.set_result([])
+                return
+            self._scans[scan.ip] = scan
+            self._queue.append(scan)
+            self._ready.notify()
+
+    def fingerprint(self, ip: str) -> Tuple[int, int]:
+        """最近一次扫描中该主机第一个SYN-ACK的 (TTL, 窗口)，没有时为 (0, 0)"""
+        return self._fingerprints.get(ip, (0, 0))
+
+    def _start(self):
+        """打开原始套接字并启动收发线程（调用方持有锁）"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+        sock.settimeout(self.tick)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+        except OSError:
+            pass
+        self._sock = sock
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._send_loop, name=f"{self.thread_name}-sender", daemon=True),
+            threading.Thread(target=self._receive_loop, name=f"{self.thread_name}-receiver", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def close(self):
+        """停止收发线程，未完成的任务以已发现的开放端口完成"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._ready.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+        with self._lock:
+            scans = list(self._scans.values())
+            self._scans.clear()
+            self._queue.clear()
+            self._wheel = TimeoutWheel(self.tick)
+            self._sock.close()
+            self._sock = None
+        for scan in scans:
+            self._finish(scan)
+
+    def _finish(self, scan: _Scan):
+        if not scan.future.done():
+            scan.future.set_result(sorted(scan.open_ports))
+
+    def _send(self, packet: bytes, ip: str) -> bool:
+        for _ in range(100):
+            try:
+                self._sock.sendto(packet, (ip, 0))
+                return True
+            except OSError as e:
+                # 发送缓冲区已满时稍等重试
+                if e.errno != errno.ENOBUFS:
+                    return False
+                time.sleep(0.001)
+        return False
+
+    def _send_loop(self):
+        while True:
+            with self._lock:
+                while self._running and not self._queue:
+                    self._ready.wait()
+                if not self._running:
+                    return
+                scan = self._queue.popleft()
+            if scan.on_start is not None:
+                scan.on_start()
+
+            try:
+                src_ip = source_address(scan.ip)
+            except OSError:
+                # 没有路由，所有端口按过滤处理
+                src_ip = None
+
+            if src_ip is not None:
+                for port in scan.ports:
+                    if not self._running:
+                        return
+                    if self.limiter is not None:
+                        self.limiter.acquire()
+                    self._send(build_syn(src_ip, scan.ip, self.src_port, port, self.cookie(scan.ip, port)), scan.ip)
+
+            with self._lock:
+                scan.deadline = time.perf_counter() + self.timeout
+                self._wheel.add(scan.ip, scan.deadline)
+
+    def _receive_loop(self):
+        sock = self._sock
+        while self._running:
+            try:
+                data = sock.recv(65535)
+            except socket.timeout:
+                data = None
+            except OSError:
+                break
+
+            finished = []
+            parsed = parse_tcp_packet(data) if data else None
+            if parsed is not None:
+                ip, port, dst_port, ack, flags, window, ttl = parsed
+                # 只看发往本扫描器源端口、确认号等于cookie+1的SYN-ACK或RST
+                if dst_port == self.src_port and flags & (TCP_SYN | TCP_RST) and \
+                        ack == (self.cookie(ip, port) + 1) & 0xffffffff:
+                    with self._lock:
+                        scan = self._scans.get(ip)
+                        if scan is not None and port not in scan.answered:
+                            scan.answered.add(port)
+                            if flags & TCP_SYN and flags & TCP_ACK:
+                                scan.open_ports.append(port)
+                                if not scan.ttl:
+                                    scan.ttl, scan.window = ttl, window
+                                    self._fingerprints[ip] = (ttl, window)
+                                if self.limiter is not None:
+                                    self.limiter.on_reply()
+                            if len(scan.answered) == len(scan.ports):
+                                del self._scans[ip]
+                                finished.append(scan)
+
+            now = time.perf_counter()
+            with self._lock:
+                for ip in self._wheel.expire(now):
+                    # 提前完成的主机可能已被同一IP的新任务替换，按新任务的截止时间判断
+                    scan = self._scans.get(ip)
+                    if scan is not None and scan.deadline and scan.deadline <= now:
+                        del self._scans[ip]
+                        finished.append(scan)
+            for scan in finished:
+                self._finish(scan)
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+扫描目标模型模块
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import bisect
+import ipaddress
+import random
+import socket
+import struct
+import threading
+from array import array
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Set, Tuple, Union
+
+Interval = Tuple[int, int]
+
+
+def ip_to_int(ip: str) -> int:
+    """点分十进制IPv4地址转整数"""
+    return int(ipaddress.IPv4Address(ip))
+
+
+def int_to_ip(value: int) -> str:
+    """整数转点分十进制IPv4地址"""
+    return socket.inet_ntoa(struct.pack('!I', value))
+
+
+def merge_intervals(intervals: List[Interval]) -> List[Interval]:
+    """排序并合并重叠或相邻的闭区间"""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(include: List[Interval], exclude: List[Interval]) -> List[Interval]:
+    """从已合并的 include 区间中减去已合并的 exclude 区间"""
+    result: List[Interval] = []
+    j = 0
+    for start, end in include:
+        # 跳过完全位于当前区间之前的排除区间
+        while j < len(exclude) and exclude[j][1] < start:
+            j += 1
+        k = j
+        while k < len(exclude) and exclude[k][0] <= end:
+            ex_start, ex_end = exclude[k]
+            if ex_start > start:
+                result.append((start, ex_start - 1))
+            start = max(start, ex_end + 1)
+            if start > end:
+                break
+            k += 1
+        if start <= end:
+            result.append((start, end))
+    return result
+
+
+class TargetPlan:
+    """
+    目标区间集合
+
+    目标以排好序、互不重叠的 uint32 闭区间保存：重叠的输入会被合并去重，
+    排除区间在最后统一减去（无论添加顺序如何，排除总是优先）。
+    迭代时才逐个生成IP字符串，因此 /8 这样的大网段也只占几十字节；
+    len() 为 O(1)，成员判断为二分查找。
+    """
+
+    def __init__(self):
+        self._includes: List[Interval] = []
+        self._excludes: List[Interval] = []
+        self._starts = array('I')
+        self._ends = array('I')
+        self._offsets = array('Q')  # 每个区间第一个地址在整个集合中的序号
+        self._size = 0
+        self._dirty = False
+
+    @staticmethod
+    def _check_range(start: int, end: int) -> Interval:
+        if start > end:
+            start, end = end, start
+        if start < 0 or end > 0xffffffff:
+            raise ValueError("IP地址超出IPv4范围")
+        return start, end
+
+    @staticmethod
+    def _network_range(network: ipaddress.IPv4Network, hosts_only: bool) -> Interval:
+        if network.version != 4:
+            raise ValueError(f"仅支持IPv4网段: {network}")
+        start = int(network.network_address)
+        end = int(network.broadcast_address)
+        # 与 network.hosts() 一致，/31 和 /32 不去掉首尾
+        if hosts_only and network.prefixlen < 31:
+            start += 1
+            end -= 1
+        return start, end
+
+    def add_range(self, start: int, end: int):
+        """添加闭区间 [start, end]"""
+        self._includes.append(self._check_range(start, end))
+        self._dirty = True
+
+    def add_ip(self, ip: str):
+        """添加单个IP地址"""
+        value = ip_to_int(ip)
+        self.add_range(value, value)
+
+    def add_network(self, network: ipaddress.IPv4Network, hosts_only: bool = True):
+        """
+        添加网段
+
+        Args:
+            network: IPv4网段
+            hosts_only: 是否去掉网络地址和广播地址
+        """
+        self.add_range(*self._network_range(network, hosts_only))
+
+    def extend(self, other: 'TargetPlan'):
+        """合并另一个目标集合（其中已减去的排除区间不会被带回来）"""
+        self._includes.extend(other.ranges())
+        self._dirty = True
+
+    def exclude_range(self, start: int, end: int):
+        """排除闭区间 [start, end]"""
+        self._excludes.append(self._check_range(start, end))
+        self._dirty = True
+
+    def exclude(self, other: 'TargetPlan'):
+        """排除另一个目标集合中的所有地址"""
+        self._excludes.extend(other.ranges())
+        self._dirty = True
+
+    def _normalize(self):
+        """合并区间并减去排除区间"""
+        if not self._dirty:
+            return
+        self._includes = merge_intervals(self._includes)
+        self._excludes = merge_intervals(self._excludes)
+        ranges = subtract_intervals(self._includes, self._excludes)
+
+        self._starts = array('I', (start for start, _ in ranges))
+        self._ends = array('I', (end for _, end in ranges))
+        self._offsets = array('Q')
+        self._size = 0
+        for start, end in ranges:
+            self._offsets.append(self._size)
+            self._size += end - start + 1
+        self._dirty = False
+
+    def ranges(self) -> List[Interval]:
+        """返回排好序、互不重叠的整数区间列表"""
+        self._normalize()
+        return list(zip(self._starts, self._ends))
+
+    def iter_ints(self) -> Iterator[int]:
+        """按地址顺序逐个产出整数形式的地址"""
+        self._normalize()
+        for start, end in zip(self._starts, self._ends):
+            yield from range(start, end + 1)
+
+    def address_at(self, index: int) -> int:
+        """返回按地址顺序排第 index 个（从0开始）的地址，二分查找所在区间"""
+        self._normalize()
+        if not 0 <= index < self._size:
+            raise IndexError("目标序号超出范围")
+        slot = bisect.bisect_right(self._offsets, index) - 1
+        return self._starts[slot] + (index - self._offsets[slot])
+
+    def __iter__(self) -> Iterator[str]:
+        for value in self.iter_ints():
+            yield int_to_ip(value)
+
+    def __contains__(self, ip: Union[str, int]) -> bool:
+        self._normalize()
+        if isinstance(ip, str):
+            try:
+                ip = ip_to_int(ip)
+            except ValueError:
+                return False
+        index = bisect.bisect_right(self._starts, ip) - 1
+        return index >= 0 and ip <= self._ends[index]
+
+    def __len__(self) -> int:
+        self._normalize()
+        return self._size
+
+    def __repr__(self) -> str:
+        self._normalize()
+        return f"TargetPlan(ranges={len(self._starts)}, size={self._size})"
+
+
+class TargetPermutation:
+    """
+    目标集合的伪随机访问顺序
+
+    在 [0, 2^k) 上使用满周期线性同余生成器（c为奇数、a≡1 mod 4），
+    跳过不小于目标数的序号（cycle-walking），再把序号映射为区间集合中的地址。
+    不生成也不打乱任何列表；相同的种子得到相同的顺序，记录 position 后
+    可以用 seek() 以 O(log n) 的代价跳回原处继续扫描。
+
+    position 在地址被取出时就前进，而取出的地址可能还在扫描中。扫描器对每个
+    已产出结果的地址调用 mark_done()，resume_position 为最早一个取出后尚未
+    完成的步数，中断后从这里继续不会漏掉主机（少量已完成的主机会被重扫）。
+    """
+
+    def __init__(self, plan: TargetPlan, seed: int = 0):
+        """
+        初始化排列
+
+        Args:
+            plan: 目标区间集合
+            seed: 随机种子
+        """
+        self.plan = plan
+        self.seed = seed
+        self._size = len(plan)
+
+        # 模数至少为8，乘数才有不等于1的取值（乘数为1时退化为等差数列）
+        self.modulus = 8
+        while self.modulus < self._size:
+            self.modulus <<= 1
+
+        rng = random.Random(seed)
+        self.multiplier = rng.randrange(1, self.modulus // 4) * 4 + 1
+        self.increment = rng.randrange(self.modulus // 2) * 2 + 1
+        self._origin = rng.randrange(self.modulus)
+        self._state = self._origin
+        self.position = 0  # 已走过的生成器步数（含被跳过的序号）
+
+        # 已取出但尚未完成的地址，用于计算 resume_position
+        self._lock = threading.Lock()
+        self._outstanding: Dict[int, int] = {}  # 地址 -> 取出时的步数
+        self._issued: Deque[int] = deque()      # 尚未确认的步数（升序）
+        self._done: Set[int] = set()            # 已完成但前面还有未完成的步数
+
+    def _jump(self, steps: int):
+        """计算生成器走 steps 步的等效仿射变换 (a, c)"""
+        acc_a, acc_c = 1, 0
+        cur_a, cur_c = self.multiplier, self.increment
+        while steps:
+            if steps & 1:
+                acc_a = (acc_a * cur_a) % self.modulus
+                acc_c = (acc_c * cur_a + cur_c) % self.modulus
+            cur_c = (cur_c * (cur_a + 1)) % self.modulus
+            cur_a = (cur_a * cur_a) % self.modulus
+            steps >>= 1
+        return acc_a, acc_c
+
+    def seek(self, position: int):
+        """跳到第 position 步，用于从中断处继续扫描"""
+        position = max(0, min(position, self.modulus))
+        a, c = self._jump(position)
+        self._state = (a * self._origin + c) % self.modulus
+        self.position = position
+        with self._lock:
+            self._outstanding.clear()
+            self._issued.clear()
+            self._done.clear()
+
+    def mark_done(self, ip: Union[str, int]):
+        """标记一个已取出的地址扫描完成（线程安全，不是本排列取出的地址会被忽略）"""
+        if isinstance(ip, str):
+            try:
+                ip = ip_to_int(ip)
+            except ValueError:
+                return
+        with self._lock:
+            step = self._outstanding.pop(ip, None)
+            if step is None:
+                return
+            self._done.add(step)
+            while self._issued and self._issued[0] in self._done:
+                self._done.remove(self._issued.popleft())
+
+    @property
+    def resume_position(self) -> int:
+        """中断后继续扫描的位置：最早一个尚未完成的地址的步数"""
+        with self._lock:
+            return self._issued[0] if self._issued else self.position
+
+    def iter_ints(self) -> Iterator[int]:
+        """从当前位置开始逐个产出整数形式的地址"""
+        while self.position < self.modulus:
+            index = self._state
+            step = self.position
+            self._state = (self.multiplier * self._state + self.increment) % self.modulus
+            self.position += 1
+            if index < self._size:
+                value = self.plan.address_at(index)
+                with self._lock:
+                    self._outstanding[value] = step
+                    self._issued.append(step)
+                yield value
+
+    def __iter__(self) -> Iterator[str]:
+        for value in self.iter_ints():
+            yield int_to_ip(value)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __repr__(self) -> str:
+        return f"TargetPermutation(size={self._size}, seed={self.seed}, position={self.position})"
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量UDP查询客户端基类模块
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import collections
+import random
+import select
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from .icmp import TimeoutWheel
+except ImportError:  # 直接运行时
+    from icmp import TimeoutWheel
+
+
+class _Query:
+    """一个在途的查询"""
+    __slots__ = ('ip', 'name', 'future', 'attempt', 'deadline')
+
+    def __init__(self, ip: str, name: str, future: Future):
+        self.ip = ip
+        self.name = name
+        self.future = future
+        self.attempt = 0
+        self.deadline = 0.0
+
+
+class UdpQueryClient:
+    """
+    批量UDP查询客户端
+
+    所有查询共用一个UDP套接字：query() 立即发出请求并返回Future，由一个后台线程
+    接收应答、按16位查询ID匹配，并用时间轮处理超时；超时的查询重发，重试用完后
+    以无结果完成。调用方无需为每个查询占用一个阻塞线程，成百上千个查询可以同时在途。
+
+    子类实现 _destination、_build、_parse、_result 和 _empty_result。
+    """
+
+    # _result 返回该值表示重发查询
+    RETRY = object()
+
+    thread_name = "udp-query-receiver"
+
+    def __init__(self, timeout: float = 1.0, retries: int = 2, max_inflight: int = 512,
+                 tick: float = 0.01):
+        """
+        初始化客户端
+
+        Args:
+            timeout: 单次请求的超时时间（秒）
+            retries: 超时后的重试次数
+            max_inflight: 同时在途的最大查询数，超出的查询排队等待
+            tick: 时间轮粒度及接收线程的轮询间隔（秒）
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.max_inflight = max_inflight
+        self.tick = tick
+
+        self._sock: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._pending: Dict[int, _Query] = {}
+        self._backlog: Deque[_Query] = collections.deque()
+        self._wheel = TimeoutWheel(tick)
+        self._running = False
+
+    def _destination(self, query: _Query) -> Tuple[str, int]:
+        """查询（第 query.attempt 次发送）的目的地址"""
+        raise NotImplementedError
+
+    def _build(self, query: _Query, query_id: int) -> bytes:
+        """构造请求报文"""
+        raise NotImplementedError
+
+    def _parse(self, message: bytes, address: Tuple[str, int]) -> Optional[Tuple[int, Any]]:
+        """解析收到的报文，返回 (查询ID, 解析结果)，不是有效应答时返回None"""
+        raise NotImplementedError
+
+    def _result(self, query: _Query, parsed: Any) -> Any:
+        """由解析结果生成查询结果；返回None表示应答不属于该查询，返回 RETRY 表示重发"""
+        raise NotImplementedError
+
+    def _empty_result(self, query: _Query) -> Any:
+        """超时或客户端关闭时的查询结果"""
+        raise NotImplementedError
+
+    def _open_socket(self) -> socket.socket:
+        """打开查询用的套接字"""
+        return socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def _start(self):
+        """首次查询时打开套接字并启动接收线程（调用方持有锁）"""
+        if self._running:
+            return
+        self._sock = self._open_socket()
+        self._sock.setblocking(False)
+        self._running = True
+        self._thread = threading.Thread(target=self._receive_loop, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """停止接收线程并关闭套接字，未完成的查询以无结果完成"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            thread = self._thread
+        thread.join()
+
+        with self._lock:
+            queries = list(self._pending.values()) + list(self._backlog)
+            self._pending.clear()
+            self._backlog.clear()
+            self._wheel = TimeoutWheel(self.tick)
+            self._sock.close()
+            self._sock = None
+        for query in queries:
+            self._finish(query, self._empty_result(query))
+
+    def _submit(self, ip: str, name: str = '') -> Future:
+        """登记并发出一个查询"""
+        query = _Query(ip, name, Future())
+        with self._lock:
+            self._start()
+            if len(self._pending) < self.max_inflight:
+                self._send(query, time.perf_counter())
+            else:
+                self._backlog.append(query)
+        return query.future
+
+    def query(self, ip: str) -> Future:
+        """发出一个查询，返回结果的Future"""
+        return self._submit(ip)
+
+    def resolve(self, ip: str) -> Any:
+        """阻塞查询一个IP（超时和重试由客户端负责，最长约 timeout × (retries + 1) 秒）"""
+        return self.query(ip).result()
+
+    def resolve_many(self, ips: Iterable[str]) -> Iterator[Any]:
+        """
+        批量查询，按完成顺序产出结果
+
+        Args:
+            ips: IP地址（可以是惰性迭代器，最多同时取出 max_inflight 个）
+        """
+        done: Deque[Any] = collections.deque()
+        ready = threading.Condition()
+        outstanding = 0
+
+        def collect(future: Future):
+            with ready:
+                done.append(future.result())
+                ready.notify()
+
+        ip_iter = iter(ips)
+        exhausted = False
+        while True:
+            while not exhausted and outstanding < self.max_inflight:
+                try:
+                    ip = next(ip_iter)
+                except StopIteration:
+                    exhausted = True
+                    break
+                outstanding += 1
+                self.query(ip).add_done_callback(collect)
+
+            if not outstanding:
+                break
+            with ready:
+                while not done:
+                    ready.wait()
+                results = list(done)
+                done.clear()
+            outstanding -= len(results)
+            yield from results
+
+    def _send(self, query: _Query, now: float):
+        """发出（或重发）一个查询，调用方持有锁"""
+        query_id = random.getrandbits(16)
+        while query_id in self._pending:
+            query_id = random.getrandbits(16)
+
+        query.deadline = now + self.timeout
+        self._pending[query_id] = query
+        self._wheel.add(query_id, query.deadline)
+        try:
+            self._sock.sendto(self._build(query, query_id), self._destination(query))
+        except OSError:
+            # 发送失败按超时处理，交给时间轮重试
+            pass
+
+    def _retry(self, query: _Query, now: float) -> bool:
+        """还有重试次数时重发查询，调用方持有锁"""
+        if query.attempt >= self.retries:
+            return False
+        query.attempt += 1
+        self._send(query, now)
+        return True
+
+    def _finish(self, query: _Query, result: Any):
+        if not query.future.done():
+            query.future.set_result(result)
+
+    def _receive_loop(self):
+        sock = self._sock
+        while self._running:
+            try:
+                readable, _, _ = select.select([sock], [], [], self.tick)
+            except (OSError, ValueError):
+                break
+
+            finished: List[Tuple[_Query, Any]] = []
+            if readable:
+                while True:
+                    try:
+                        message, address = sock.recvfrom(4096)
+                    except OSError:
+                        # 包括没有更多数据（BlockingIOError），以及Windows上端口不可达
+                        # 造成的 recvfrom 报错；剩余的应答在下一轮 select 后继续接收
+                        break
+                    parsed = self._parse(message, address)
+                    if parsed is None:
+                        continue
+                    query_id, payload = parsed
+                    with self._lock:
+                        query = self._pending.get(query_id)
+                        if query is None:
+                            continue
+                        result = self._result(query, payload)
+                        if result is None:
+                            continue
+                        del self._pending[query_id]
+                        if result is self.RETRY:
+                            if self._retry(query, time.perf_counter()):
+                                continue
+                            result = self._empty_result(query)
+                    finished.append((query, result))
+
+            now = time.perf_counter()
+            with self._lock:
+                for query_id in self._wheel.expire(now):
+                    query = self._pending.get(query_id)
+                    if query is None or query.deadline > now:
+                        continue
+                    del self._pending[query_id]
+                    if not self._retry(query, now):
+                        finished.append((query, self._empty_result(query)))
+
+                while self._backlog and len(self._pending) < self.max_inflight:
+                    self._send(self._backlog.popleft(), now)
+
+            for query, result in finished:
+                self._finish(query, result)
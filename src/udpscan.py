@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+UDP服务探测模块（协议负载、ICMP端口不可达关联）
+作者：张夏灵
+班级：网云2302
+学号：542307280233
+"""
+
+import collections
+import errno
+import re
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+try:
+    from .icmp import ICMP_DEST_UNREACH, MSG_ERRQUEUE, TimeoutWheel, enable_recv_errors, parse_recv_error
+except ImportError:  # 直接运行时
+    from icmp import ICMP_DEST_UNREACH, MSG_ERRQUEUE, TimeoutWheel, enable_recv_errors, parse_recv_error
+
+ICMP_PORT_UNREACH = 3
+
+# 端口状态（有应答的端口记录服务描述）
+UDP_CLOSED = "关闭"
+UDP_FILTERED = "过滤"
+
+DEFAULT_UDP_PORTS = (53, 123, 161, 1900)
+
+
+def build_dns_query() -> bytes:
+    """查询 version.bind（CHAOS类TXT），任何DNS应答（包括拒绝）都说明服务存在"""
+    header = struct.pack('!HHHHHH', 0x4e53, 0x0100, 1, 0, 0, 0)
+    question = b'\x07version\x04bind\x00' + struct.pack('!HH', 16, 3)
+    return header + question
+
+
+def build_snmp_get(community: bytes = b'public') -> bytes:
+    """SNMPv2c GetRequest，读取 sysDescr.0"""
+    def tlv(tag: int, value: bytes) -> bytes:
+        return bytes([tag, len(value)]) + value
+
+    oid = b'\x2b\x06\x01\x02\x01\x01\x01\x00'
+    varbind = tlv(0x30, tlv(0x06, oid) + b'\x05\x00')
+    pdu = tlv(0xa0, tlv(0x02, b'\x4e\x53') + tlv(0x02, b'\x00') + tlv(0x02, b'\x00') + tlv(0x30, varbind))
+    return tlv(0x30, tlv(0x02, b'\x01') + tlv(0x04, community) + pdu)
+
+
+def build_ntp_request() -> bytes:
+    """NTPv4 客户端请求（LI=0, VN=4, Mode=3）"""
+    return b'\x23' + b'\x00' * 47
+
+
+def build_ssdp_search() -> bytes:
+    """单播 M-SEARCH"""
+    return (b'M-SEARCH * HTTP/1.1\r\n'
+            b'HOST: 239.255.255.250:1900\r\n'
+            b'MAN: "ssdp:discover"\r\n'
+            b'MX: 1\r\n'
+            b'ST: ssdp:all\r\n\r\n')
+
+
+def parse_dns(data: bytes) -> Optional[str]:
+    if len(data) < 12 or data[:2] != b'\x4e\x53' or not data[2] & 0x80:
+        return None
+    return "dns"
+
+
+def parse_snmp(data: bytes) -> Optional[str]:
+    if not data.startswith(b'\x30'):
+        return None
+    # sysDescr.0 的值紧跟在OID和OCTET STRING标签之后
+    match = re.search(rb'\x06\x08\x2b\x06\x01\x02\x01\x01\x01\x00\x04([\x00-\x7f])', data)
+    if match is None:
+        return "snmp"
+    start = match.end()
+    descr = data[start:start + match.group(1)[0]].decode('latin-1').strip()
+    return f"snmp {descr}" if descr else "snmp"
+
+
+def parse_ntp(data: bytes) -> Optional[str]:
+    if len(data) < 48 or data[0] & 0x07 != 4:
+        return None
+    return f"ntp v{(data[0] >> 3) & 0x07} stratum {data[1]}"
+
+
+def parse_ssdp(data: bytes) -> Optional[str]:
+    if not data.startswith(b'HTTP/1.1 200'):
+        return None
+    match = re.search(rb'\r\nServer: *([^\r\n]+)', data, re.I)
+    return f"ssdp {match.group(1).decode('latin-1').strip()}" if match else "ssdp"
+
+
+# 端口 -> (请求负载, 应答解析)；解析返回None表示不是该协议的应答
+UDP_PROBES: Dict[int, Tuple[bytes, Callable[[bytes], Optional[str]]]] = {
+    53: (build_dns_query(), parse_dns),
+    123: (build_ntp_request(), parse_ntp),
+    161: (build_snmp_get(), parse_snmp),
+    1900: (build_ssdp_search(), parse_ssdp),
+}
+
+
+class _Scan:
+    """一个主机的UDP探测任务"""
+    __slots__ = ('ip', 'future', 'results', 'remaining', 'on_start')
+
+    def __init__(self, ip: str, future: Future, count: int, on_start: Optional[Callable[[], None]] = None):
+        self.ip = ip
+        self.future = future
+        self.results: Dict[int, str] = {}
+        self.remaining = count
+        self.on_start = on_start
+
+
+class _Probe:
+    """一个在途的UDP探测"""
+    __slots__ = ('scan', 'port', 'attempt', 'deadline')
+
+    def __init__(self, scan: _Scan, port: int):
+        self.scan = scan
+        self.port = port
+        self.attempt = 0
+        self.deadline = 0.0
+
+
+class UdpServiceScanner:
+    """
+    UDP服务探测
+
+    所有主机的探测进入同一个队列，由一个后台线程从一小组UDP套接字发出（按目标地址和
+    端口分散到各套接字），发包前从限速器取令牌，应答按 (地址, 端口) 匹配。
+    各端口发送对应协议的请求（DNS、NTP、SNMP、SSDP），未知端口发送空数据报。
+
+    Linux上套接字开启 IP_RECVERR，ICMP端口不可达从同一套接字的错误队列读出，
+    据此区分关闭（端口不可达）和过滤（其他不可达，例如管理禁止）；
+    重试用完仍无应答的端口可能开放也可能被过滤，不记录。
+    """
+
+    thread_name = "udp-scanner"
+
+    def __init__(self, timeout: float = 1.0, retries: int = 1, pool_size: int = 4,
+                 max_inflight: int = 1024, limiter=None, tick: float = 0.01):
+        """
+        初始化
+
+        Args:
+            timeout: 单次探测的超时时间（秒）
+            retries: 无应答时的重试次数
+            pool_size: 套接字数
+            max_inflight: 同时在途的最大探测数，超出的排队
+            limiter: 发包速率限制（RateLimiter），每个数据报取一个令牌
+            tick: 时间轮粒度及轮询间隔（秒）
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.pool_size = pool_size
+        self.max_inflight = max_inflight
+        self.limiter = limiter
+        self.tick = tick
+        self.recv_errors = sys.platform.startswith('linux')
+
+        self._lock = threading.Lock()
+        self._sockets: List[socket.socket] = []
+        self._backlog: Deque[_Probe] = collections.deque()
+        self._pending: Dict[Tuple[str, int], _Probe] = {}
+        # 同一主机端口已有探测在途时，后来的探测在这里等它结束，不挡住队列中的其他探测
+        self._deferred: Dict[Tuple[str, int], Deque[_Probe]] = {}
+        self._wheel = TimeoutWheel(tick)
+        self._hold_until = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def scan(self, ip: str, ports: List[int], on_start: Optional[Callable[[], None]] = None) -> Future:
+        """
+        提交一个主机的UDP探测
+
+        Args:
+            ip: 目标地址
+            ports: 端口列表
+            on_start: 该主机的第一个探测离开队列时在后台线程中调用（排队等待的时间不算超时）
+
+        Returns:
+            结果为 {端口: 服务描述、"关闭" 或 "过滤"} 的Future，无应答的端口不在其中
+        """
+        future: Future = Future()
+        if not ports:
+            future.set_result({})
+            return future
+
+        scan = _Scan(ip, future, len(ports), on_start)
+        with self._lock:
+            if not self._running:
+                self._start()
+            self._backlog.extend(_Probe(scan, port) for port in ports)
+        return future
+
+    def _start(self):
+        """打开套接字池并启动后台线程（调用方持有锁）"""
+        self._sockets = []
+        for _ in range(self.pool_size):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setblocking(False)
+            if self.recv_errors and not enable_recv_errors(sock):
+                self.recv_errors = False
+            self._sockets.append(sock)
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """停止后台线程并关闭套接字，未完成的任务以已有结果完成"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            thread = self._thread
+        thread.join()
+
+        with self._lock:
+            scans = {probe.scan for probe in self._pending.values()} | {probe.scan for probe in self._backlog}
+            scans |= {probe.scan for waiting in self._deferred.values() for probe in waiting}
+            self._pending.clear()
+            self._backlog.clear()
+            self._deferred.clear()
+            self._wheel = TimeoutWheel(self.tick)
+            for sock in self._sockets:
+                sock.close()
+            self._sockets = []
+        for scan in scans:
+            self._finish(scan)
+
+    def _finish(self, scan: _Scan):
+        if not scan.future.done():
+            scan.future.set_result(dict(sorted(scan.results.items())))
+
+    def _done(self, probe: _Probe, state: Optional[str]) -> Optional[_Scan]:
+        """记录一个端口的结果，主机全部端口完成时返回该任务（调用方持有锁）"""
+        scan = probe.scan
+        key = (scan.ip, probe.port)
+        waiting = self._deferred.get(key)
+        if waiting:
+            # 放行等待同一主机端口的下一个探测，排在队首
+            self._backlog.appendleft(waiting.popleft())
+            if not waiting:
+                del self._deferred[key]
+        if state is not None:
+            scan.results[probe.port] = state
+        scan.remaining -= 1
+        return scan if scan.remaining == 0 else None
+
+    def _socket_for(self, ip: str, port: int) -> socket.socket:
+        return self._sockets[hash((ip, port)) % len(self._sockets)]
+
+    def _send(self, probe: _Probe, now: float):
+        """发出（或重发）一个探测，调用方持有锁"""
+        ip, port = probe.scan.ip, probe.port
+        payload = UDP_PROBES.get(port, (b'', None))[0]
+        probe.deadline = now + self.timeout
+        self._pending[(ip, port)] = probe
+        self._wheel.add((ip, port), probe.deadline)
+        try:
+            self._socket_for(ip, port).sendto(payload, (ip, port))
+        except OSError:
+            # 发送失败按超时处理，交给时间轮重试
+            pass
+
+    def _send_backlog(self, now: float) -> List[Callable[[], None]]:
+        """
+        在并发和速率限制内发出排队的探测（调用方持有锁）
+
+        Returns:
+            本次开始处理的主机的 on_start 回调，由调用方释放锁后调用
+        """
+        started = []
+        while self._backlog and len(self._pending) < self.max_inflight and now >= self._hold_until:
+            probe = self._backlog.popleft()
+            key = (probe.scan.ip, probe.port)
+            if key in self._pending:
+                # 同一主机端口的上一次探测还在途，等它结束后由 _done 放回队首
+                self._deferred.setdefault(key, collections.deque()).append(probe)
+                continue
+            if self.limiter is not None:
+                # 令牌不足时本次照常发出，之后的探测推迟到令牌补足
+                wait = self.limiter.reserve()
+                if wait > 0:
+                    self._hold_until = now + wait
+            if probe.scan.on_start is not None:
+                started.append(probe.scan.on_start)
+                probe.scan.on_start = None
+            self._send(probe, now)
+        return started
+
+    def _on_reply(self, sock: socket.socket, finished: List[_Scan]):
+        """读取一个套接字上的应答和ICMP错误（调用方持有锁）"""
+        while True:
+            try:
+                data, address = sock.recvfrom(4096)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                # 未读的ICMP错误会让 recvfrom 报一次错（如ECONNREFUSED），详细信息在错误队列里
+                continue
+            probe = self._pending.get(address[:2])
+            if probe is None:
+                continue
+            parser = UDP_PROBES.get(probe.port, (b'', None))[1]
+            service = parser(data) if parser is not None else "udp"
+            if service is None:
+                continue
+            if self.limiter is not None:
+                self.limiter.on_reply(retry=probe.attempt > 0)
+            del self._pending[address[:2]]
+            scan = self._done(probe, service)
+            if scan is not None:
+                finished.append(scan)
+
+        if not self.recv_errors:
+            return
+        while True:
+            try:
+                _, ancdata, _, address = sock.recvmsg(512, 512, MSG_ERRQUEUE)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                if e.errno == errno.EAGAIN:
+                    break
+                continue
+            error = parse_recv_error(ancdata)
+            # 错误队列的地址是出错数据报的目的地址
+            probe = self._pending.get(address[:2]) if address else None
+            if error is None or probe is None or error[0] != ICMP_DEST_UNREACH:
+                continue
+            if error[1] == ICMP_PORT_UNREACH:
+                state = UDP_CLOSED
+                if self.limiter is not None:
+                    self.limiter.on_reply(retry=probe.attempt > 0)
+            else:
+                state = UDP_FILTERED
+                if self.limiter is not None:
+                    self.limiter.on_unreachable()
+            del self._pending[address[:2]]
+            scan = self._done(probe, state)
+            if scan is not None:
+                finished.append(scan)
+
+    def _loop(self):
+        while self._running:
+            try:
+                readable, _, _ = select.select(self._sockets, [], [], self.tick)
+            except (OSError, ValueError):
+                break
+
+            finished: List[_Scan] = []
+            now = time.perf_counter()
+            with self._lock:
+                for sock in readable:
+                    self._on_reply(sock, finished)
+
+                for key in self._wheel.expire(now):
+                    probe = self._pending.get(key)
+                    if probe is None or probe.deadline > now:
+                        continue
+                    del self._pending[key]
+                    if probe.attempt < self.retries:
+                        probe.attempt += 1
+                        self._backlog.appendleft(probe)
+                        continue
+                    # 重试用完仍无应答：开放或被过滤，无法区分
+                    scan = self._done(probe, None)
+                    if scan is not None:
+                        finished.append(scan)
+
+                started = self._send_backlog(now)
+
+            for callback in started:
+                callback()
+            for scan in finished:
+                self._finish(scan)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试ARP报文构造与解析
+"""
+
+import socket
+import struct
+import unittest
+
+from src.arp import (ARP_REPLY, ARP_REQUEST, BROADCAST_MAC, ETH_P_ARP, ETH_P_IP, Interface, ArpSweeper,
+                     build_arp_request, format_mac, parse_arp_reply)
+
+LOCAL_MAC = bytes.fromhex('020000000001')
+PEER_MAC = bytes.fromhex('0a1b2c3d4e5f')
+
+
+def arp_reply(sender_ip='10.0.0.7', op=ARP_REPLY):
+    ether = LOCAL_MAC + PEER_MAC + struct.pack('!H', ETH_P_ARP)
+    arp = struct.pack('!HHBBH', 1, ETH_P_IP, 6, 4, op)
+    arp += PEER_MAC + socket.inet_aton(sender_ip) + LOCAL_MAC + socket.inet_aton('10.0.0.1')
+    return ether + arp
+
+
+class TestArpFrames(unittest.TestCase):
+    def test_build_request(self):
+        frame = build_arp_request(LOCAL_MAC, '10.0.0.1', '10.0.0.7')
+        self.assertEqual(len(frame), 42)
+        self.assertEqual(frame[:6], BROADCAST_MAC)
+        self.assertEqual(frame[6:12], LOCAL_MAC)
+        self.assertEqual(struct.unpack('!H', frame[20:22])[0], ARP_REQUEST)
+        self.assertEqual(socket.inet_ntoa(frame[28:32]), '10.0.0.1')
+        self.assertEqual(socket.inet_ntoa(frame[38:42]), '10.0.0.7')
+
+    def test_parse_reply(self):
+        self.assertEqual(parse_arp_reply(arp_reply()), ('10.0.0.7', PEER_MAC))
+
+    def test_parse_ignores_requests_and_short_frames(self):
+        self.assertIsNone(parse_arp_reply(arp_reply(op=ARP_REQUEST)))
+        self.assertIsNone(parse_arp_reply(arp_reply()[:40]))
+
+    def test_format_mac(self):
+        self.assertEqual(format_mac(PEER_MAC), '0A:1B:2C:3D:4E:5F')
+
+
+class TestArpSweeperHooks(unittest.TestCase):
+    def setUp(self):
+        interface = Interface(name='eth0', ip='10.0.0.1', netmask='255.255.255.0', mac=LOCAL_MAC)
+        self.sweeper = ArpSweeper(interface, timeout=0.1)
+
+    def test_local_address_needs_no_request(self):
+        reply = self.sweeper._local_reply('10.0.0.1')
+        self.assertEqual(reply.mac, format_mac(LOCAL_MAC))
+        self.assertIsNone(self.sweeper._local_reply('10.0.0.7'))
+
+    def test_request_keyed_by_ip(self):
+        key, packet = self.sweeper._request('10.0.0.7')
+        self.assertEqual(key, '10.0.0.7')
+        self.assertEqual(packet, build_arp_request(LOCAL_MAC, '10.0.0.1', '10.0.0.7'))
+
+
+if __name__ == '__main__':
+    unittest.main()
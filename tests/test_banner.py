@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试服务识别与横幅抓取器
+"""
+
+import socket
+import struct
+import threading
+import time
+import unittest
+
+from src.banner import BannerGrabber, build_client_hello, identify, probe_for
+from src.pipeline import EnrichmentStage
+from src.scanner import HostInfo, NetworkScanner
+
+
+def slow_ssh_server(test, delay):
+    """在 0.0.0.0 上监听，逐个接受连接，delay 秒后发送SSH横幅"""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(('0.0.0.0', 0))
+    server.listen(64)
+    server.settimeout(0.1)
+    stopped = threading.Event()
+
+    def serve():
+        while not stopped.is_set():
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                continue
+            with conn:
+                time.sleep(delay)
+                try:
+                    conn.sendall(b'SSH-2.0-Slow_1.0\r\n')
+                except OSError:
+                    pass
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    test.addCleanup(server.close)
+    test.addCleanup(thread.join)
+    test.addCleanup(stopped.set)
+    return server.getsockname()[1]
+
+
+class TestIdentify(unittest.TestCase):
+    def test_banners(self):
+        self.assertEqual(identify(b'SSH-2.0-OpenSSH_9.6p1 Ubuntu-3\r\n'), 'ssh OpenSSH_9.6p1 Ubuntu-3')
+        self.assertEqual(identify(b'220 ProFTPD 1.3.8 Server (FTP)\r\n'), 'ftp ProFTPD 1.3.8 Server (FTP)')
+        self.assertEqual(identify(b'220 mail.example.com ESMTP Postfix\r\n'), 'smtp mail.example.com ESMTP Postfix')
+        self.assertEqual(identify(b'RFB 003.008\n'), 'vnc 003.008')
+
+    def test_http_server_header(self):
+        self.assertEqual(identify(b'HTTP/1.1 200 OK\r\nDate: x\r\nServer: nginx/1.24.0\r\n\r\n'), 'http nginx/1.24.0')
+        self.assertEqual(identify(b'HTTP/1.0 404 Not Found\r\n\r\n'), 'http')
+
+    def test_tls_server_hello(self):
+        server_hello = b'\x16\x03\x03\x00\x31\x02\x00\x00\x2d\x03\x03' + bytes(40)
+        self.assertEqual(identify(server_hello), 'tls TLS1.2')
+        self.assertEqual(identify(b'\x15\x03\x01\x00\x02\x02\x28'), 'tls')
+
+    def test_unknown(self):
+        self.assertEqual(identify(b''), '未知')
+        self.assertEqual(identify(b'hello'), '未知')
+
+
+class TestProbes(unittest.TestCase):
+    def test_client_hello_lengths(self):
+        hello = build_client_hello()
+        self.assertEqual(hello[:3], b'\x16\x03\x01')
+        self.assertEqual(struct.unpack('!H', hello[3:5])[0], len(hello) - 5)
+        self.assertEqual(hello[5], 1)
+        self.assertEqual(int.from_bytes(hello[6:9], 'big'), len(hello) - 9)
+        self.assertEqual(hello[9:11], b'\x03\x03')
+
+    def test_probe_for_port(self):
+        self.assertTrue(probe_for('10.0.0.1', 22).startswith(b'SSH-2.0-'))
+        self.assertEqual(probe_for('10.0.0.1', 443)[0], 0x16)
+        self.assertEqual(probe_for('10.0.0.1', 8080), b'HEAD / HTTP/1.0\r\nHost: 10.0.0.1\r\n\r\n')
+
+
+class TestBannerGrabber(unittest.TestCase):
+    def test_close_finishes_pending_grabs(self):
+        # 接受连接但从不应答的服务
+        server = socket.socket()
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        server.listen()
+        port = server.getsockname()[1]
+
+        grabber = BannerGrabber(timeout=30, wait=30)
+        future = grabber.grab('127.0.0.1', [port])
+        time.sleep(0.2)
+        self.assertFalse(future.done())
+        grabber.close()
+        self.assertEqual(future.result(timeout=0), {port: '未知'})
+
+    def test_empty_ports(self):
+        self.assertEqual(BannerGrabber().grab('127.0.0.1', []).result(timeout=0), {})
+
+    def test_deadline_starts_when_host_gets_a_slot(self):
+        port = slow_ssh_server(self, 0.25)
+        # 一个并发名额，每个主机约0.25秒；8个主机排队约2秒，远超单个主机的阶段超时
+        grabber = BannerGrabber(timeout=1.0, wait=1.0, max_inflight=1)
+        self.addCleanup(grabber.close)
+        forwarded = []
+        stage = EnrichmentStage("服务", 'services', lambda host, started: grabber.grab(host.ip, [port], started),
+                                1, 1.0, nonblocking=True, by_host=True, deadline_on_start=True)
+        stage.start(forwarded.append)
+        self.addCleanup(stage.shutdown)
+        hosts = [HostInfo(ip=f'127.0.0.{i}', status='在线') for i in range(1, 9)]
+        for host in hosts:
+            stage.submit(host)
+
+        deadline = time.monotonic() + 15
+        while len(forwarded) < len(hosts) and time.monotonic() < deadline:
+            stage.expire(time.monotonic())
+            time.sleep(0.02)
+        self.assertEqual(stage.stats.timeouts, 0)
+        self.assertTrue(all(host.services == {port: 'ssh Slow_1.0'} for host in hosts))
+
+
+class TestServiceStage(unittest.TestCase):
+    def test_stage_timeout_is_finite(self):
+        scanner = NetworkScanner(ports=[22, 80, 443], banners=True)
+        scanner._reset_port_scanner()
+        self.addCleanup(scanner._close_port_scanner)
+        stage = next(stage for stage in scanner._build_pipeline().stages if stage.name == "服务")
+        self.assertEqual(stage.timeout, scanner._stage_timeout(3, scanner.banner_timeout,
+                                                               scanner.banner_grabber.max_inflight))
+        self.assertLess(stage.timeout, float('inf'))
+
+
+if __name__ == '__main__':
+    unittest.main()
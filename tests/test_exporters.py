@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试流式结果导出
+"""
+
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from src.exporters import CSV_COLUMNS, format_services, host_to_row, open_sink
+from src.scanner import HostInfo
+
+
+def sample_host():
+    return HostInfo(ip='10.0.0.5', status='在线', response_time=1.234, open_ports=[22, 80],
+                    services={80: 'http nginx', 22: 'ssh'}, udp_services={53: '关闭'})
+
+
+class TestRows(unittest.TestCase):
+    def test_format_services_sorted_by_port(self):
+        self.assertEqual(format_services({80: 'http', 22: 'ssh'}), '22/ssh; 80/http')
+        self.assertEqual(format_services({}), '')
+
+    def test_host_to_row(self):
+        row = dict(zip((field for _, field in CSV_COLUMNS), host_to_row(sample_host())))
+        self.assertEqual(row['response_time'], '1.2')
+        self.assertEqual(row['open_ports'], '22,80')
+        self.assertEqual(row['services'], '22/ssh; 80/http nginx')
+        self.assertEqual(row['udp_services'], '53/关闭')
+
+
+class TestSinks(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_csv_sink(self):
+        filename = self.path('out.csv')
+        with open_sink('csv', filename) as sink:
+            sink.write(sample_host())
+            sink.write(HostInfo(ip='10.0.0.6', status='离线'))
+        self.assertEqual(sink.count, 2)
+        with open(filename, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], [title for title, _ in CSV_COLUMNS])
+        self.assertEqual([row[0] for row in rows[1:]], ['10.0.0.5', '10.0.0.6'])
+
+    def test_jsonl_sink_flushes_each_row(self):
+        filename = self.path('out.jsonl')
+        sink = open_sink('jsonl', filename, flush_rows=1)
+        try:
+            sink.write(sample_host())
+            # 未关闭时已刷新的行就能读到
+            with open(filename, encoding='utf-8') as f:
+                record = json.loads(f.readline())
+        finally:
+            sink.close()
+        self.assertEqual(record['ip'], '10.0.0.5')
+        self.assertEqual(record['status'], '在线')
+
+    def test_unsupported_format(self):
+        with self.assertRaises(ValueError):
+            open_sink('txt', self.path('out.txt'))
+
+
+if __name__ == '__main__':
+    unittest.main()
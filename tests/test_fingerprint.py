@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试根据TTL和TCP窗口的操作系统识别
+"""
+
+import unittest
+
+from src.fingerprint import guess_os, hop_count, initial_ttl
+
+
+class TestInitialTtl(unittest.TestCase):
+    def test_rounds_up_to_common_values(self):
+        self.assertEqual(initial_ttl(64), 64)
+        self.assertEqual(initial_ttl(57), 64)
+        self.assertEqual(initial_ttl(117), 128)
+        self.assertEqual(initial_ttl(240), 255)
+        self.assertEqual(initial_ttl(20), 32)
+
+    def test_invalid(self):
+        self.assertEqual(initial_ttl(0), 0)
+        self.assertEqual(initial_ttl(300), 0)
+
+    def test_hop_count(self):
+        self.assertEqual(hop_count(117), 11)
+        self.assertEqual(hop_count(0), 0)
+
+
+class TestGuessOs(unittest.TestCase):
+    def test_by_ttl(self):
+        self.assertEqual(guess_os(61), "Linux/Unix")
+        self.assertEqual(guess_os(125), "Windows")
+        self.assertEqual(guess_os(250), "网络设备")
+        self.assertEqual(guess_os(0), "未知")
+
+    def test_window_refines_family(self):
+        self.assertEqual(guess_os(63, 65535), "macOS/BSD")
+        self.assertEqual(guess_os(64, 29200), "Linux")
+        self.assertEqual(guess_os(254, 4128), "Cisco IOS")
+
+    def test_unknown_window_falls_back_to_ttl(self):
+        self.assertEqual(guess_os(64, 1234), "Linux/Unix")
+
+
+if __name__ == '__main__':
+    unittest.main()
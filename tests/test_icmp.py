@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试ICMP报文构造与解析
+"""
+
+import asyncio
+import contextlib
+import io
+import socket
+import struct
+import time
+import unittest
+
+from src.icmp import (ICMP_DEST_UNREACH, ICMP_ECHO_REPLY, ICMP_ECHO_REQUEST, IP_RECVERR,
+                      SO_EE_ORIGIN_ICMP, AsyncIcmpPinger, BaseSweeper, EchoReply, IcmpEngine,
+                      build_echo_request, checksum, parse_icmp_packet, parse_recv_error, parse_unreachable,
+                      recv_errors)
+
+
+def ip_header(ttl=64, protocol=1):
+    """构造一个20字节的IPv4头（校验和不参与解析）"""
+    return struct.pack('!BBHHHBBH4s4s', 0x45, 0, 0, 0, 0, ttl, protocol, 0,
+                       bytes([10, 0, 0, 1]), bytes([10, 0, 0, 2]))
+
+
+class TestChecksum(unittest.TestCase):
+    def test_rfc1071_example(self):
+        # RFC 1071 第3节的例子：00 01 f2 03 f4 f5 f6 f7 的反码和为 0xddf2
+        self.assertEqual(checksum(bytes.fromhex('0001f203f4f5f6f7')), ~0xddf2 & 0xffff)
+
+    def test_odd_length_is_padded(self):
+        self.assertEqual(checksum(b'\x12\x34\x56'), checksum(b'\x12\x34\x56\x00'))
+
+    def test_packet_with_checksum_sums_to_zero(self):
+        packet = build_echo_request(0x1234, 7, b'abcdef')
+        self.assertEqual(checksum(packet), 0)
+
+
+class TestEchoRequest(unittest.TestCase):
+    def test_header_fields(self):
+        packet = build_echo_request(0xbeef, 42, b'xyz')
+        icmp_type, code, _, ident, seq = struct.unpack('!BBHHH', packet[:8])
+        self.assertEqual((icmp_type, code, ident, seq), (ICMP_ECHO_REQUEST, 0, 0xbeef, 42))
+        self.assertEqual(packet[8:], b'xyz')
+
+
+class TestParseIcmpPacket(unittest.TestCase):
+    def reply(self, ident=1, seq=2):
+        return struct.pack('!BBHHH', ICMP_ECHO_REPLY, 0, 0, ident, seq) + b'payload'
+
+    def test_without_ip_header(self):
+        # Linux的DGRAM套接字不带IP头，TTL由辅助数据提供
+        self.assertEqual(parse_icmp_packet(self.reply(5, 6)), (ICMP_ECHO_REPLY, 0, 5, 6, 0))
+
+    def test_with_ip_header_reads_ttl(self):
+        self.assertEqual(parse_icmp_packet(ip_header(ttl=117) + self.reply(5, 6)),
+                         (ICMP_ECHO_REPLY, 0, 5, 6, 117))
+
+    def test_truncated(self):
+        self.assertIsNone(parse_icmp_packet(b'\x00\x00\x00'))
+        self.assertIsNone(parse_icmp_packet(ip_header() + b'\x00\x00'))
+
+
+class TestParseUnreachable(unittest.TestCase):
+    def unreachable(self, inner_type=ICMP_ECHO_REQUEST):
+        # 不可达报文引用原始IP头（目的地址10.0.0.2）和原始ICMP头的前8字节
+        inner = ip_header() + struct.pack('!BBHHH', inner_type, 0, 0, 0x1234, 9)
+        return struct.pack('!BBHI', ICMP_DEST_UNREACH, 1, 0, 0) + inner
+
+    def test_raw_packet(self):
+        self.assertEqual(parse_unreachable(ip_header() + self.unreachable()), ('10.0.0.2', 0x1234, 9))
+
+    def test_not_echo_request(self):
+        self.assertIsNone(parse_unreachable(self.unreachable(inner_type=ICMP_ECHO_REPLY)))
+
+    def test_truncated(self):
+        self.assertIsNone(parse_unreachable(self.unreachable()[:20]))
+
+
+class TestRecvErrors(unittest.TestCase):
+    def extended_err(self, origin=SO_EE_ORIGIN_ICMP, icmp_type=ICMP_DEST_UNREACH, code=1):
+        # struct sock_extended_err: errno, origin, type, code, pad, info, data
+        return struct.pack('=IBBBBII', 113, origin, icmp_type, code, 0, 0, 0)
+
+    def test_parse_icmp_error(self):
+        ancdata = [(socket.SOL_IP, IP_RECVERR, self.extended_err(code=3))]
+        self.assertEqual(parse_recv_error(ancdata), (ICMP_DEST_UNREACH, 3))
+
+    def test_ignores_local_errors(self):
+        # origin 1 为本地错误（如EMSGSIZE），不是ICMP差错
+        self.assertIsNone(parse_recv_error([(socket.SOL_IP, IP_RECVERR, self.extended_err(origin=1))]))
+        self.assertIsNone(parse_recv_error([(socket.SOL_IP, 2, b'\x40\x00\x00\x00')]))
+
+    def test_empty_queue_does_not_wait(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.settimeout(1.0)
+            start = time.perf_counter()
+            self.assertEqual(recv_errors(sock), [])
+            self.assertLess(time.perf_counter() - start, 0.5)
+        finally:
+            sock.close()
+
+
+class LoopbackSweeper(BaseSweeper):
+    """用一对UNIX数据报套接字模拟网络：只有 answered 中的地址会应答"""
+
+    def __init__(self, answered, **kwargs):
+        super().__init__(**kwargs)
+        self.answered = set(answered)
+        self.sent = []
+        self._peer = None
+
+    def _open_socket(self):
+        sock, self._peer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        return sock
+
+    def _request(self, ip):
+        return ip, ip.encode()
+
+    def _send(self, sock, packet, ip):
+        self.sent.append(ip)
+        if ip in self.answered:
+            self._peer.send(packet)
+        return True
+
+    def _receive(self, sock):
+        ip = sock.recv(64).decode()
+        return ip, EchoReply(ip=ip, rtt=0.0)
+
+
+class BrokenSweeper(LoopbackSweeper):
+    """收到 replies 个应答后套接字出错"""
+
+    def __init__(self, answered, replies, **kwargs):
+        super().__init__(answered, **kwargs)
+        self.replies = replies
+
+    def _receive(self, sock):
+        if not self.replies:
+            raise OSError("模拟套接字出错")
+        received = super()._receive(sock)
+        self.replies -= 1
+        return received
+
+
+class TestBaseSweeper(unittest.TestCase):
+    def sweep(self, sweeper, targets):
+        try:
+            return dict(sweeper.sweep(targets))
+        finally:
+            sweeper._peer.close()
+
+    def test_replies_and_timeouts(self):
+        sweeper = LoopbackSweeper({'10.0.0.1', '10.0.0.3'}, timeout=0.05)
+        results = self.sweep(sweeper, ['10.0.0.1', '10.0.0.2', '10.0.0.3'])
+        self.assertEqual(set(results), {'10.0.0.1', '10.0.0.2', '10.0.0.3'})
+        self.assertIsNone(results['10.0.0.2'])
+        self.assertEqual(results['10.0.0.1'].ip, '10.0.0.1')
+        self.assertGreaterEqual(results['10.0.0.1'].rtt, 0.0)
+
+    def test_retries_only_unanswered(self):
+        sweeper = LoopbackSweeper({'10.0.0.1'}, timeout=0.02, retries=2, backoff=1.0)
+        self.sweep(sweeper, ['10.0.0.1', '10.0.0.2'])
+        self.assertEqual(sweeper.sent.count('10.0.0.1'), 1)
+        self.assertEqual(sweeper.sent.count('10.0.0.2'), 3)
+
+    def test_duplicate_targets_reported_once(self):
+        sweeper = LoopbackSweeper(set(), timeout=0.05)
+        results = list(sweeper.sweep(['10.0.0.9', '10.0.0.9']))
+        sweeper._peer.close()
+        self.assertEqual(results, [('10.0.0.9', None)])
+
+    def test_receive_error_reports_every_target(self):
+        targets = [f'10.0.0.{i}' for i in range(1, 21)]
+        # 在途上限2、超时很长：出错时有在途的、等待重试的和还没发出的目标
+        sweeper = BrokenSweeper({'10.0.0.1'}, 1, timeout=30, max_inflight=2, retries=1)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = list(sweeper.sweep(targets))
+        sweeper._peer.close()
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(sorted(ip for ip, _ in results), sorted(targets))
+        replies = dict(results)
+        self.assertEqual(replies.pop('10.0.0.1').ip, '10.0.0.1')
+        self.assertTrue(all(reply is None for reply in replies.values()))
+
+
+@unittest.skipUnless(IcmpEngine().available(), "无法打开ICMP套接字")
+class TestAsyncIcmpPinger(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.pinger = AsyncIcmpPinger(IcmpEngine())
+        await self.pinger.start()
+        self.addCleanup(self.pinger.close)
+
+    async def test_loopback_reply(self):
+        replies = await asyncio.gather(*(self.pinger.ping('127.0.0.1', 2.0) for _ in range(3)))
+        self.assertTrue(all(reply is not None and reply.ip == '127.0.0.1' for reply in replies))
+        # 每个探测有自己的序列号，应答不会串
+        self.assertEqual(len({reply.seq for reply in replies}), 3)
+        self.assertEqual(self.pinger._pending, {})
+
+    async def test_close_finishes_pending(self):
+        # TEST-NET-2 不会应答
+        probe = asyncio.ensure_future(self.pinger.ping('198.51.100.77', 30))
+        await asyncio.sleep(0.05)
+        self.pinger.close()
+        self.assertIsNone(await asyncio.wait_for(probe, 1))
+        self.assertIsNone(await self.pinger.ping('127.0.0.1', 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
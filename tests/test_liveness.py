@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试多探测竞速的存活检测
+"""
+
+import unittest
+from concurrent.futures import Future
+
+from src.icmp import EchoReply, IcmpEngine, IcmpReplyListener, next_sequence
+from src.liveness import LivenessProber, parse_probes
+
+
+class TestParseProbes(unittest.TestCase):
+    def test_order_kept_and_duplicates_removed(self):
+        self.assertEqual(parse_probes('TCP, icmp,tcp'), ('tcp', 'icmp'))
+
+    def test_unknown_probe(self):
+        with self.assertRaises(ValueError):
+            parse_probes('icmp,udp')
+        with self.assertRaises(ValueError):
+            parse_probes(' , ')
+
+
+class FakeListener:
+    """不发包的ICMP监听器，按预设结果完成Future"""
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.futures = []
+        self.closed = False
+
+    def send(self, ip):
+        future = Future()
+        if self.reply is not None:
+            future.set_result(self.reply)
+        self.futures.append(future)
+        return future
+
+    def close(self):
+        self.closed = True
+
+
+class TestLivenessProber(unittest.TestCase):
+    def prober(self, reply):
+        engine = IcmpEngine()
+        engine._available = True
+        prober = LivenessProber(engine, probes=('icmp',), ports=())
+        prober.icmp_listener = FakeListener(reply)
+        return prober
+
+    def test_icmp_reply_proves_online(self):
+        prober = self.prober(EchoReply(ip='10.0.0.1', rtt=1.5, ttl=64))
+        proof = prober.probe('10.0.0.1', 1.0)
+        self.assertEqual((proof.method, proof.rtt, proof.ttl), ('ICMP', 1.5, 64))
+
+    def test_timeout_cancels_wait(self):
+        prober = self.prober(None)
+        self.assertIsNone(prober.probe('10.0.0.1', 0.05))
+        self.assertTrue(prober.icmp_listener.futures[0].cancelled())
+
+    def test_close(self):
+        prober = self.prober(None)
+        prober.close()
+        self.assertTrue(prober.icmp_listener.closed)
+
+
+class TestIcmpReplyListener(unittest.TestCase):
+    def test_sequences_distinct(self):
+        self.assertEqual(len({next_sequence() for _ in range(1000)}), 1000)
+
+    def test_loopback(self):
+        engine = IcmpEngine()
+        if not engine.available():
+            self.skipTest("无法打开ICMP套接字")
+        listener = IcmpReplyListener(engine)
+        try:
+            futures = [listener.send('127.0.0.1') for _ in range(3)]
+            replies = [future.result(timeout=2.0) for future in futures]
+        finally:
+            listener.close()
+        self.assertEqual(len({reply.seq for reply in replies}), 3)
+        self.assertTrue(all(reply.ip == '127.0.0.1' for reply in replies))
+
+
+if __name__ == '__main__':
+    unittest.main()
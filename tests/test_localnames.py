@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试mDNS/LLMNR反向查询的报文构造与应答匹配
+"""
+
+import socket
+import struct
+import threading
+import unittest
+
+from src.localnames import LlmnrResolver, MdnsResolver, build_local_ptr_query
+from src.rdns import CLASS_IN, FLAG_QR, RCODE_NXDOMAIN, TYPE_PTR, decode_name, encode_name, reverse_name
+
+
+def response(query_id, qname, hostname=None, rcode=0, ttl=120):
+    """构造本地链路PTR应答（hostname 为None时不带应答记录）"""
+    answers = [] if hostname is None else [encode_name(hostname + '.')]
+    message = struct.pack('!HHHHHH', query_id, FLAG_QR | 0x0400 | rcode, 1, len(answers), 0, 0)
+    message += encode_name(qname) + struct.pack('!HH', TYPE_PTR, CLASS_IN)
+    for rdata in answers:
+        message += b'\xc0\x0c' + struct.pack('!HHIH', TYPE_PTR, CLASS_IN, ttl, len(rdata)) + rdata
+    return message
+
+
+def udp_socket(test, address, port=0):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    test.addCleanup(sock.close)
+    sock.bind((address, port))
+    sock.settimeout(5)
+    return sock
+
+
+def answer_once(test, server, replies):
+    """server 收到一个查询后按顺序发出 replies(查询ID, 问题名称) 返回的 (套接字, 报文)"""
+
+    def serve():
+        data, client = server.recvfrom(512)
+        query_id = struct.unpack('!H', data[:2])[0]
+        for sock, message in replies(query_id, decode_name(data, 12)[0]):
+            sock.sendto(message, client)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    test.addCleanup(thread.join)
+
+
+class TestQuery(unittest.TestCase):
+    def test_build_local_ptr_query(self):
+        name = reverse_name('192.168.1.20')
+        query = build_local_ptr_query(0x4242, name)
+        # 不请求递归，只有一个问题
+        self.assertEqual(struct.unpack('!HHHHHH', query[:12]), (0x4242, 0, 1, 0, 0, 0))
+        self.assertEqual(decode_name(query, 12), (name, len(query) - 4))
+        self.assertEqual(query[-4:], struct.pack('!HH', TYPE_PTR, CLASS_IN))
+
+
+class TestMdnsResolver(unittest.TestCase):
+    def test_waits_for_owner_answer(self):
+        server = udp_socket(self, '127.0.0.1')
+        other = udp_socket(self, '127.0.0.2')
+
+        def replies(query_id, qname):
+            # 其他响应者的否定应答和别的名称的应答都被忽略，来源地址不限
+            return [(server, response(query_id, qname, rcode=RCODE_NXDOMAIN)),
+                    (server, response(query_id, reverse_name('10.9.9.9'), 'wrong.local')),
+                    (other, response(query_id, qname.upper(), 'printer.local', ttl=120))]
+
+        answer_once(self, server, replies)
+        resolver = MdnsResolver(group='127.0.0.1', port=server.getsockname()[1], timeout=2.0)
+        self.addCleanup(resolver.close)
+        result = resolver.query('192.168.1.20').result(timeout=5)
+        self.assertEqual((result.ip, result.hostname, result.ttl), ('192.168.1.20', 'printer.local', 120))
+
+    def test_no_answer(self):
+        server = udp_socket(self, '127.0.0.1')
+        answer_once(self, server, lambda query_id, qname: [(server, response(query_id, qname))])
+        resolver = MdnsResolver(group='127.0.0.1', port=server.getsockname()[1], timeout=0.2)
+        self.addCleanup(resolver.close)
+        result = resolver.query('192.168.1.20').result(timeout=5)
+        self.assertIsNone(result.hostname)
+        self.assertFalse(result.answered)
+
+
+class TestLlmnrResolver(unittest.TestCase):
+    def test_only_queried_address_answers(self):
+        owner = udp_socket(self, '127.0.0.2')
+        impostor = udp_socket(self, '127.0.0.3')
+
+        def replies(query_id, qname):
+            return [(impostor, response(query_id, qname, 'impostor')),
+                    (owner, response(query_id, qname, 'desktop-42'))]
+
+        answer_once(self, owner, replies)
+        resolver = LlmnrResolver(port=owner.getsockname()[1], timeout=2.0)
+        self.addCleanup(resolver.close)
+        self.assertEqual(resolver.query('127.0.0.2').result(timeout=5).hostname, 'desktop-42')
+
+
+if __name__ == '__main__':
+    unittest.main()
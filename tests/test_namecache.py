@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试主机名缓存的TTL、淘汰与持久化
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src import namecache
+from src.namecache import HostnameCache
+
+
+class FakeClock:
+    """可以手动拨动的时钟，代替 time 模块"""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+class CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(namecache, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class TestTtl(CacheTestCase):
+    def test_ptr_ttl_clamped(self):
+        cache = HostnameCache(min_ttl=60, max_ttl=3600, default_ttl=600)
+        cache.put('10.0.0.1', 'short.test', ttl=5)
+        cache.put('10.0.0.2', 'long.test', ttl=10 ** 6)
+        cache.put('10.0.0.3', 'normal.test', ttl=300)
+        cache.put('10.0.0.4', 'netbios-name', source='netbios')
+        now = self.clock.now
+        self.assertEqual(cache.get('10.0.0.1').expires, now + 60)
+        self.assertEqual(cache.get('10.0.0.2').expires, now + 3600)
+        self.assertEqual(cache.get('10.0.0.3').expires, now + 300)
+        entry = cache.get('10.0.0.4')
+        self.assertEqual((entry.expires, entry.source), (now + 600, 'netbios'))
+
+    def test_positive_entry_expires(self):
+        cache = HostnameCache(min_ttl=60)
+        cache.put('10.0.0.1', 'host.test', ttl=60)
+        self.clock.now += 59
+        self.assertEqual(cache.get('10.0.0.1').hostname, 'host.test')
+        self.clock.now += 1
+        self.assertIsNone(cache.get('10.0.0.1'))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_negative_entry(self):
+        cache = HostnameCache(negative_ttl=30)
+        cache.put_negative('10.0.0.1')
+        entry = cache.get('10.0.0.1')
+        self.assertTrue(entry.negative)
+        self.assertEqual(entry.expires, self.clock.now + 30)
+        self.clock.now += 30
+        self.assertIsNone(cache.get('10.0.0.1'))
+
+
+class TestEviction(CacheTestCase):
+    def test_least_recently_used_evicted(self):
+        cache = HostnameCache(max_entries=2)
+        cache.put('10.0.0.1', 'a.test')
+        cache.put('10.0.0.2', 'b.test')
+        # 读取刷新使用顺序，之后淘汰的是 10.0.0.2
+        self.assertIsNotNone(cache.get('10.0.0.1'))
+        cache.put('10.0.0.3', 'c.test')
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('10.0.0.2'))
+        self.assertEqual(cache.get('10.0.0.1').hostname, 'a.test')
+        self.assertEqual(cache.get('10.0.0.3').hostname, 'c.test')
+
+
+class TestPersistence(CacheTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, 'names.json')
+
+    def test_round_trip_drops_expired(self):
+        cache = HostnameCache(min_ttl=60, negative_ttl=120)
+        cache.put('10.0.0.1', 'short.test', ttl=60)
+        cache.put('10.0.0.2', 'long.test', ttl=3600, source='mdns')
+        cache.put_negative('10.0.0.3')
+        cache.save(self.filename)
+
+        self.clock.now += 100
+        loaded = HostnameCache()
+        self.assertEqual(loaded.load(self.filename), 2)
+        entry = loaded.get('10.0.0.2')
+        self.assertEqual((entry.hostname, entry.source), ('long.test', 'mdns'))
+        self.assertTrue(loaded.get('10.0.0.3').negative)
+        self.assertIsNone(loaded.get('10.0.0.1'))
+
+    def test_wrong_version(self):
+        with open(self.filename, 'w', encoding='utf-8') as f:
+            json.dump({'version': HostnameCache.VERSION + 1,
+                       'entries': [['10.0.0.1', 'host.test', self.clock.now + 600, 'dns']]}, f)
+        cache = HostnameCache()
+        self.assertEqual(cache.load(self.filename), 0)
+        self.assertEqual(len(cache), 0)
+
+    def test_corrupt_or_missing_file(self):
+        with open(self.filename, 'w', encoding='utf-8') as f:
+            f.write('{"version": 1, "entries": [')
+        self.assertEqual(HostnameCache().load(self.filename), 0)
+        self.assertEqual(HostnameCache().load(self.filename + '.missing'), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
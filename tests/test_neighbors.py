@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试邻居表的解析与刷新频率
+"""
+
+import unittest
+from unittest import mock
+
+from src import neighbors
+from src.neighbors import NeighborTable, normalize_mac, parse_arp_output, parse_proc_net_arp
+
+PROC_TEXT = """\
+IP address       HW type     Flags       HW address            Mask     Device
+192.168.1.1      0x1         0x2         00:11:22:aa:bb:cc     *        eth0
+192.168.1.5      0x1         0x0         00:00:00:00:00:00     *        eth0
+192.168.1.6      0x1         0x2         00:00:00:00:00:00     *        eth0
+192.168.1.7      0x1         0x6         de:ad:be:ef:00:01     *        eth0
+192.168.1.8      0x1         bad         de:ad:be:ef:00:02     *        eth0
+"""
+
+MACOS_TEXT = """\
+? (192.168.1.1) at 0:11:22:a:bb:cc on en0 ifscope [ethernet]
+? (192.168.1.9) at (incomplete) on en0 ifscope [ethernet]
+? (192.168.1.255) at ff:ff:ff:ff:ff:ff on en0 ifscope [ethernet]
+"""
+
+WINDOWS_TEXT = """\
+接口: 192.168.1.100 --- 0xb
+  Internet 地址         物理地址              类型
+  192.168.1.1           00-11-22-aa-bb-cc     动态
+  192.168.1.20          00-00-00-00-00-00     无效
+  224.0.0.22            01-00-5e-00-00-16     静态
+"""
+
+
+class FakeClock:
+    """可以手动拨动的单调时钟，代替 time 模块"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+
+class TestParsers(unittest.TestCase):
+    def test_normalize_mac(self):
+        self.assertEqual(normalize_mac('0:1b:2c:d:e:ff'), '00:1B:2C:0D:0E:FF')
+        self.assertEqual(normalize_mac('00-11-22-aa-bb-cc'), '00:11:22:AA:BB:CC')
+
+    def test_proc_net_arp(self):
+        # 未完成解析（标志无ATF_COM或MAC全0）和无法解析的行都被跳过
+        self.assertEqual(parse_proc_net_arp(PROC_TEXT), {'192.168.1.1': '00:11:22:AA:BB:CC',
+                                                         '192.168.1.7': 'DE:AD:BE:EF:00:01'})
+        self.assertEqual(parse_proc_net_arp(PROC_TEXT.splitlines()[0]), {})
+
+    def test_arp_an_macos(self):
+        self.assertEqual(parse_arp_output(MACOS_TEXT), {'192.168.1.1': '00:11:22:0A:BB:CC'})
+
+    def test_arp_a_windows(self):
+        self.assertEqual(parse_arp_output(WINDOWS_TEXT), {'192.168.1.1': '00:11:22:AA:BB:CC',
+                                                          '224.0.0.22': '01:00:5E:00:00:16'})
+
+
+class TestNeighborTable(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(neighbors, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.reads = 0
+        self.snapshot = {'10.0.0.1': '00:11:22:33:44:55'}
+        self.table = NeighborTable(refresh_interval=1.0)
+        self.table._read = self.read
+
+    def read(self):
+        self.reads += 1
+        return dict(self.snapshot) if self.snapshot is not None else None
+
+    def test_miss_refreshes_at_most_once_per_interval(self):
+        self.assertEqual(self.table.lookup('10.0.0.1'), '00:11:22:33:44:55')
+        self.assertEqual(self.reads, 1)
+        # 命中不读取；间隔内的多次未命中也只读取一次
+        self.assertEqual(self.table.lookup('10.0.0.1'), '00:11:22:33:44:55')
+        for _ in range(5):
+            self.assertIsNone(self.table.lookup('10.0.0.2'))
+        self.assertEqual(self.reads, 1)
+
+        self.snapshot['10.0.0.2'] = '66:77:88:99:AA:BB'
+        self.clock.now += 0.5
+        self.assertIsNone(self.table.lookup('10.0.0.2'))
+        self.clock.now += 0.5
+        self.assertEqual(self.table.lookup('10.0.0.2'), '66:77:88:99:AA:BB')
+        self.assertEqual(self.reads, 2)
+
+    def test_forced_refresh_and_read_failure(self):
+        self.assertTrue(self.table.refresh())
+        self.assertFalse(self.table.refresh())
+        self.snapshot = None
+        self.assertTrue(self.table.refresh(force=True))
+        # 读取失败时保留上一次的快照
+        self.assertFalse(self.table.available)
+        self.assertEqual(len(self.table), 1)
+        self.assertEqual(self.reads, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
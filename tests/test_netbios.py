@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试NetBIOS节点状态查询的报文构造与解析
+"""
+
+import socket
+import struct
+import threading
+import unittest
+
+from src.netbios import (CLASS_IN, NAME_FLAG_GROUP, TYPE_NBSTAT, WILDCARD_NAME, NetbiosClient, build_nbstat_query,
+                         parse_nbstat_response)
+
+MAC = b'\x00\x1b\x2c\x3d\x4e\x5f'
+
+NAMES = [
+    ('WORKGROUP', 0x00, NAME_FLAG_GROUP | 0x0400),
+    ('DESKTOP-42', 0x20, 0x0400),
+    ('DESKTOP-42', 0x00, 0x0400),
+    ('WORKGROUP', 0x1e, NAME_FLAG_GROUP | 0x0400),
+]
+
+
+def nbstat_response(transaction_id, names=NAMES, mac=MAC):
+    """构造NBSTAT应答：名称表之后是6字节的网卡地址和其余统计字段"""
+    table = bytes([len(names)])
+    for name, suffix, flags in names:
+        table += name.encode('ascii').ljust(15) + bytes([suffix]) + struct.pack('!H', flags)
+    rdata = table + mac + bytes(40)
+    header = struct.pack('!HHHHHH', transaction_id, 0x8400, 0, 1, 0, 0)
+    return header + WILDCARD_NAME + struct.pack('!HHIH', TYPE_NBSTAT, CLASS_IN, 0, len(rdata)) + rdata
+
+
+class TestPackets(unittest.TestCase):
+    def test_build_query(self):
+        query = build_nbstat_query(0x1234)
+        self.assertEqual(struct.unpack('!HHHHHH', query[:12]), (0x1234, 0, 1, 0, 0, 0))
+        self.assertEqual(query[12:12 + len(WILDCARD_NAME)], WILDCARD_NAME)
+        self.assertEqual(query[-4:], struct.pack('!HH', TYPE_NBSTAT, CLASS_IN))
+        self.assertEqual(len(query), 12 + 34 + 4)
+
+    def test_parse_name_table(self):
+        self.assertEqual(parse_nbstat_response(nbstat_response(0x1234)),
+                         (0x1234, NAMES, '00:1B:2C:3D:4E:5F'))
+
+    def test_zero_mac(self):
+        self.assertIsNone(parse_nbstat_response(nbstat_response(1, mac=bytes(6)))[2])
+
+    def test_rejects_queries_and_truncated_packets(self):
+        self.assertIsNone(parse_nbstat_response(build_nbstat_query(1)))
+        message = nbstat_response(1)
+        self.assertIsNone(parse_nbstat_response(message[:10]))
+        # 名称表被截断
+        self.assertIsNone(parse_nbstat_response(message[:12 + 34 + 10 + 1 + 18 + 5]))
+        # 只有名称计数
+        self.assertIsNone(parse_nbstat_response(message[:12 + 34 + 10]))
+
+
+class TestNetbiosClient(unittest.TestCase):
+    def test_loopback_query_picks_workstation_name(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        server.settimeout(5)
+
+        def answer():
+            data, address = server.recvfrom(512)
+            transaction_id = struct.unpack('!H', data[:2])[0]
+            server.sendto(nbstat_response(transaction_id), address)
+
+        thread = threading.Thread(target=answer, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+
+        client = NetbiosClient(port=server.getsockname()[1], timeout=2.0, retries=0)
+        self.addCleanup(client.close)
+        result = client.query('127.0.0.1').result(timeout=5)
+        # 取 <00> 后缀的名称：UNIQUE 为计算机名，GROUP 为工作组
+        self.assertEqual((result.name, result.workgroup, result.mac),
+                         ('DESKTOP-42', 'WORKGROUP', '00:1B:2C:3D:4E:5F'))
+
+    def test_no_answer(self):
+        silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(silent.close)
+        silent.bind(('127.0.0.1', 0))
+        client = NetbiosClient(port=silent.getsockname()[1], timeout=0.1, retries=0)
+        self.addCleanup(client.close)
+        result = client.query('127.0.0.1').result(timeout=5)
+        self.assertEqual((result.ip, result.name, result.workgroup, result.mac), ('127.0.0.1', None, None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试分阶段扫描流水线
+"""
+
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+
+from src.pipeline import EnrichmentStage, ScanPipeline
+from src.scanner import HostInfo
+
+
+class TestEnrichmentStage(unittest.TestCase):
+    def setUp(self):
+        self.forwarded = []
+
+    def start(self, stage):
+        stage.start(self.forwarded.append)
+        self.addCleanup(stage.shutdown)
+        return stage
+
+    def test_result_written_and_forwarded(self):
+        stage = self.start(EnrichmentStage("主机名", 'hostname', lambda ip: f"host-{ip}", 2, 5.0))
+        host = HostInfo(ip='10.0.0.1', status='在线')
+        stage.submit(host)
+        stage._executor.shutdown(wait=True)
+        self.assertEqual(self.forwarded, [host])
+        self.assertEqual(host.hostname, 'host-10.0.0.1')
+        self.assertEqual(stage.stats.processed, 1)
+
+    def test_timeout_forwards_default_and_drops_late_result(self):
+        release = threading.Event()
+
+        def slow(ip):
+            release.wait()
+            return "late"
+
+        stage = self.start(EnrichmentStage("主机名", 'hostname', slow, 1, 0.01))
+        host = HostInfo(ip='10.0.0.1', status='在线')
+        stage.submit(host)
+        stage.expire(time.monotonic() + 1)
+        self.assertEqual(self.forwarded, [host])
+        self.assertEqual(stage.stats.timeouts, 1)
+
+        release.set()
+        stage._executor.shutdown(wait=True)
+        # 已经交出去的主机不会再被修改，也不会被转发两次
+        self.assertEqual(host.hostname, '未知')
+        self.assertEqual(self.forwarded, [host])
+
+    def test_skip(self):
+        stage = self.start(EnrichmentStage("端口", 'open_ports', lambda ip: [80], 1, 1.0,
+                                           skip=lambda host: host.ip.endswith('.2')))
+        host = HostInfo(ip='10.0.0.2', status='在线')
+        stage.submit(host)
+        self.assertEqual(self.forwarded, [host])
+        self.assertEqual(host.open_ports, [])
+
+    def test_nonblocking_with_apply(self):
+        future = Future()
+        stage = self.start(EnrichmentStage("端口", 'open_ports', lambda ip: future, 1, 1.0, nonblocking=True,
+                                           apply=lambda host, ports: setattr(host, 'open_ports', sorted(ports))))
+        host = HostInfo(ip='10.0.0.3', status='在线')
+        stage.submit(host)
+        self.assertEqual(self.forwarded, [])
+        future.set_result([443, 22])
+        self.assertEqual(self.forwarded, [host])
+        self.assertEqual(host.open_ports, [22, 443])
+
+    def test_submit_error_releases_host(self):
+        def broken(ip):
+            raise OSError("无法打开套接字")
+
+        stage = self.start(EnrichmentStage("端口", 'open_ports', broken, 1, 1.0, nonblocking=True))
+        host = HostInfo(ip='10.0.0.4', status='在线')
+        stage.submit(host)
+        self.assertEqual(self.forwarded, [host])
+        self.assertEqual(stage.stats.errors, 1)
+
+    def test_failed_result_counts_error(self):
+        stage = self.start(EnrichmentStage("主机名", 'hostname', lambda ip: 1 / 0, 1, 1.0))
+        host = HostInfo(ip='10.0.0.5', status='在线')
+        stage.submit(host)
+        stage._executor.shutdown(wait=True)
+        self.assertEqual(self.forwarded, [host])
+        self.assertEqual(stage.stats.errors, 1)
+
+    def test_completed_jobs_leave_the_deadline_heap(self):
+        futures = []
+
+        def pending(ip):
+            futures.append(Future())
+            return futures[-1]
+
+        stage = self.start(EnrichmentStage("端口", 'open_ports', pending, 1, 3600.0, nonblocking=True))
+        hosts = [HostInfo(ip=f'10.0.{i // 256}.{i % 256}', status='在线') for i in range(1000)]
+        for host in hosts:
+            stage.submit(host)
+        for future in futures:
+            future.set_result([80])
+        self.assertEqual(len(self.forwarded), 1000)
+        # 已完成的条目超过一半时整理堆，且不再引用主机
+        self.assertLess(len(stage._deadlines), EnrichmentStage.COMPACT_MIN)
+        self.assertTrue(all(job.host is None for _, _, job in stage._deadlines))
+
+        stage.expire(float('inf'))
+        self.assertEqual((stage._deadlines, stage._settled), ([], 0))
+        self.assertEqual(stage.stats.timeouts, 0)
+
+    def test_deadline_on_start(self):
+        calls = []
+
+        def queued(ip, started):
+            calls.append((started, Future()))
+            return calls[-1][1]
+
+        stage = self.start(EnrichmentStage("端口", 'open_ports', queued, 1, 0.01, nonblocking=True,
+                                           deadline_on_start=True))
+        waiting, running = HostInfo(ip='10.0.0.6', status='在线'), HostInfo(ip='10.0.0.7', status='在线')
+        stage.submit(waiting)
+        stage.submit(running)
+        calls[1][0]()
+        calls[1][0]()
+        # 只有已开始处理的主机会超时，排队中的主机不计时
+        stage.expire(time.monotonic() + 1)
+        self.assertEqual(self.forwarded, [running])
+        self.assertEqual(stage.stats.timeouts, 1)
+
+        # 没有放入堆就完成的任务不计入已放行条目
+        calls[0][1].set_result([22])
+        self.assertEqual(self.forwarded, [running, waiting])
+        self.assertEqual(waiting.open_ports, [22])
+        self.assertEqual((stage._deadlines, stage._settled), ([], 0))
+
+
+class TestScanPipeline(unittest.TestCase):
+    def test_offline_hosts_bypass_stages(self):
+        stages = [EnrichmentStage("主机名", 'hostname', lambda ip: f"host-{ip}", 2, 5.0),
+                  EnrichmentStage("MAC", 'mac', lambda ip: "aa:bb:cc:dd:ee:ff", 2, 5.0)]
+        hosts = [HostInfo(ip=f'10.0.0.{i}', status='在线' if i % 2 else '离线') for i in range(1, 7)]
+        results = list(ScanPipeline(stages, discovery_workers=1, tick=0.01).run(iter(hosts)))
+
+        self.assertEqual(sorted(host.ip for host in results), sorted(host.ip for host in hosts))
+        for host in results:
+            if host.status == '在线':
+                self.assertEqual((host.hostname, host.mac), (f"host-{host.ip}", "aa:bb:cc:dd:ee:ff"))
+            else:
+                self.assertEqual((host.hostname, host.mac), ('未知', '未知'))
+
+
+if __name__ == '__main__':
+    unittest.main()
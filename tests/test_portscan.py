@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试TCP端口扫描
+"""
+
+import socket
+import time
+import unittest
+
+from src.pipeline import EnrichmentStage
+from src.portscan import TOP_PORTS, PortScanner, parse_ports
+from src.scanner import HostInfo, NetworkScanner
+
+
+def blackhole_port(test):
+    """
+    在 0.0.0.0 上监听并占满全连接队列的端口：内核丢弃之后的SYN，连接一直停在进行中，
+    相当于被过滤的端口
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    test.addCleanup(server.close)
+    server.bind(('0.0.0.0', 0))
+    server.listen(0)
+    port = server.getsockname()[1]
+    for _ in range(3):
+        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        test.addCleanup(client.close)
+        client.setblocking(False)
+        client.connect_ex(('127.0.0.1', port))
+    time.sleep(0.1)
+    return port
+
+
+class TestParsePorts(unittest.TestCase):
+    def test_list_and_range(self):
+        self.assertEqual(parse_ports('22, 80,8000-8002'), [22, 80, 8000, 8001, 8002])
+
+    def test_duplicates_keep_first_position(self):
+        self.assertEqual(parse_ports('443,22,443,21-23'), [443, 22, 21, 23])
+
+    def test_top_preset(self):
+        self.assertEqual(parse_ports('top10'), TOP_PORTS[:10])
+        self.assertEqual(parse_ports('TOP-5'), TOP_PORTS[:5])
+
+    def test_invalid(self):
+        for text in ('0', '65536', '90-80', 'top0', f'top{len(TOP_PORTS) + 1}', '', 'http'):
+            with self.assertRaises(ValueError, msg=text):
+                parse_ports(text)
+
+
+class TestPortScanner(unittest.TestCase):
+    def test_open_and_closed(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        open_port = listener.getsockname()[1]
+        closed = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        closed.bind(('127.0.0.1', 0))
+        closed_port = closed.getsockname()[1]
+
+        scanner = PortScanner(timeout=1.0, max_inflight=4)
+        try:
+            result = scanner.scan('127.0.0.1', [closed_port, open_port]).result(timeout=5)
+        finally:
+            scanner.close()
+            listener.close()
+            closed.close()
+        self.assertEqual(result, [open_port])
+
+    def test_loop_error_fails_pending_scans(self):
+        scanner = PortScanner(timeout=1.0, max_inflight=4)
+
+        def broken(now):
+            raise RuntimeError("模拟扫描线程出错")
+
+        scanner._connect = broken
+        future = scanner.scan('127.0.0.1', [1])
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=5)
+        self.assertFalse(scanner._running)
+        scanner.close()
+
+
+class TestQueuedHosts(unittest.TestCase):
+    def test_deadline_starts_when_host_is_dequeued(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(listener.close)
+        listener.bind(('0.0.0.0', 0))
+        listener.listen(64)
+        open_port = listener.getsockname()[1]
+        filtered = blackhole_port(self)
+
+        # 每个主机一批（2个连接），被过滤的端口要等满0.3秒；8个主机排队共约2.4秒，
+        # 远超单个主机的阶段超时
+        scanner = PortScanner(timeout=0.3, max_inflight=2)
+        self.addCleanup(scanner.close)
+        forwarded = []
+        stage = EnrichmentStage("端口", 'open_ports', lambda ip, started: scanner.scan(ip, [filtered, open_port], started),
+                                2, 2 * 0.3 + 0.3, nonblocking=True, deadline_on_start=True)
+        stage.start(forwarded.append)
+        self.addCleanup(stage.shutdown)
+        hosts = [HostInfo(ip=f'127.0.0.{i}', status='在线') for i in range(1, 9)]
+        for host in hosts:
+            stage.submit(host)
+
+        deadline = time.monotonic() + 10
+        while len(forwarded) < len(hosts) and time.monotonic() < deadline:
+            stage.expire(time.monotonic())
+            time.sleep(0.02)
+        self.assertEqual(len(forwarded), len(hosts))
+        self.assertEqual(stage.stats.timeouts, 0)
+        self.assertTrue(all(host.open_ports == [open_port] for host in hosts))
+
+
+class TestStageTimeout(unittest.TestCase):
+    def test_scales_with_batches(self):
+        scanner = NetworkScanner()
+        scanner.stage_slack = 0
+        # 1000个端口、并发100：10批加一批余量
+        self.assertEqual(scanner._stage_timeout(1000, 1.0, 100), 11.0)
+        self.assertEqual(scanner._stage_timeout(5, 1.0, 100), 2.0)
+
+    def test_rate_limit_adds_send_time(self):
+        scanner = NetworkScanner(rate=100)
+        scanner.stage_slack = 0
+        # 按退避下限（rate/20 = 5包/秒）发出100个包
+        self.assertEqual(scanner._stage_timeout(100, 1.0, 100), 2.0 + 100 / 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
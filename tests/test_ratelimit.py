@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试全局发包速率限制
+"""
+
+import unittest
+
+from src.ratelimit import RateLimiter
+
+
+def window(limiter, sent=20, replies=0, retries=0, unreachable=0):
+    """模拟一个统计窗口：发出 sent 个包，收到给定的应答和不可达报文"""
+    limiter.reserve(sent)
+    for i in range(replies):
+        limiter.on_reply(retry=i < retries)
+    for _ in range(unreachable):
+        limiter.on_unreachable()
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_disabled(self):
+        limiter = RateLimiter()
+        self.assertFalse(limiter.enabled)
+        self.assertEqual(limiter.reserve(1000), 0.0)
+
+    def test_burst_then_wait(self):
+        limiter = RateLimiter(rate=100, burst=5)
+        self.assertEqual(limiter.reserve(5), 0.0)
+        # 桶空后每个包等 1/rate 秒
+        self.assertAlmostEqual(limiter.reserve(1), 0.01, delta=0.002)
+        self.assertAlmostEqual(limiter.reserve(1), 0.02, delta=0.002)
+
+    def test_default_burst(self):
+        self.assertEqual(RateLimiter(rate=1000).burst, 50)
+        self.assertEqual(RateLimiter(rate=10).burst, 1)
+
+
+class TestBackoff(unittest.TestCase):
+    def setUp(self):
+        # interval 为0时每次 reserve 都结束上一个窗口
+        self.limiter = RateLimiter(rate=1000, interval=0.0)
+
+    def test_unreachable_storm_halves_rate(self):
+        window(self.limiter, replies=20, unreachable=10)
+        self.limiter.reserve(1)
+        self.assertEqual(self.limiter.rate, 500)
+        self.assertEqual(self.limiter.backoffs, 1)
+
+    def test_retry_replies_mean_loss(self):
+        window(self.limiter, replies=20, retries=2)
+        self.limiter.reserve(1)
+        self.assertEqual(self.limiter.rate, 500)
+
+    def test_reply_ratio_drop(self):
+        window(self.limiter, replies=20)
+        window(self.limiter, replies=2)
+        self.assertEqual(self.limiter.rate, 1000)
+        self.limiter.reserve(1)
+        self.assertEqual(self.limiter.rate, 500)
+
+    def test_recovers_gradually(self):
+        window(self.limiter, replies=20, unreachable=10)
+        window(self.limiter, replies=20)
+        self.limiter.reserve(1)
+        self.assertEqual(self.limiter.rate, 600)
+
+    def test_small_windows_ignored(self):
+        window(self.limiter, sent=5, unreachable=5)
+        self.limiter.reserve(1)
+        self.assertEqual(self.limiter.rate, 1000)
+
+    def test_min_rate(self):
+        limiter = RateLimiter(rate=1000, min_rate=300, interval=0.0)
+        for _ in range(5):
+            window(limiter, unreachable=20)
+        limiter.reserve(1)
+        self.assertEqual(limiter.rate, 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
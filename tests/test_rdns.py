@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试反向DNS报文构造与解析
+"""
+
+import select
+import socket
+import struct
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+
+from src.rdns import (CLASS_IN, FLAG_QR, FLAG_RD, RCODE_NXDOMAIN, RCODE_SERVFAIL, TYPE_PTR, ReverseResolver,
+                      build_ptr_query, decode_name, encode_name, parse_ptr_response, reverse_name)
+from src.scanner import NetworkScanner
+
+TYPE_CNAME = 5
+
+
+def response(query_id, qname, answers=(), rcode=0):
+    """构造响应报文，answers 为 (类型, 记录数据)，记录名用指向问题的压缩指针"""
+    message = struct.pack('!HHHHHH', query_id, FLAG_QR | FLAG_RD | rcode, 1, len(answers), 0, 0)
+    message += encode_name(qname) + struct.pack('!HH', TYPE_PTR, CLASS_IN)
+    for rtype, rdata in answers:
+        message += b'\xc0\x0c' + struct.pack('!HHIH', rtype, CLASS_IN, 3600, len(rdata)) + rdata
+    return message
+
+
+class TestNames(unittest.TestCase):
+    def test_reverse_name(self):
+        self.assertEqual(reverse_name('192.0.2.10'), '10.2.0.192.in-addr.arpa')
+
+    def test_encode_decode_round_trip(self):
+        encoded = encode_name('host.example.com.')
+        self.assertEqual(encoded, b'\x04host\x07example\x03com\x00')
+        self.assertEqual(decode_name(encoded, 0), ('host.example.com', len(encoded)))
+
+    def test_decode_compression_pointer(self):
+        message = encode_name('example.com') + b'\x03www\xc0\x00'
+        name, offset = decode_name(message, 13)
+        self.assertEqual((name, offset), ('www.example.com', len(message)))
+
+    def test_pointer_loop_rejected(self):
+        with self.assertRaises(ValueError):
+            decode_name(b'\xc0\x00', 0)
+
+    def test_build_ptr_query(self):
+        query = build_ptr_query(0x1234, reverse_name('10.0.0.1'))
+        self.assertEqual(struct.unpack('!HHHHHH', query[:12]), (0x1234, FLAG_RD, 1, 0, 0, 0))
+        self.assertEqual(decode_name(query, 12)[0], '1.0.0.10.in-addr.arpa')
+        self.assertEqual(query[-4:], struct.pack('!HH', TYPE_PTR, CLASS_IN))
+
+
+class TestParsePtrResponse(unittest.TestCase):
+    def test_ptr_answer(self):
+        qname = reverse_name('10.0.0.1')
+        message = response(7, qname, [(TYPE_PTR, encode_name('router.lan.'))])
+        self.assertEqual(parse_ptr_response(message), (7, 0, qname, 'router.lan', 3600))
+
+    def test_cname_before_ptr(self):
+        # RFC 2317 无类别反向委派：先CNAME再PTR
+        qname = reverse_name('10.0.0.1')
+        message = response(8, qname, [(TYPE_CNAME, encode_name('1.0/25.0.0.10.in-addr.arpa')),
+                                      (TYPE_PTR, encode_name('host.lan'))])
+        self.assertEqual(parse_ptr_response(message)[3], 'host.lan')
+
+    def test_nxdomain(self):
+        qname = reverse_name('10.0.0.2')
+        self.assertEqual(parse_ptr_response(response(9, qname, rcode=RCODE_NXDOMAIN)),
+                         (9, RCODE_NXDOMAIN, qname, None, 0))
+
+    def test_query_is_not_response(self):
+        self.assertIsNone(parse_ptr_response(build_ptr_query(1, reverse_name('10.0.0.1'))))
+        self.assertIsNone(parse_ptr_response(b'\x00\x01'))
+
+
+class StubDnsServer:
+    """
+    本地DNS桩服务：在若干回环地址的同一端口上应答PTR查询
+
+    records 为 {IP: 主机名或None}，None 应答NXDOMAIN；failing 中的IP由第一个地址
+    应答SERVFAIL，silent 中的IP第一个地址不应答，其余地址正常应答。
+    """
+
+    def __init__(self, test, addresses, records, ttl=600, failing=(), silent=()):
+        self.records = {reverse_name(ip): name for ip, name in records.items()}
+        self.failing = {reverse_name(ip) for ip in failing}
+        self.silent = {reverse_name(ip) for ip in silent}
+        self.ttl = ttl
+        self.seen = []
+        self.sockets = []
+        for address in addresses:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            test.addCleanup(sock.close)
+            sock.bind((address, self.port if self.sockets else 0))
+            self.sockets.append(sock)
+        self._stopped = threading.Event()
+        thread = threading.Thread(target=self._serve, daemon=True)
+        thread.start()
+        test.addCleanup(thread.join)
+        test.addCleanup(self._stopped.set)
+
+    @property
+    def port(self):
+        return self.sockets[0].getsockname()[1]
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            readable, _, _ = select.select(self.sockets, [], [], 0.05)
+            for sock in readable:
+                data, client = sock.recvfrom(512)
+                query_id = struct.unpack('!H', data[:2])[0]
+                qname = decode_name(data, 12)[0]
+                first = sock is self.sockets[0]
+                self.seen.append((sock.getsockname()[0], qname))
+                if first and qname in self.silent:
+                    continue
+                if first and qname in self.failing:
+                    sock.sendto(response(query_id, qname, rcode=RCODE_SERVFAIL), client)
+                    continue
+                hostname = self.records.get(qname)
+                if hostname is None:
+                    sock.sendto(response(query_id, qname, rcode=RCODE_NXDOMAIN), client)
+                    continue
+                answer = encode_name(hostname)
+                message = response(query_id, qname, [(TYPE_PTR, answer)])
+                # 改写应答记录的TTL
+                offset = len(message) - len(answer) - 6
+                message = message[:offset] + struct.pack('!I', self.ttl) + message[offset + 4:]
+                sock.sendto(message, client)
+
+
+class TestReverseResolver(unittest.TestCase):
+    def resolver(self, server, **kwargs):
+        resolver = ReverseResolver(nameservers=[sock.getsockname()[0] for sock in server.sockets],
+                                   port=server.port, **kwargs)
+        self.addCleanup(resolver.close)
+        return resolver
+
+    def test_ptr_and_nxdomain(self):
+        server = StubDnsServer(self, ['127.0.0.1'], {'10.0.0.1': 'host.test', '10.0.0.2': None}, ttl=600)
+        resolver = self.resolver(server)
+        found = resolver.query('10.0.0.1').result(timeout=5)
+        missing = resolver.query('10.0.0.2').result(timeout=5)
+        self.assertEqual((found.hostname, found.ttl, found.rcode), ('host.test', 600, 0))
+        self.assertEqual((missing.hostname, missing.rcode), (None, RCODE_NXDOMAIN))
+        self.assertTrue(missing.answered)
+
+    def test_servfail_moves_to_next_server(self):
+        server = StubDnsServer(self, ['127.0.0.1', '127.0.0.2'], {'10.0.0.3': 'backup.test'},
+                               failing=['10.0.0.3'])
+        result = self.resolver(server).query('10.0.0.3').result(timeout=5)
+        self.assertEqual(result.hostname, 'backup.test')
+        self.assertEqual([address for address, _ in server.seen], ['127.0.0.1', '127.0.0.2'])
+
+    def test_timeout_moves_to_next_server(self):
+        server = StubDnsServer(self, ['127.0.0.1', '127.0.0.2'], {'10.0.0.4': 'slow.test'},
+                               silent=['10.0.0.4'])
+        result = self.resolver(server, timeout=0.2).query('10.0.0.4').result(timeout=5)
+        self.assertEqual(result.hostname, 'slow.test')
+        self.assertEqual([address for address, _ in server.seen], ['127.0.0.1', '127.0.0.2'])
+
+    def test_no_answer_at_all(self):
+        server = StubDnsServer(self, ['127.0.0.1'], {}, silent=['10.0.0.5'])
+        result = self.resolver(server, timeout=0.1, retries=1).query('10.0.0.5').result(timeout=5)
+        self.assertEqual((result.hostname, result.rcode), (None, -1))
+        self.assertFalse(result.answered)
+        self.assertEqual(len(server.seen), 2)
+
+
+class TestGetHostname(unittest.TestCase):
+    def test_pending_lookup_times_out(self):
+        scanner = NetworkScanner(timeout=0.05)
+        scanner.dns_resolver.available = lambda: True
+        scanner._hostname_future = lambda ip: Future()
+        start = time.perf_counter()
+        self.assertEqual(scanner.get_hostname('10.0.0.1'), '未知')
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
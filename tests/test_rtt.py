@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试往返时间估计与自适应超时
+"""
+
+import unittest
+
+from src.rtt import AdaptiveTimeout, RttEstimator
+from src.scanner import NetworkScanner
+
+
+class TestRttEstimator(unittest.TestCase):
+    def test_no_samples_uses_ceiling(self):
+        self.assertEqual(RttEstimator(0.1, 2.0).timeout(), 2.0)
+
+    def test_first_sample(self):
+        estimator = RttEstimator(0.01, 2.0)
+        estimator.update(0.2)
+        # SRTT = R, RTTVAR = R/2，超时 = R + 4 × R/2
+        self.assertAlmostEqual(estimator.timeout(), 0.6)
+
+    def test_smoothing(self):
+        estimator = RttEstimator(0.0, 10.0)
+        estimator.update(0.1)
+        estimator.update(0.5)
+        self.assertAlmostEqual(estimator.srtt, 0.1 * 7 / 8 + 0.5 / 8)
+        self.assertAlmostEqual(estimator.rttvar, 0.05 * 3 / 4 + 0.4 / 4)
+        self.assertEqual(estimator.samples, 2)
+
+    def test_clamped(self):
+        estimator = RttEstimator(0.5, 1.0)
+        estimator.update(0.001)
+        self.assertEqual(estimator.timeout(), 0.5)
+        estimator.update(5.0)
+        self.assertEqual(estimator.timeout(), 1.0)
+
+
+class TestAdaptiveTimeout(unittest.TestCase):
+    def test_per_subnet(self):
+        adaptive = AdaptiveTimeout(floor=0.05, ceiling=2.0)
+        adaptive.observe('10.0.0.1', 10.0)
+        self.assertLess(adaptive.timeout_for('10.0.0.200'), 0.1)
+        self.assertEqual(adaptive.samples, 1)
+
+    def test_unsampled_subnet_waits_full_timeout(self):
+        # 局域网的样本不能缩短远端网段的超时
+        adaptive = AdaptiveTimeout(floor=0.05, ceiling=2.0)
+        adaptive.observe('10.0.0.1', 1.0)
+        self.assertEqual(adaptive.timeout_for('10.0.1.1'), 2.0)
+
+    def test_reset(self):
+        adaptive = AdaptiveTimeout(floor=0.05, ceiling=2.0)
+        adaptive.observe('10.0.0.1', 10.0)
+        adaptive.reset()
+        self.assertEqual(adaptive.timeout_for('10.0.0.1'), 2.0)
+        self.assertEqual(adaptive.samples, 0)
+
+
+class TestScannerTimeout(unittest.TestCase):
+    def test_fixed_by_default(self):
+        scanner = NetworkScanner(timeout=2)
+        scanner._observe_rtt('10.0.0.1', 1.0)
+        self.assertEqual(scanner._probe_timeout('10.0.0.2'), 2)
+        self.assertEqual(scanner._probe_timeout('10.0.0.2', attempt=1), 4)
+
+    def test_adaptive_opt_in(self):
+        scanner = NetworkScanner(timeout=2, adaptive_timeout=True, min_timeout=0.05)
+        scanner._observe_rtt('10.0.0.1', 1.0)
+        self.assertLess(scanner._probe_timeout('10.0.0.2'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试扫描器的调度：有界提交、流式扫描与异步扫描
+"""
+
+import asyncio
+import contextlib
+import io
+import socket
+import threading
+import time
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from src.liveness import Proof
+from src.scanner import HostInfo, NetworkScanner
+
+
+def quiet_scanner(**kwargs):
+    """不做名称查询和ARP自动切换的扫描器，测试只关心存活探测"""
+    scanner = NetworkScanner(use_arp=False, **kwargs)
+    scanner.use_netbios = False
+    scanner.use_local_names = False
+    scanner.dns_resolver.available = lambda: False
+    return scanner
+
+
+async def collect(scanner, target, **kwargs):
+    return [host async for host in scanner.aiter_scan(target, **kwargs)]
+
+
+class TestSubmitBounded(unittest.TestCase):
+    def test_window_never_exceeded(self):
+        scanner = quiet_scanner(max_threads=16)
+        scanner.is_scanning = True
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0, 'pulled': 0}
+
+        def items():
+            for i in range(40):
+                state['pulled'] += 1
+                yield i
+
+        def work(item):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            time.sleep(0.005)
+            with lock:
+                state['active'] -= 1
+            return item * 2
+
+        results = []
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            for item, future in scanner._submit_bounded(executor, work, items(), window=3):
+                # 惰性迭代器最多比已完成的任务多取 window 个
+                self.assertLessEqual(state['pulled'], len(results) + 3)
+                results.append((item, future.result()))
+        self.assertEqual(sorted(results), [(i, i * 2) for i in range(40)])
+        self.assertLessEqual(state['peak'], 3)
+
+    def test_stop_halts_submission(self):
+        scanner = quiet_scanner(max_threads=2)
+        scanner.is_scanning = True
+        done = []
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            for item, _ in scanner._submit_bounded(executor, lambda item: item, range(100), window=2):
+                done.append(item)
+                scanner.is_scanning = False
+        # 停止前已提交的任务仍然产出，之后不再提交
+        self.assertEqual(len(done), 2)
+
+
+class TestIterScan(unittest.TestCase):
+    def scanner(self):
+        scanner = quiet_scanner(use_native_icmp=False, max_threads=4)
+        scanner._can_get_mac = lambda: False
+        scanner.get_hostname = lambda ip: "未知"
+        self.release = threading.Event()
+
+        def probe(ip, attempt=0):
+            # 10.0.0.1 立即在线，其余主机等到放行后离线
+            if ip == '10.0.0.1':
+                return HostInfo(ip=ip, status='在线')
+            self.release.wait(5)
+            return HostInfo(ip=ip, status='离线')
+
+        scanner._probe_host = probe
+        return scanner
+
+    def scan(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            hosts = self.scanner().iter_scan('10.0.0.1-4', **kwargs)
+            first = next(hosts)
+            # 其他主机还在探测时第一个结果已经产出
+            self.assertFalse(self.release.is_set())
+            self.release.set()
+            return [first] + list(hosts)
+
+    def test_yields_hosts_as_they_complete(self):
+        hosts = self.scan()
+        self.assertEqual(hosts[0].ip, '10.0.0.1')
+        self.assertEqual(sorted(host.ip for host in hosts), [f'10.0.0.{i}' for i in range(1, 5)])
+        self.assertEqual([host.status for host in hosts], ['在线', '离线', '离线', '离线'])
+
+    def test_online_only(self):
+        hosts = self.scan(online_only=True)
+        self.assertEqual([(host.ip, host.status) for host in hosts], [('10.0.0.1', '在线')])
+
+
+class TestAsyncScan(unittest.IsolatedAsyncioTestCase):
+    async def test_tcp_fallback_finds_loopback(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(listener.close)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        port = listener.getsockname()[1]
+
+        scanner = quiet_scanner(use_native_icmp=False, timeout=1, tcp_ports=[port])
+        hosts = await collect(scanner, '127.0.0.1')
+        self.assertEqual([(host.ip, host.status, host.alive_by) for host in hosts],
+                         [('127.0.0.1', '在线', f'TCP/{port}')])
+        self.assertFalse(scanner.is_scanning)
+
+    async def test_online_only(self):
+        scanner = quiet_scanner(use_native_icmp=False, timeout=1, tcp_ports=[80])
+
+        async def probe(ip, port, timeout):
+            return Proof(method=f"TCP/{port}", rtt=1.0) if ip.endswith('.2') else None
+
+        scanner._tcp_probe_async = probe
+        self.assertEqual([host.ip for host in await collect(scanner, '10.0.0.1-4', online_only=True)],
+                         ['10.0.0.2'])
+        self.assertEqual(len(await collect(scanner, '10.0.0.1-4')), 4)
+
+    async def test_in_flight_probes_bounded(self):
+        scanner = quiet_scanner(use_native_icmp=False, timeout=1, tcp_ports=[1, 2, 3, 4, 5, 6])
+        state = {'active': 0, 'peak': 0, 'calls': 0}
+
+        async def probe(ip, port, timeout):
+            state['active'] += 1
+            state['calls'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+            await asyncio.sleep(0.01)
+            state['active'] -= 1
+            return None
+
+        scanner._tcp_probe_async = probe
+        hosts = await collect(scanner, '10.0.0.1-10', concurrency=4)
+        self.assertEqual(len(hosts), 10)
+        self.assertEqual(state['calls'], 60)
+        self.assertEqual(state['peak'], 4)
+
+    async def test_enrichment_does_not_hold_discovery_slot(self):
+        scanner = quiet_scanner(use_native_icmp=False, timeout=1, tcp_ports=[80])
+        discovered = []
+        release = asyncio.Event()
+
+        async def probe(ip, port, timeout):
+            discovered.append(ip)
+            if len(discovered) == 5:
+                release.set()
+            return Proof(method=f"TCP/{port}", rtt=1.0)
+
+        async def enrich(host_info):
+            # 所有主机都发现之后信息补充才能结束
+            await release.wait()
+            return host_info
+
+        scanner._tcp_probe_async = probe
+        scanner._enrich_host_async = enrich
+        hosts = await asyncio.wait_for(collect(scanner, '10.0.0.1-5', concurrency=1), 5)
+        self.assertEqual(sorted(host.ip for host in hosts), [f'10.0.0.{i}' for i in range(1, 6)])
+
+    async def test_scan_range_async(self):
+        scanner = quiet_scanner(use_native_icmp=False, timeout=1, tcp_ports=[80])
+
+        async def probe(ip, port, timeout):
+            return Proof(method=f"TCP/{port}", rtt=1.0) if ip.endswith('.1') else None
+
+        scanner._tcp_probe_async = probe
+        progress = []
+        results = await scanner.scan_range_async('10.0.0.1-3', lambda done, total, rate: progress.append(done))
+        self.assertEqual(sorted((host.ip, host.status) for host in results),
+                         [('10.0.0.1', '在线'), ('10.0.0.2', '离线'), ('10.0.0.3', '离线')])
+        self.assertEqual(progress, [1, 2, 3])
+        self.assertIs(scanner.results, results)
+
+    async def test_bad_targets_reset_scanning_flag(self):
+        scanner = quiet_scanner()
+
+        def broken(target_input):
+            raise ValueError("无法解析目标")
+
+        scanner._prepare_targets = broken
+        with self.assertRaises(ValueError):
+            await collect(scanner, 'bad')
+        self.assertFalse(scanner.is_scanning)
+
+
+class StuckPortScanner:
+    """开始处理后永远不完成的端口扫描器"""
+    max_inflight = 4
+
+    def scan(self, ip, ports, on_start=None):
+        on_start()
+        return Future()
+
+    def close(self):
+        pass
+
+
+class TestAwaitQueued(unittest.IsolatedAsyncioTestCase):
+    async def test_queue_wait_not_counted(self):
+        scanner = quiet_scanner()
+        loop = asyncio.get_running_loop()
+        future = Future()
+
+        def submit(on_start):
+            # 排队0.3秒后才开始，开始后立即完成
+            loop.call_later(0.3, lambda: (on_start(), future.set_result([22])))
+            return future
+
+        self.assertEqual(await scanner._await_queued(submit, 0.1, []), [22])
+
+    async def test_timeout_after_start(self):
+        scanner = quiet_scanner()
+        loop = asyncio.get_running_loop()
+        future = Future()
+
+        def submit(on_start):
+            loop.call_later(0.2, on_start)
+            return future
+
+        start = time.perf_counter()
+        self.assertEqual(await scanner._await_queued(submit, 0.1, 'default'), 'default')
+        self.assertGreaterEqual(time.perf_counter() - start, 0.25)
+        # 超时不取消扫描器的Future
+        self.assertFalse(future.cancelled())
+
+    async def test_enrichment_uses_stage_timeout(self):
+        scanner = quiet_scanner(ports=[80])
+        scanner._can_get_mac = lambda: False
+        scanner.port_timeout = 0.05
+        scanner.stage_slack = 0
+        scanner.port_scanner = StuckPortScanner()
+        host = HostInfo(ip='10.0.0.1', status='在线')
+        await asyncio.wait_for(scanner._enrich_host_async(host), 2)
+        self.assertEqual(host.open_ports, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
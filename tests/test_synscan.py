@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试SYN扫描的报文构造、解析与超时处理
+"""
+
+import socket
+import struct
+import time
+import unittest
+from concurrent.futures import Future
+
+from src.icmp import checksum
+from src.synscan import MSS_OPTION, TCP_ACK, TCP_SYN, SynScanner, _Scan, build_syn, parse_tcp_packet
+
+
+def ip_packet(src, dst, segment, ttl=64):
+    """在TCP报文段前加上20字节的IPv4头"""
+    header = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(segment), 0, 0, ttl, socket.IPPROTO_TCP, 0,
+                         socket.inet_aton(src), socket.inet_aton(dst))
+    return header + segment
+
+
+class SilentSocket:
+    """一直收不到报文的原始套接字"""
+
+    def recv(self, size):
+        raise socket.timeout
+
+
+class TestPackets(unittest.TestCase):
+    def test_build_syn(self):
+        segment = build_syn('10.0.0.1', '10.0.0.2', 40000, 443, 0x12345678)
+        self.assertEqual(len(segment), 20 + len(MSS_OPTION))
+        src_port, dst_port, seq, ack, offset, flags = struct.unpack('!HHIIBB', segment[:14])
+        self.assertEqual((src_port, dst_port, seq, ack, offset >> 4, flags),
+                         (40000, 443, 0x12345678, 0, len(segment) // 4, TCP_SYN))
+        # 带伪首部重新计算，校验和正确时结果为0
+        pseudo = socket.inet_aton('10.0.0.1') + socket.inet_aton('10.0.0.2') + \
+            struct.pack('!BBH', 0, socket.IPPROTO_TCP, len(segment))
+        self.assertEqual(checksum(pseudo + segment), 0)
+
+    def test_parse_syn_ack(self):
+        segment = struct.pack('!HHIIBBHHH', 443, 40000, 1, 0x12345679, 5 << 4, TCP_SYN | TCP_ACK, 29200, 0, 0)
+        self.assertEqual(parse_tcp_packet(ip_packet('10.0.0.2', '10.0.0.1', segment, ttl=57)),
+                         ('10.0.0.2', 443, 40000, 0x12345679, TCP_SYN | TCP_ACK, 29200, 57))
+
+    def test_parse_rejects_other_packets(self):
+        self.assertIsNone(parse_tcp_packet(b'\x45' * 10))
+        udp = bytearray(ip_packet('10.0.0.2', '10.0.0.1', bytes(20)))
+        udp[9] = socket.IPPROTO_UDP
+        self.assertIsNone(parse_tcp_packet(bytes(udp)))
+        self.assertIsNone(parse_tcp_packet(ip_packet('10.0.0.2', '10.0.0.1', bytes(8))))
+
+
+class TestSynScanner(unittest.TestCase):
+    def test_cookie(self):
+        scanner = SynScanner()
+        self.assertEqual(scanner.cookie('10.0.0.1', 80), scanner.cookie('10.0.0.1', 80))
+        self.assertNotEqual(scanner.cookie('10.0.0.1', 80), scanner.cookie('10.0.0.1', 81))
+
+    def test_expired_scans_finish_through_wheel(self):
+        scanner = SynScanner(timeout=0.05, tick=0.01)
+        now = time.perf_counter()
+        due, later = _Scan('10.0.0.1', [80], Future()), _Scan('10.0.0.2', [80], Future())
+        due.deadline, later.deadline = now - 0.1, now + 3600
+        for scan in (due, later):
+            scanner._scans[scan.ip] = scan
+            scanner._wheel.add(scan.ip, scan.deadline)
+
+        # 接收线程只处理时间轮中到期的主机
+        scanner._sock = SilentSocket()
+        scanner._running = True
+
+        def stop(scan):
+            scanner._running = False
+            scan.future.set_result(sorted(scan.open_ports))
+
+        scanner._finish = stop
+        scanner._receive_loop()
+        self.assertEqual(due.future.result(timeout=0), [])
+        self.assertFalse(later.future.done())
+        self.assertEqual(list(scanner._scans), ['10.0.0.2'])
+        self.assertEqual(len(scanner._wheel), 1)
+
+
+@unittest.skipUnless(SynScanner.available(), "需要原始套接字权限")
+class TestLoopbackScan(unittest.TestCase):
+    def test_open_and_closed_ports(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.addCleanup(listener.close)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        port = listener.getsockname()[1]
+
+        scanner = SynScanner(timeout=0.5)
+        self.addCleanup(scanner.close)
+        self.assertEqual(scanner.scan('127.0.0.1', [port, 1, port + 1]).result(timeout=5), [port])
+        # 回环接口上Linux的初始TTL为64
+        self.assertEqual(scanner.fingerprint('127.0.0.1')[0], 64)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试扫描目标的解析与区间集合
+"""
+
+import ipaddress
+import unittest
+
+from src.scanner import NetworkScanner
+from src.targets import (TargetPermutation, TargetPlan, int_to_ip, ip_to_int, merge_intervals,
+                         subtract_intervals)
+
+
+class TestTargetPlan(unittest.TestCase):
+    def test_ip_int_round_trip(self):
+        self.assertEqual(ip_to_int('10.0.0.1'), 0x0a000001)
+        self.assertEqual(int_to_ip(0xc0a80101), '192.168.1.1')
+
+    def test_network_hosts_only(self):
+        plan = TargetPlan()
+        plan.add_network(ipaddress.ip_network('10.0.0.0/30'))
+        self.assertEqual(list(plan), ['10.0.0.1', '10.0.0.2'])
+
+    def test_small_networks_keep_all_addresses(self):
+        # 与 network.hosts() 一致，/31 不去掉首尾
+        plan = TargetPlan()
+        plan.add_network(ipaddress.ip_network('10.0.0.0/31'))
+        self.assertEqual(len(plan), 2)
+
+    def test_large_network_is_lazy(self):
+        plan = TargetPlan()
+        plan.add_network(ipaddress.ip_network('10.0.0.0/8'), hosts_only=False)
+        self.assertEqual(len(plan), 1 << 24)
+        self.assertEqual(plan.ranges(), [(0x0a000000, 0x0affffff)])
+
+    def test_address_at_spans_ranges(self):
+        plan = TargetPlan()
+        plan.add_range(100, 102)
+        plan.add_range(200, 201)
+        self.assertEqual([plan.address_at(i) for i in range(len(plan))], [100, 101, 102, 200, 201])
+        with self.assertRaises(IndexError):
+            plan.address_at(5)
+
+    def test_contains(self):
+        plan = TargetPlan()
+        plan.add_range(ip_to_int('10.0.0.10'), ip_to_int('10.0.0.20'))
+        self.assertIn('10.0.0.10', plan)
+        self.assertIn(ip_to_int('10.0.0.20'), plan)
+        self.assertNotIn('10.0.0.21', plan)
+        self.assertNotIn('10.0.0.9', plan)
+        self.assertNotIn('not-an-ip', plan)
+
+    def test_reversed_range_and_bounds(self):
+        plan = TargetPlan()
+        plan.add_range(5, 3)
+        self.assertEqual(plan.ranges(), [(3, 5)])
+        with self.assertRaises(ValueError):
+            plan.add_range(0, 1 << 32)
+
+
+class TestIntervals(unittest.TestCase):
+    def test_merge_overlapping_and_adjacent(self):
+        self.assertEqual(merge_intervals([(10, 20), (1, 3), (4, 5), (15, 30), (40, 40)]),
+                         [(1, 5), (10, 30), (40, 40)])
+
+    def test_merge_contained(self):
+        self.assertEqual(merge_intervals([(1, 100), (5, 10)]), [(1, 100)])
+
+    def test_subtract(self):
+        self.assertEqual(subtract_intervals([(1, 10), (20, 30)], [(0, 2), (5, 6), (10, 21), (29, 40)]),
+                         [(3, 4), (7, 9), (22, 28)])
+
+    def test_subtract_everything(self):
+        self.assertEqual(subtract_intervals([(5, 10)], [(0, 100)]), [])
+
+    def test_duplicates_counted_once(self):
+        plan = TargetPlan()
+        plan.add_range(1, 10)
+        plan.add_range(5, 15)
+        plan.add_ip('0.0.0.7')
+        self.assertEqual(len(plan), 15)
+
+    def test_exclusions_win_regardless_of_order(self):
+        plan = TargetPlan()
+        plan.exclude_range(3, 4)
+        plan.add_range(1, 6)
+        self.assertEqual(list(plan.iter_ints()), [1, 2, 5, 6])
+        plan.add_range(3, 3)
+        self.assertEqual(len(plan), 4)
+        self.assertNotIn(3, plan)
+
+    def test_exclude_plan(self):
+        plan = TargetPlan()
+        plan.add_range(1, 10)
+        excluded = TargetPlan()
+        excluded.add_range(2, 9)
+        plan.exclude(excluded)
+        self.assertEqual(plan.ranges(), [(1, 1), (10, 10)])
+
+
+def make_plan(*ranges):
+    plan = TargetPlan()
+    for start, end in ranges:
+        plan.add_range(start, end)
+    return plan
+
+
+class TestTargetPermutation(unittest.TestCase):
+    def test_visits_every_target_once(self):
+        for size in (1, 2, 5, 8, 9, 100, 1000):
+            plan = make_plan((1000, 1000 + size - 1))
+            order = list(TargetPermutation(plan, seed=size).iter_ints())
+            self.assertEqual(sorted(order), list(plan.iter_ints()))
+
+    def test_same_seed_same_order(self):
+        plan = make_plan((1, 300), (1000, 1100))
+        self.assertEqual(list(TargetPermutation(plan, 7)), list(TargetPermutation(plan, 7)))
+        self.assertNotEqual(list(TargetPermutation(plan, 7)), list(TargetPermutation(plan, 8)))
+
+    def test_multiplier_never_one(self):
+        for size in (1, 4, 8, 16, 17, 1000):
+            for seed in range(50):
+                self.assertNotEqual(TargetPermutation(make_plan((0, size - 1)), seed).multiplier, 1)
+
+    def test_seek_continues_where_stopped(self):
+        plan = make_plan((1, 500))
+        first = TargetPermutation(plan, 3)
+        values = first.iter_ints()
+        head = [next(values) for _ in range(123)]
+        second = TargetPermutation(plan, 3)
+        second.seek(first.position)
+        self.assertEqual(head + list(second.iter_ints()), list(TargetPermutation(plan, 3).iter_ints()))
+
+    def test_resume_position_waits_for_unfinished(self):
+        plan = make_plan((1, 100))
+        order = TargetPermutation(plan, 11)
+        values = order.iter_ints()
+        taken = [next(values) for _ in range(10)]
+        # 第一个取出的地址还在扫描，后面都已完成
+        for value in taken[1:]:
+            order.mark_done(value)
+        resume = order.resume_position
+        self.assertLess(resume, order.position)
+
+        resumed = TargetPermutation(plan, 11)
+        resumed.seek(resume)
+        self.assertEqual(next(resumed.iter_ints()), taken[0])
+
+        order.mark_done(int_to_ip(taken[0]))
+        self.assertEqual(order.resume_position, order.position)
+
+
+class TestParseTargets(unittest.TestCase):
+    def setUp(self):
+        self.scanner = NetworkScanner()
+
+    def test_formats(self):
+        plan = self.scanner._parse_targets('10.0.0.1-3, 10.0.1.0/30,10.0.2.5')
+        self.assertEqual(list(plan), ['10.0.0.1', '10.0.0.2', '10.0.0.3',
+                                      '10.0.1.1', '10.0.1.2', '10.0.2.5'])
+
+    def test_cidr_without_hosts_only(self):
+        self.assertEqual(len(self.scanner._parse_targets('10.0.1.0/30', hosts_only=False)), 4)
+
+    def test_exclude_removes_whole_network(self):
+        # 排除列表按完整网段处理，网络地址和广播地址也被排除
+        scanner = NetworkScanner(exclude='10.0.0.0/30, 10.0.0.9')
+        plan = scanner._prepare_targets('10.0.0.0/28')
+        self.assertEqual(len(plan), 14 - 3 - 1)
+        self.assertNotIn('10.0.0.9', plan)
+        self.assertEqual(scanner.total_targets, 10)
+
+    def test_invalid_target_is_empty(self):
+        self.assertEqual(len(self.scanner._parse_targets('not-a-target')), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试UDP服务探测的报文解析与发送队列
+"""
+
+import select
+import socket
+import struct
+import threading
+import time
+import unittest
+from concurrent.futures import Future
+
+from src.pipeline import EnrichmentStage
+from src.scanner import HostInfo, NetworkScanner
+from src.udpscan import (UDP_CLOSED, UdpServiceScanner, _Probe, _Scan, build_dns_query, build_ntp_request,
+                         build_snmp_get, build_ssdp_search, parse_dns, parse_ntp, parse_snmp, parse_ssdp)
+
+
+class RecordingSocket:
+    """记录发出数据报的套接字"""
+
+    def __init__(self):
+        self.sent = []
+
+    def sendto(self, data, address):
+        self.sent.append(address)
+
+    def close(self):
+        pass
+
+
+def udp_echo_server(test, addresses):
+    """在 addresses 的同一端口上回显数据报（应答必须从被探测的地址发出）"""
+    sockets = []
+    for address in addresses:
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        test.addCleanup(server.close)
+        server.bind((address, sockets[0].getsockname()[1] if sockets else 0))
+        sockets.append(server)
+    stopped = threading.Event()
+
+    def serve():
+        while not stopped.is_set():
+            readable, _, _ = select.select(sockets, [], [], 0.1)
+            for server in readable:
+                data, address = server.recvfrom(512)
+                server.sendto(data or b'pong', address)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    test.addCleanup(thread.join)
+    test.addCleanup(stopped.set)
+    return sockets[0].getsockname()[1]
+
+
+class StoppedThread:
+    """已经退出的后台线程"""
+
+    def join(self):
+        pass
+
+
+class TestParsers(unittest.TestCase):
+    def test_dns(self):
+        query = build_dns_query()
+        self.assertEqual(struct.unpack('!HHHHHH', query[:12]), (0x4e53, 0x0100, 1, 0, 0, 0))
+        # 拒绝应答（REFUSED）也说明服务存在
+        self.assertEqual(parse_dns(query[:2] + b'\x81\x05' + query[4:]), 'dns')
+        self.assertIsNone(parse_dns(query))
+        self.assertIsNone(parse_dns(b'\x00\x00\x81\x80' + bytes(8)))
+
+    def test_ntp(self):
+        self.assertEqual(len(build_ntp_request()), 48)
+        reply = bytes([0x24, 2]) + bytes(46)
+        self.assertEqual(parse_ntp(reply), 'ntp v4 stratum 2')
+        self.assertIsNone(parse_ntp(build_ntp_request()))
+
+    def test_snmp(self):
+        request = build_snmp_get()
+        self.assertEqual(request[0], 0x30)
+        self.assertEqual(request[1], len(request) - 2)
+        self.assertIn(b'public', request)
+        descr = b'Linux router 6.1'
+        reply = b'\x30\x30' + b'\x06\x08\x2b\x06\x01\x02\x01\x01\x01\x00\x04' + bytes([len(descr)]) + descr
+        self.assertEqual(parse_snmp(reply), 'snmp Linux router 6.1')
+        self.assertEqual(parse_snmp(b'\x30\x00'), 'snmp')
+        self.assertIsNone(parse_snmp(b'junk'))
+
+    def test_ssdp(self):
+        self.assertTrue(build_ssdp_search().startswith(b'M-SEARCH * HTTP/1.1\r\n'))
+        self.assertEqual(parse_ssdp(b'HTTP/1.1 200 OK\r\nSERVER: Linux UPnP/1.0\r\n\r\n'), 'ssdp Linux UPnP/1.0')
+        self.assertEqual(parse_ssdp(b'HTTP/1.1 200 OK\r\n\r\n'), 'ssdp')
+        self.assertIsNone(parse_ssdp(b'HTTP/1.1 404 Not Found\r\n\r\n'))
+
+
+class TestSendQueue(unittest.TestCase):
+    def setUp(self):
+        self.scanner = UdpServiceScanner(timeout=60)
+        self.sock = RecordingSocket()
+        self.scanner._sockets = [self.sock]
+
+    def queue(self, ip, ports):
+        scan = _Scan(ip, Future(), len(ports))
+        self.scanner._backlog.extend(_Probe(scan, port) for port in ports)
+        return scan
+
+    def test_duplicate_does_not_block_queue(self):
+        first = self.queue('10.0.0.1', [53])
+        second = self.queue('10.0.0.1', [53, 123])
+        self.queue('10.0.0.2', [53])
+        self.scanner._send_backlog(time.perf_counter())
+        # 重复的 (地址, 端口) 暂缓，其后的探测照常发出
+        self.assertEqual(self.sock.sent, [('10.0.0.1', 53), ('10.0.0.1', 123), ('10.0.0.2', 53)])
+        self.assertEqual(len(self.scanner._deferred[('10.0.0.1', 53)]), 1)
+
+        # 上一次探测结束后放行等待的探测
+        probe = self.scanner._pending.pop(('10.0.0.1', 53))
+        self.assertIs(probe.scan, first)
+        self.assertIs(self.scanner._done(probe, UDP_CLOSED), first)
+        self.assertEqual(self.scanner._deferred, {})
+        self.scanner._send_backlog(time.perf_counter())
+        self.assertEqual(self.sock.sent[-1], ('10.0.0.1', 53))
+        self.assertIs(self.scanner._pending[('10.0.0.1', 53)].scan, second)
+
+    def test_close_finishes_deferred(self):
+        self.scanner._running = True
+        self.scanner._thread = StoppedThread()
+        first = self.queue('10.0.0.1', [53])
+        second = self.queue('10.0.0.1', [53])
+        self.scanner._send_backlog(time.perf_counter())
+        self.scanner.close()
+        self.assertEqual(first.future.result(timeout=0), {})
+        self.assertEqual(second.future.result(timeout=0), {})
+
+
+class TestUdpServiceScanner(unittest.TestCase):
+    def test_loopback_reply_and_closed_port(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(server.close)
+        server.bind(('127.0.0.1', 0))
+        server.settimeout(5)
+        open_port = server.getsockname()[1]
+        closed = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        closed.bind(('127.0.0.1', 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()
+
+        scanner = UdpServiceScanner(timeout=2.0, retries=0)
+        self.addCleanup(scanner.close)
+        futures = [scanner.scan('127.0.0.1', [open_port, closed_port]), scanner.scan('127.0.0.1', [open_port])]
+        for _ in futures:
+            _, address = server.recvfrom(512)
+            server.sendto(b'pong', address)
+
+        expected = {open_port: 'udp'}
+        if scanner.recv_errors:
+            expected[closed_port] = UDP_CLOSED
+        self.assertEqual(futures[0].result(timeout=5), expected)
+        self.assertEqual(futures[1].result(timeout=5), {open_port: 'udp'})
+
+    def test_deadline_starts_when_probes_leave_backlog(self):
+        hosts = [HostInfo(ip=f'127.0.0.{i}', status='在线') for i in range(1, 9)]
+        echo_port = udp_echo_server(self, [host.ip for host in hosts])
+        silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(silent.close)
+        silent.bind(('0.0.0.0', 0))
+        silent_port = silent.getsockname()[1]
+
+        # 只允许一个探测在途，每个主机要等无应答的端口超时（0.3秒）；
+        # 8个主机排队约2.4秒，远超单个主机的阶段超时
+        scanner = UdpServiceScanner(timeout=0.3, retries=0, max_inflight=1)
+        self.addCleanup(scanner.close)
+        forwarded = []
+        stage = EnrichmentStage("UDP", 'udp_services',
+                                lambda ip, started: scanner.scan(ip, [silent_port, echo_port], started),
+                                1, 3 * 0.3 + 0.2, nonblocking=True, deadline_on_start=True)
+        stage.start(forwarded.append)
+        self.addCleanup(stage.shutdown)
+        for host in hosts:
+            stage.submit(host)
+
+        deadline = time.monotonic() + 15
+        while len(forwarded) < len(hosts) and time.monotonic() < deadline:
+            stage.expire(time.monotonic())
+            time.sleep(0.02)
+        self.assertEqual(stage.stats.timeouts, 0)
+        self.assertTrue(all(host.udp_services == {echo_port: 'udp'} for host in hosts))
+
+
+class TestUdpStage(unittest.TestCase):
+    def test_stage_timeout_counts_retries(self):
+        scanner = NetworkScanner(udp_ports=[53, 123, 161])
+        scanner._reset_udp_scanner()
+        self.addCleanup(scanner.udp_scanner.close)
+        stage = next(stage for stage in scanner._build_pipeline().stages if stage.name == "UDP")
+        self.assertEqual(stage.timeout, scanner._stage_timeout(3 * (scanner.udp_scanner.retries + 1),
+                                                               scanner.udp_timeout,
+                                                               scanner.udp_scanner.max_inflight))
+
+
+if __name__ == '__main__':
+    unittest.main()